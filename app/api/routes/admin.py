@@ -476,7 +476,7 @@ async def delete_user(
         request=request
     )
 
-    # Elimina (cascade delete gestito da SQLAlchemy relationships)
+    # Elimina: job, pipeline, API key e token cancellati dal DB (ForeignKey ondelete="CASCADE")
     db.delete(user)
     db.commit()
 
@@ -126,7 +126,8 @@ async def register(
     ).first()
 
     if existing_user:
-        if existing_user.username == user_data.username:
+        # Confronto case-insensitive come la colonna (CITEXT)
+        if existing_user.username.lower() == user_data.username.lower():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username già in uso"
@@ -152,7 +153,7 @@ async def register(
 
     # Genera token di verifica (JWT valido 24 ore)
     verification_token = create_access_token(
-        data={"sub": str(new_user.id), "type": "email_verification"},
+        data={"sub": new_user.id, "type": "email_verification"},
         expires_delta=timedelta(hours=24)
     )
 
@@ -217,7 +218,7 @@ async def login(
 
     # Crea access token (1 ora)
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data={"sub": user.id},
         expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
     )
 
@@ -290,7 +291,7 @@ async def quick_token(
 
     # Crea JWT token (1 ora per test - in produzione disabilitare questo endpoint!)
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data={"sub": user.id},
         expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
     )
 
@@ -610,7 +611,7 @@ async def google_callback(
 
     # Genera JWT token per l'app (1 ora)
     jwt_token = create_access_token(
-        data={"sub": str(user.id)},
+        data={"sub": user.id},
         expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
     )
 
@@ -701,7 +702,7 @@ async def refresh_access_token(
 
     # Crea nuovo access token
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data={"sub": user.id},
         expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
     )
 
@@ -814,7 +815,7 @@ async def forgot_password(
     if user and user.is_active:
         # Crea reset token (JWT con scadenza 15 minuti)
         reset_token = create_access_token(
-            data={"sub": str(user.id), "type": "password_reset"},
+            data={"sub": user.id, "type": "password_reset"},
             expires_delta=timedelta(minutes=15)
         )
 
@@ -853,7 +854,7 @@ async def reset_password(
     - Messaggio di conferma
     """
     # Decodifica token
-    from app.core.security import decode_access_token
+    from app.core.security import decode_access_token, get_token_subject
 
     payload = decode_access_token(data.token)
 
@@ -863,7 +864,7 @@ async def reset_password(
             detail="Token reset invalido o scaduto"
         )
 
-    user_id = payload.get("sub")
+    user_id = get_token_subject(payload)
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -871,8 +872,7 @@ async def reset_password(
         )
 
     # Trova utente
-    from uuid import UUID as UUIDType
-    user = db.query(User).filter(User.id == UUIDType(user_id)).first()
+    user = db.query(User).filter(User.id == user_id).first()
 
     if not user or not user.is_active:
         raise HTTPException(
@@ -970,7 +970,7 @@ async def verify_email(
     - Messaggio di conferma
     """
     # Decodifica token
-    from app.core.security import decode_access_token
+    from app.core.security import decode_access_token, get_token_subject
 
     payload = decode_access_token(token)
 
@@ -980,7 +980,7 @@ async def verify_email(
             detail="Token verifica invalido o scaduto"
         )
 
-    user_id = payload.get("sub")
+    user_id = get_token_subject(payload)
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -988,8 +988,7 @@ async def verify_email(
         )
 
     # Trova utente
-    from uuid import UUID as UUIDType
-    user = db.query(User).filter(User.id == UUIDType(user_id)).first()
+    user = db.query(User).filter(User.id == user_id).first()
 
     if not user:
         raise HTTPException(
@@ -1032,7 +1031,7 @@ async def resend_verification_email(
     if user and user.is_active and not user.is_verified:
         # Genera nuovo token
         verification_token = create_access_token(
-            data={"sub": str(user.id), "type": "email_verification"},
+            data={"sub": user.id, "type": "email_verification"},
             expires_delta=timedelta(hours=24)
         )
 
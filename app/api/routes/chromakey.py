@@ -7,13 +7,13 @@ Route per elaborazione chromakey (green screen)
 from pathlib import Path
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from pydantic import BaseModel
 import subprocess
 import signal
 import logging
 
-from app.core.database import get_db
+from app.core.database import get_db, commit_new
 from app.core.security import get_current_user
 from app.core.config import settings
 from app.core.usage_tracker import track_action
@@ -135,8 +135,7 @@ def create_chromakey_job(
     )
 
     db.add(job)
-    db.commit()
-    db.refresh(job)
+    commit_new(db, job)  # i chiamanti leggono solo job.id: nessun refresh
 
     return job
 
@@ -148,7 +147,7 @@ def process_chromakey_task(job_id: str, params: ChromakeyRequest):
     db = SessionLocal()
 
     try:
-        job = db.query(Job).filter(Job.id == job_id).first()
+        job = db.query(Job).options(joinedload(Job.payload)).filter(Job.id == job_id).first()
 
         if not job:
             db.close()
@@ -398,7 +397,7 @@ async def get_job_status(
 
     Richiede JWT token. Puoi vedere solo i tuoi job.
     """
-    job = db.query(Job).filter(
+    job = db.query(Job).options(joinedload(Job.payload)).filter(
         Job.id == job_id,
         Job.user_id == current_user.id,
         Job.job_type == JobType.CHROMAKEY
@@ -446,7 +445,7 @@ async def list_chromakey_jobs(
         page = 1
 
     # Query base
-    query = db.query(Job).filter(
+    query = db.query(Job).options(selectinload(Job.payload)).filter(
         Job.user_id == current_user.id,
         Job.job_type == JobType.CHROMAKEY
     )
@@ -504,7 +503,7 @@ async def delete_chromakey_job(
     Richiede JWT token. Puoi cancellare solo i tuoi job.
     NOTA: Non cancella i file fisici, solo il record nel database.
     """
-    job = db.query(Job).filter(
+    job = db.query(Job).options(joinedload(Job.payload)).filter(
         Job.id == job_id,
         Job.user_id == current_user.id,
         Job.job_type == JobType.CHROMAKEY
@@ -37,6 +37,7 @@ class PipelineCreateRequest(BaseModel):
     description: Optional[str] = None
     steps: List[PipelineStep]
     stop_on_error: bool = True  # Ferma pipeline se uno step fallisce
+    parallel_groups: bool = False  # Traduzioni consecutive in parallelo
 
 
 class PipelineResponse(BaseModel):
@@ -69,6 +70,7 @@ class PipelineDetailResponse(BaseModel):
     total_steps: int
     steps: List[dict]
     stop_on_error: bool
+    parallel_groups: bool
     created_at: str
     started_at: Optional[str]
     completed_at: Optional[str]
@@ -90,7 +92,8 @@ def create_pipeline(
         description=request.description,
         steps=[step.dict() for step in request.steps],
         total_steps=len(request.steps),
-        stop_on_error=request.stop_on_error
+        stop_on_error=request.stop_on_error,
+        parallel_groups=request.parallel_groups
     )
 
     db.add(pipeline)
@@ -100,7 +103,7 @@ def create_pipeline(
     return pipeline
 
 
-def execute_pipeline_task(pipeline_id: str, db: Session):
+def execute_pipeline_task(pipeline_id: str, db: Session, resume: bool = False):
     """Task background per esecuzione pipeline"""
     # Converti pipeline_id da stringa a UUID per query SQLAlchemy
     try:
@@ -122,13 +125,9 @@ def execute_pipeline_task(pipeline_id: str, db: Session):
         # Crea orchestrator
         orchestrator = PipelineOrchestrator(db, settings)
 
-        # Callback per aggiornare progresso
-        def progress_callback(step_number: int, progress: int):
-            pipeline.current_step = step_number
-            db.commit()
-
-        # Esegui pipeline
-        result = orchestrator.execute_pipeline(pipeline, progress_callback)
+        # Nessun callback globale: current_step è scritto dall'orchestratore a inizio step
+        # e il progresso dei job con commit limitati (niente commit per ogni tick)
+        result = orchestrator.execute_pipeline(pipeline, resume=resume)
 
         # Aggiorna pipeline
         if result.get("success"):
@@ -169,6 +168,8 @@ async def create_new_pipeline(
     - Output di uno step → Input del successivo
     - Ogni step può essere enabled/disabled
     - stop_on_error: se true, ferma tutto al primo errore
+    - parallel_groups: se true, step translation consecutivi (lingue diverse) girano in parallelo
+      (o, se gli step dichiarano parameters.depends_on, gli step indipendenti dello stesso livello)
 
     **Esempio**:
     ```json
@@ -233,6 +234,15 @@ async def create_new_pipeline(
                 detail=f"job_type non valido: {step.job_type}. Validi: {valid_job_types}"
             )
 
+    # Verifica depends_on (DAG) prima di salvare: stesso controllo dell'esecuzione
+    if request.parallel_groups:
+        try:
+            PipelineOrchestrator._build_dag([
+                step.dict() for step in request.steps if step.enabled
+            ])
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Crea pipeline
     pipeline = create_pipeline(current_user, request, db)
 
@@ -254,6 +264,7 @@ async def create_new_pipeline(
 async def execute_pipeline(
     pipeline_id: str,
     background_tasks: BackgroundTasks,
+    resume: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -270,6 +281,9 @@ async def execute_pipeline(
 
     **Nota**: Solo step con `enabled: true` vengono eseguiti.
 
+    **Resume** (`?resume=true`): dopo un fallimento riprende dal checkpoint,
+    saltando gli step già completati i cui file output sono ancora su disco.
+
     Richiede JWT token. Elaborazione asincrona in background.
     """
     # Converti pipeline_id da stringa a UUID
@@ -309,7 +323,7 @@ async def execute_pipeline(
         )
 
     # Avvia esecuzione in background
-    background_tasks.add_task(execute_pipeline_task, str(pipeline.id), db)
+    background_tasks.add_task(execute_pipeline_task, str(pipeline.id), db, resume)
 
     # Stima durata (molto approssimativa)
     estimated_minutes = enabled_count * 3  # ~3 min per step
@@ -366,6 +380,7 @@ async def get_pipeline(
         "total_steps": pipeline.total_steps,
         "steps": pipeline.steps,
         "stop_on_error": pipeline.stop_on_error,
+        "parallel_groups": bool(pipeline.parallel_groups),
         "created_at": pipeline.created_at.isoformat(),
         "started_at": pipeline.started_at.isoformat() if pipeline.started_at else None,
         "completed_at": pipeline.completed_at.isoformat() if pipeline.completed_at else None,
@@ -8,10 +8,10 @@ from pathlib import Path
 from typing import Optional, List
 from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from pydantic import BaseModel, Field
 
-from app.core.database import get_db
+from app.core.database import get_db, commit_new
 from app.core.security import get_current_user
 from app.core.config import settings
 from app.core.usage_tracker import track_action
@@ -105,15 +105,14 @@ def create_screen_record_job(
     )
 
     db.add(job)
-    db.commit()
-    db.refresh(job)
+    commit_new(db, job)  # i chiamanti leggono solo job.id: nessun refresh
 
     return job
 
 
 def process_screen_record_task(job_id: str, params: ScreenRecordRequest, db: Session):
     """Task background per registrazione schermo"""
-    job = db.query(Job).filter(Job.id == job_id).first()
+    job = db.query(Job).options(joinedload(Job.payload)).filter(Job.id == job_id).first()
 
     if not job:
         return
@@ -281,7 +280,7 @@ async def get_job_status(
 
     Richiede JWT token. Puoi vedere solo i tuoi job.
     """
-    job = db.query(Job).filter(
+    job = db.query(Job).options(joinedload(Job.payload)).filter(
         Job.id == job_id,
         Job.user_id == current_user.id,
         Job.job_type == JobType.SCREEN_RECORD
@@ -322,7 +321,7 @@ async def stop_recording(
     from app.services.screen_record_service import stop_recording_by_job_id
 
     # Verifica che il job appartenga all'utente
-    job = db.query(Job).filter(
+    job = db.query(Job).options(joinedload(Job.payload)).filter(
         Job.id == job_id,
         Job.user_id == current_user.id,
         Job.job_type == JobType.SCREEN_RECORD
@@ -387,7 +386,7 @@ async def list_active_ffmpeg_jobs(
         }
 
     # Ottieni job dal database solo se hanno processo attivo
-    active_jobs = db.query(Job).filter(
+    active_jobs = db.query(Job).options(selectinload(Job.payload)).filter(
         Job.id.in_(active_recording_ids),
         Job.user_id == current_user.id,
         Job.job_type == JobType.SCREEN_RECORD
@@ -7,11 +7,11 @@ Route per generazione thumbnail YouTube con AI
 from pathlib import Path
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from pydantic import BaseModel
 import logging
 
-from app.core.database import get_db
+from app.core.database import get_db, commit_new
 from app.core.security import get_current_user
 from app.core.config import settings
 from app.core.usage_tracker import track_action
@@ -80,15 +80,14 @@ def create_thumbnail_job(
     )
 
     db.add(job)
-    db.commit()
-    db.refresh(job)
+    commit_new(db, job)  # i chiamanti leggono solo job.id: nessun refresh
 
     return job
 
 
 def process_thumbnail_task(job_id: str, params: ThumbnailRequest, db: Session):
     """Task background per generazione thumbnail"""
-    job = db.query(Job).filter(Job.id == job_id).first()
+    job = db.query(Job).options(joinedload(Job.payload)).filter(Job.id == job_id).first()
 
     if not job:
         return
@@ -302,7 +301,7 @@ async def get_job_status(
 
     Richiede JWT token. Puoi vedere solo i tuoi job.
     """
-    job = db.query(Job).filter(
+    job = db.query(Job).options(joinedload(Job.payload)).filter(
         Job.id == job_id,
         Job.user_id == current_user.id,
         Job.job_type == JobType.THUMBNAIL
@@ -8,10 +8,10 @@ from pathlib import Path
 from typing import Optional, List
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from pydantic import BaseModel
 
-from app.core.database import get_db
+from app.core.database import get_db, commit_new
 from app.core.security import get_current_user
 from app.core.config import settings
 from app.core.usage_tracker import track_action
@@ -58,8 +58,7 @@ def create_transcription_job(
     )
 
     db.add(job)
-    db.commit()
-    db.refresh(job)
+    commit_new(db, job)  # i chiamanti leggono solo job.id: nessun refresh
 
     return job
 
@@ -72,7 +71,7 @@ def process_transcription_task(job_id: str, params: TranscriptionRequest, db: Se
     except (ValueError, AttributeError):
         return
 
-    job = db.query(Job).filter(Job.id == job_id_uuid).first()
+    job = db.query(Job).options(joinedload(Job.payload)).filter(Job.id == job_id_uuid).first()
 
     if not job:
         return
@@ -242,7 +241,7 @@ async def get_job_status(
             detail="Job ID non valido"
         )
 
-    job = db.query(Job).filter(
+    job = db.query(Job).options(joinedload(Job.payload)).filter(
         Job.id == job_id_uuid,
         Job.user_id == current_user.id,
         Job.job_type == JobType.TRANSCRIPTION
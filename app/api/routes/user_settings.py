@@ -15,7 +15,7 @@ from datetime import datetime
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.user import User
-from app.models.user_settings import UserSettings, DEFAULT_SETTINGS
+from app.models.user_settings import get_default_settings, get_settings, update_settings
 
 router = APIRouter()
 
@@ -66,6 +66,27 @@ def deep_merge(base: dict, update: dict) -> dict:
     return result
 
 
+def set_path(base: dict, keys: list, value: Any) -> dict:
+    """
+    Copia di `base` con il valore impostato al path indicato (copy-on-write).
+
+    Copia solo i dict lungo il path: gli snapshot in cache non vengono mai
+    modificati in place.
+
+    Esempio:
+        set_path({"a": {"b": 1}}, ["a", "c"], 2) -> {"a": {"b": 1, "c": 2}}
+    """
+    result = base.copy()
+
+    if len(keys) == 1:
+        result[keys[0]] = value
+    else:
+        child = result.get(keys[0])
+        result[keys[0]] = set_path(child if isinstance(child, dict) else {}, keys[1:], value)
+
+    return result
+
+
 # ==================== Routes ====================
 
 @router.get("/settings", response_model=SettingsResponse)
@@ -79,21 +100,8 @@ async def get_user_settings(
     - Se l'utente non ha impostazioni salvate, ritorna le impostazioni di default
     - Richiede JWT token
     """
-    user_settings = db.query(UserSettings).filter(
-        UserSettings.user_id == current_user.id
-    ).first()
-
-    # Se non esistono settings, creali con valori di default
-    if not user_settings:
-        user_settings = UserSettings(
-            user_id=current_user.id,
-            settings=DEFAULT_SETTINGS.copy()
-        )
-        db.add(user_settings)
-        db.commit()
-        db.refresh(user_settings)
-
-    return user_settings
+    # Dalla cache per utente; se non esistono settings vengono creati con i default
+    return get_settings(db, current_user.id)
 
 
 @router.post("/settings", response_model=SettingsResponse)
@@ -133,30 +141,12 @@ async def save_user_settings(
     }
     ```
     """
-    user_settings = db.query(UserSettings).filter(
-        UserSettings.user_id == current_user.id
-    ).first()
-
-    if not user_settings:
-        # Prima volta: crea settings partendo da DEFAULT e applica modifiche
-        merged_settings = deep_merge(DEFAULT_SETTINGS.copy(), settings_data.settings)
-
-        user_settings = UserSettings(
-            user_id=current_user.id,
-            settings=merged_settings
-        )
-        db.add(user_settings)
-    else:
-        # Aggiorna: merge con settings esistenti
-        user_settings.settings = deep_merge(
-            user_settings.settings,
-            settings_data.settings
-        )
-
-    db.commit()
-    db.refresh(user_settings)
-
-    return user_settings
+    # Merge con settings esistenti (prima volta: partendo da DEFAULT)
+    return update_settings(
+        db,
+        current_user.id,
+        lambda current: deep_merge(current, settings_data.settings)
+    )
 
 
 @router.delete("/settings", status_code=status.HTTP_200_OK)
@@ -175,28 +165,12 @@ async def reset_user_settings(
     - Button "Ripristina Impostazioni Default" nelle Settings
     - Reset completo dello stato UI
     """
-    user_settings = db.query(UserSettings).filter(
-        UserSettings.user_id == current_user.id
-    ).first()
-
-    if user_settings:
-        # Reset: sovrascrivi con DEFAULT
-        user_settings.settings = DEFAULT_SETTINGS.copy()
-        db.commit()
-        db.refresh(user_settings)
-    else:
-        # Non esistevano settings: creali con DEFAULT
-        user_settings = UserSettings(
-            user_id=current_user.id,
-            settings=DEFAULT_SETTINGS.copy()
-        )
-        db.add(user_settings)
-        db.commit()
-        db.refresh(user_settings)
+    # Reset: sovrascrivi con DEFAULT (o crea se non esistevano)
+    user_settings = update_settings(db, current_user.id, lambda current: get_default_settings())
 
     return {
         "message": "Impostazioni ripristinate ai valori di default",
-        "settings": user_settings.settings
+        "settings": user_settings["settings"]
     }
 
 
@@ -230,31 +204,7 @@ async def update_single_setting(
     - Auto-save su singolo campo modificato
     - Performance (invio solo campo cambiato, non tutto il JSON)
     """
-    user_settings = db.query(UserSettings).filter(
-        UserSettings.user_id == current_user.id
-    ).first()
-
-    if not user_settings:
-        user_settings = UserSettings(
-            user_id=current_user.id,
-            settings=DEFAULT_SETTINGS.copy()
-        )
-        db.add(user_settings)
-
-    # Naviga nel dizionario usando il path
+    # Path con dot notation -> nuovo dict con il solo valore cambiato
     keys = setting_path.split('.')
-    current_dict = user_settings.settings
-
-    # Naviga fino al penultimo livello
-    for key in keys[:-1]:
-        if key not in current_dict:
-            current_dict[key] = {}
-        current_dict = current_dict[key]
-
-    # Aggiorna il valore finale
-    current_dict[keys[-1]] = value
-
-    db.commit()
-    db.refresh(user_settings)
 
-    return user_settings
+    return update_settings(db, current_user.id, lambda current: set_path(current, keys, value))
@@ -7,11 +7,11 @@ API per scaricare video da YouTube, TikTok, Vimeo, Twitter, Instagram, ecc.
 from pathlib import Path
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from pydantic import BaseModel, HttpUrl
 from datetime import datetime
 
-from app.core.database import get_db
+from app.core.database import get_db, commit_new
 from app.core.security import get_current_user
 from app.core.config import settings
 from app.core.usage_tracker import track_action
@@ -102,8 +102,7 @@ def create_download_job(
     )
 
     db.add(job)
-    db.commit()
-    db.refresh(job)
+    commit_new(db, job)  # i chiamanti leggono solo job.id: nessun refresh
 
     return job
 
@@ -123,7 +122,7 @@ def process_download_task(job_id: str, params: VideoDownloadRequest):
             db.close()
             return
 
-        job = db.query(Job).filter(Job.id == job_id_uuid).first()
+        job = db.query(Job).options(joinedload(Job.payload)).filter(Job.id == job_id_uuid).first()
 
         if not job:
             db.close()
@@ -305,7 +304,7 @@ async def get_download_status(
         )
 
     # Cerca job
-    job = db.query(Job).filter(
+    job = db.query(Job).options(joinedload(Job.payload)).filter(
         Job.id == job_id_uuid,
         Job.user_id == current_user.id
     ).first()
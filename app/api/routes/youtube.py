@@ -7,10 +7,10 @@ Route per upload video su YouTube con OAuth2
 from pathlib import Path
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from pydantic import BaseModel
 
-from app.core.database import get_db
+from app.core.database import get_db, commit_new
 from app.core.security import get_current_user
 from app.core.config import settings
 from app.core.usage_tracker import track_action
@@ -75,15 +75,14 @@ def create_youtube_job(
     )
 
     db.add(job)
-    db.commit()
-    db.refresh(job)
+    commit_new(db, job)  # i chiamanti leggono solo job.id: nessun refresh
 
     return job
 
 
 def process_youtube_upload_task(job_id: str, params: YouTubeUploadRequest, db: Session):
     """Task background per upload YouTube"""
-    job = db.query(Job).filter(Job.id == job_id).first()
+    job = db.query(Job).options(joinedload(Job.payload)).filter(Job.id == job_id).first()
 
     if not job:
         return
@@ -351,7 +350,7 @@ async def get_job_status(
 
     Richiede JWT token. Puoi vedere solo i tuoi job.
     """
-    job = db.query(Job).filter(
+    job = db.query(Job).options(joinedload(Job.payload)).filter(
         Job.id == job_id,
         Job.user_id == current_user.id,
         Job.job_type == JobType.YOUTUBE_UPLOAD
@@ -3,6 +3,9 @@ Admin Audit Logger
 ===================
 Helper per tracciare azioni amministrative.
 
+Le righe sono scritte in batch (INSERT Core multi-riga) dal worker di
+app.core.usage_tracker: log_admin_action non esegue più commit sulla sessione.
+
 Usage:
     from app.core.admin_audit import log_admin_action
 
@@ -19,10 +22,12 @@ Usage:
 """
 
 import logging
+from datetime import datetime
 from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
 from fastapi import Request
 
+from app.core.usage_tracker import enqueue_insert
 from app.models.admin_audit_log import AdminAuditLog
 from app.models.user import User
 
@@ -43,7 +48,7 @@ def log_admin_action(
     Log azione amministrativa
 
     Args:
-        db: Database session
+        db: Database session (non usata: insert in batch, mantenuta per compatibilità)
         admin_user: Utente admin che esegue l'azione
         action: Tipo azione (es. 'user.delete', 'user.promote_admin')
         target_type: Tipo entità target ('user', 'system', etc.)
@@ -80,21 +85,19 @@ def log_admin_action(
         - system.access_stats
     """
     try:
-        audit_log = AdminAuditLog(
-            admin_user_id=admin_user.id,
-            admin_username=admin_user.username,
-            admin_email=admin_user.email,
-            action=action,
-            target_type=target_type,
-            target_id=target_id,
-            target_identifier=target_identifier,
-            details=details,
-            ip_address=request.client.host if request else None,
-            user_agent=request.headers.get('user-agent') if request else None
-        )
-
-        db.add(audit_log)
-        db.commit()
+        enqueue_insert(AdminAuditLog.__table__, {
+            "admin_user_id": admin_user.id,
+            "admin_username": admin_user.username,
+            "admin_email": admin_user.email,
+            "action": action,
+            "target_type": target_type,
+            "target_id": target_id,
+            "target_identifier": target_identifier,
+            "details": details,
+            "timestamp": datetime.utcnow(),
+            "ip_address": request.client.host if request else None,
+            "user_agent": request.headers.get('user-agent') if request else None
+        })
 
         logger.info(
             f"🔐 AUDIT: {admin_user.username} executed '{action}' "
@@ -103,5 +106,4 @@ def log_admin_action(
 
     except Exception as e:
         logger.error(f"❌ Errore logging admin action: {e}")
-        db.rollback()
         # Non fallire l'operazione principale se logging audit fallisce
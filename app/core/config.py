@@ -49,6 +49,8 @@ class Settings(BaseSettings):
     rate_limit_enabled: bool = Field(default=True, description="Abilita rate limiting")
     rate_limit_requests: int = Field(default=100, description="Richieste max per finestra")
     rate_limit_window: int = Field(default=60, description="Finestra temporale (secondi)")
+    rate_limit_backend: str = Field(default="memory", description="Backend rate limiting: memory, redis")
+    trust_proxy_headers: bool = Field(default=True, description="Usa X-Forwarded-For/X-Real-IP per IP client (dietro reverse proxy)")
 
     # ==================== DATABASE ====================
     database_url: str = Field(
@@ -87,6 +89,7 @@ class Settings(BaseSettings):
     max_concurrent_jobs: int = Field(default=3, description="Max job concorrenti")
     ffmpeg_path: str = Field(default="ffmpeg", description="Path FFmpeg binary")
     ffprobe_path: str = Field(default="ffprobe", description="Path FFprobe binary")
+    compositor_force_sw: bool = Field(default=False, description="Compositor: forza encode software libx264 (niente NVENC/QSV)")
 
     # Formati supportati
     allowed_video_formats: List[str] = Field(
@@ -132,6 +135,7 @@ class Settings(BaseSettings):
     # ==================== LOGGING ====================
     log_level: str = Field(default="INFO", description="Logging level")
     log_file: Path = Field(default=Path("logs/app.log"), description="Log file path")
+    log_json: bool = Field(default=False, description="Log in formato JSON (una riga per record)")
 
     @validator('secret_key')
     def validate_secret_key(cls, v):
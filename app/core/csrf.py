@@ -13,7 +13,31 @@ from fastapi.responses import Response
 from starlette.middleware.base import BaseHTTPMiddleware
 import secrets
 import hashlib
-from typing import Callable
+import hmac
+from typing import Callable, Optional
+
+from app.core.config import settings
+
+
+# Lunghezza (byte) di nonce e MAC: 16 + 16 = 32 byte = 64 caratteri hex
+_NONCE_SIZE = 16
+_MAC_SIZE = 16
+
+
+def _mac(key: bytes, msg: bytes) -> bytes:
+    """
+    MAC keyed BLAKE2b-128 (non serve HMAC: BLAKE2b supporta la chiave nativamente).
+
+    BLAKE2b è più veloce di SHA-256 su x86-64 senza SHA-NI.
+    """
+    return hashlib.blake2b(msg, key=key, digest_size=_MAC_SIZE).digest()
+
+
+def _derive_key(secret_key: str) -> bytes:
+    """Chiave CSRF derivata dalla secret key (BLAKE2b accetta chiavi max 64 byte)"""
+    return hashlib.blake2b(
+        secret_key.encode(), person=b"aivm-csrf", digest_size=32
+    ).digest()
 
 
 class CSRFProtectionMiddleware(BaseHTTPMiddleware):
@@ -46,12 +70,16 @@ class CSRFProtectionMiddleware(BaseHTTPMiddleware):
         "/openapi.json",
     ]
 
+    # Tuple per str.startswith: un solo check C-level su tutti i prefissi
+    _EXCLUDED_PREFIXES = tuple(EXCLUDED_PATHS)
+
     # Metodi che richiedono CSRF token
-    PROTECTED_METHODS = ["POST", "PUT", "DELETE", "PATCH"]
+    PROTECTED_METHODS = frozenset({"POST", "PUT", "DELETE", "PATCH"})
 
     def __init__(self, app, secret_key: str):
         super().__init__(app)
         self.secret_key = secret_key
+        self._key = _derive_key(secret_key)
 
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """
@@ -70,7 +98,7 @@ class CSRFProtectionMiddleware(BaseHTTPMiddleware):
             return response
 
         # Skip CSRF per path esclusi
-        if self._is_excluded_path(request.url.path):
+        if self._is_excluded_path(request.scope["path"]):
             response = await call_next(request)
             return response
 
@@ -98,32 +126,43 @@ class CSRFProtectionMiddleware(BaseHTTPMiddleware):
 
     def _is_excluded_path(self, path: str) -> bool:
         """Check se path è escluso da CSRF protection"""
-        return any(path.startswith(excluded) for excluded in self.EXCLUDED_PATHS)
+        return path.startswith(self._EXCLUDED_PREFIXES)
 
     def _validate_token(self, token: str) -> bool:
         """
         Valida CSRF token
 
-        Per semplicità, accetta qualsiasi token non vuoto.
-        In produzione avanzata: validare contro token salvato in session/cookie.
+        Il token è `nonce || MAC(nonce)` in hex: valido solo se il MAC
+        corrisponde a quello calcolato con la secret key del server.
         """
-        # Basic validation: token deve essere almeno 32 caratteri hex
-        if not token or len(token) < 32:
-            return False
+        return _verify_token(token, self._key)
+
 
-        # Verifica formato hex
-        try:
-            int(token, 16)
-            return True
-        except ValueError:
-            return False
+def _verify_token(token: str, key: bytes) -> bool:
+    """Verifica firma del token (confronto constant-time)"""
+    if not token or len(token) != (_NONCE_SIZE + _MAC_SIZE) * 2:
+        return False
 
+    # Verifica formato hex
+    try:
+        raw = bytes.fromhex(token)
+    except ValueError:
+        return False
 
-def generate_csrf_token() -> str:
+    nonce, mac = raw[:_NONCE_SIZE], raw[_NONCE_SIZE:]
+    return hmac.compare_digest(mac, _mac(key, nonce))
+
+
+def generate_csrf_token(secret_key: Optional[str] = None) -> str:
     """
-    Genera CSRF token sicuro
+    Genera CSRF token sicuro firmato
+
+    Args:
+        secret_key: Chiave di firma (default: settings.secret_key)
 
     Returns:
-        str: CSRF token (32 byte hex = 64 caratteri)
+        str: CSRF token (nonce 16 byte + MAC 16 byte, hex = 64 caratteri)
     """
-    return secrets.token_hex(32)
+    key = _derive_key(secret_key or settings.secret_key)
+    nonce = secrets.token_bytes(_NONCE_SIZE)
+    return (nonce + _mac(key, nonce)).hex()
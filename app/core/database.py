@@ -4,26 +4,63 @@ Database Setup - PostgreSQL + SQLAlchemy
 Configurazione database con async support e session management.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, DDL
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import inspect
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.pool import StaticPool
-from typing import Generator
+from typing import Generator, AsyncGenerator, Optional
 import logging
+import orjson
+
+try:
+    import asyncpg  # noqa: F401
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+    ASYNC_DB_AVAILABLE = True
+except ImportError:
+    ASYNC_DB_AVAILABLE = False
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Batch INSERT/UPDATE multi-riga (es. audit log) in un solo round-trip:
+# con psycopg2 gli executemany diventano INSERT ... VALUES (...),(...) a pagine
+_engine_options = {}
+if make_url(settings.database_url).get_driver_name() == "psycopg2":
+    _engine_options = {
+        "executemany_mode": "values_plus_batch",
+        "insertmanyvalues_page_size": 1000,
+    }
+
+
+def _json_serializer(value) -> str:
+    """Serializzazione colonne JSON/JSONB con orjson (C) invece di json stdlib"""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
 # Create SQLAlchemy engine
 engine = create_engine(
     settings.database_url,
     echo=settings.database_echo,
     pool_pre_ping=True,  # Verifica connessione prima di usarla
     pool_size=10,
-    max_overflow=20
+    max_overflow=20,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
+    **_engine_options
 )
 
+# SQLite applica le foreign key (e quindi ON DELETE CASCADE) solo se abilitate per connessione
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 # Session factory
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -31,9 +68,38 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# Async engine (asyncpg) per endpoint async: I/O non bloccante, niente threadpool.
+# Gli endpoint esistenti restano su Session sync; i nuovi possono usare get_async_db.
+async_engine: Optional["AsyncEngine"] = None
+AsyncSessionLocal = None
+
+if ASYNC_DB_AVAILABLE and settings.database_url.startswith("postgresql"):
+    async_engine = create_async_engine(
+        "postgresql+asyncpg://" + settings.database_url.split("://", 1)[1],
+        echo=settings.database_echo,
+        pool_pre_ping=True,
+        pool_size=20,
+        max_overflow=40,
+        json_serializer=_json_serializer,
+        json_deserializer=orjson.loads
+    )
+
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
 # Base class per modelli
 Base = declarative_base()
 
+# Estensioni PostgreSQL richieste dai modelli (CITEXT per email/username)
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS citext").execute_if(dialect="postgresql")
+)
+
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -50,6 +116,50 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def commit_new(db: Session, instance) -> None:
+    """
+    Commit di un'istanza appena aggiunta senza refresh.
+
+    Il commit espira tutti gli attributi: leggere instance.id dopo farebbe un
+    SELECT (come db.refresh). Le PK sono generate lato client (uuid7) e già
+    note dall'identity key: vengono rimesse tra i valori caricati.
+    Gli altri attributi restano expired e si caricano solo se letti.
+
+    Args:
+        db: Database session
+        instance: Istanza aggiunta con db.add()
+    """
+    db.commit()
+
+    state = inspect(instance)
+    for column, value in zip(state.mapper.primary_key, state.identity):
+        set_committed_value(instance, state.mapper.get_property_by_column(column).key, value)
+
+
+async def get_async_db() -> AsyncGenerator["AsyncSession", None]:
+    """
+    Dependency per ottenere database session async (asyncpg).
+    Uso in FastAPI routes async con Depends(get_async_db).
+
+    Yields:
+        AsyncSession: Database session async
+
+    Raises:
+        RuntimeError: Se asyncpg non installato o database non PostgreSQL
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database non disponibile. Installa: pip install asyncpg")
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    """Chiude pool connessioni async. Chiamare allo shutdown app."""
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
 def init_db():
     """
     Inizializza database creando tutte le tabelle.
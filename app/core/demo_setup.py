@@ -10,6 +10,7 @@ senza necessità di registrazione manuale.
 In production mode, questo modulo è disabilitato.
 """
 
+import os
 import logging
 from sqlalchemy.orm import Session
 
@@ -24,6 +25,9 @@ DEMO_EMAIL = "demo@aivideomaker.dev"
 DEMO_PASSWORD = "demo123"  # Password debole OK in dev
 DEMO_USERNAME = "demo"
 
+# Hash pre-calcolato opzionale di DEMO_PASSWORD (evita hashing Argon2 ad ogni avvio in CI)
+_DEMO_HASH = os.environ.get("DEMO_PASSWORD_HASH")
+
 
 def setup_demo_user(db: Session) -> bool:
     """
@@ -70,7 +74,7 @@ def setup_demo_user(db: Session) -> bool:
         demo_user = User(
             email=DEMO_EMAIL,
             username=DEMO_USERNAME,
-            hashed_password=get_password_hash(DEMO_PASSWORD),
+            hashed_password=_DEMO_HASH or get_password_hash(DEMO_PASSWORD),
             is_active=True,
             is_admin=True  # Admin per accesso completo in dev
         )
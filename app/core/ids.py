@@ -0,0 +1,43 @@
+"""
+ID Generation - UUIDv7
+======================
+UUID ordinati nel tempo (RFC 9562 v7) per le primary key.
+
+Con UUIDv4 (random) ogni insert finisce in una pagina casuale dell'indice
+B-tree della PK: page split, WAL gonfio, cache locality scarsa.
+UUIDv7 inizia con il timestamp in millisecondi, quindi gli insert si
+appendono al bordo destro dell'indice. Stesso tipo/dimensione (16 byte).
+
+Layout: 48 bit timestamp ms | 4 bit versione (7) | 12 bit rand_a |
+        2 bit variante (10) | 62 bit rand_b
+"""
+
+import os
+import time
+import uuid
+
+_TIMESTAMP_MASK = (1 << 48) - 1
+_RAND_B_MASK = (1 << 62) - 1
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Genera UUIDv7 (time-ordered).
+
+    Returns:
+        uuid.UUID: UUID versione 7
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")  # 80 bit random
+
+    rand_a = rand >> 68  # 12 bit
+    rand_b = rand & _RAND_B_MASK  # 62 bit
+
+    value = (
+        (timestamp_ms & _TIMESTAMP_MASK) << 80
+        | 0x7 << 76
+        | rand_a << 64
+        | 0b10 << 62
+        | rand_b
+    )
+    return uuid.UUID(int=value)
@@ -0,0 +1,48 @@
+"""
+JSON Logging - Formatter record di log in JSON (una riga per record)
+=====================================================================
+Attivo con LOG_JSON=true (settings.log_json): ogni record diventa un oggetto
+JSON serializzato con orjson, pronto per aggregatori di log (Loki, ELK, ...).
+
+I campi passati con `extra=` finiscono come chiavi dell'oggetto:
+
+    logger.info("📋 Step %s/%s: %s", step, total, job_type,
+                extra={"pipeline_id": pipeline_id, "step": step})
+
+    → {"timestamp": "...", "level": "INFO", "logger": "...",
+       "message": "📋 Step 1/3: chromakey", "pipeline_id": "...", "step": 1}
+"""
+
+import logging
+from datetime import datetime, timezone
+
+import orjson
+
+# Attributi standard di LogRecord: tutto il resto nel __dict__ arriva da extra=
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+    "taskName",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatter che serializza il record (più i campi extra) in JSON con orjson"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            # orjson serializza datetime e UUID nativamente (niente isoformat/str in Python)
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+
+        return orjson.dumps(entry, default=str).decode()
@@ -8,24 +8,30 @@ In production può essere sostituito con:
 - SlowAPI library per features avanzate
 """
 
+import re
 import time
+import asyncio
 import logging
-from typing import Dict, Tuple
-from collections import defaultdict
+import threading
+from typing import Dict, List, Tuple
 from fastapi import Request, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import Scope, Receive, Send
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Numero shard (potenza di 2) per lo storage per-IP
+_NUM_SHARDS = 32
+
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
     Middleware rate limiting per protezione API.
 
-    Implementazione in-memory con sliding window.
+    Implementazione in-memory con sliding window counter (due finestre).
 
     Features:
     - Rate limiting per IP address
@@ -42,50 +48,74 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             logger.info("⚠️  Rate limiting DISABILITATO")
             return
 
-        # In-memory storage: {ip: [(timestamp, count)]}
-        self.requests: Dict[str, list] = defaultdict(list)
+        # In-memory storage shardato per hash(ip): {ip: (window_index, count_corrente, count_precedente)}
+        # Un lock per shard: meno contesa tra thread (rilevante con Python free-threaded)
+        self._shards: List[Dict[str, Tuple[int, int, int]]] = [{} for _ in range(_NUM_SHARDS)]
+        self._locks = [threading.Lock() for _ in range(_NUM_SHARDS)]
+
+        # GC periodico degli IP inattivi (avviato alla prima richiesta, serve un event loop)
+        self._gc_task = None
+
+        # Estrazione IP scelta una volta: senza proxy fidato niente lookup header per richiesta
+        self._get_client_ip = (
+            self._get_proxied_client_ip if settings.trust_proxy_headers
+            else self._get_direct_client_ip
+        )
 
         # Config da settings
         self.max_requests = settings.rate_limit_requests  # Default: 100
         self.window_seconds = settings.rate_limit_window  # Default: 60
 
         # Endpoint esclusi da rate limiting
-        self.excluded_paths = {
+        self.excluded_paths = frozenset({
             "/",
             "/health",
             "/docs",
             "/redoc",
             "/openapi.json"
-        }
+        })
+
+        # Prefissi esclusi (static files) compilati in una sola regex: un match C-level per richiesta
+        self.excluded_prefixes = ("/static", "/uploads", "/outputs")
+        self._exclude_re = re.compile(
+            "^(?:" + "|".join(re.escape(prefix) for prefix in self.excluded_prefixes) + ")"
+        )
 
         logger.info(f"✅ Rate limiting ABILITATO: {self.max_requests} req/{self.window_seconds}s")
 
-    async def dispatch(self, request: Request, call_next):
-        """Middleware dispatcher"""
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """
+        Entry point ASGI: richieste escluse (o middleware disabilitato) passano
+        direttamente all'app, senza costruire Request né task di BaseHTTPMiddleware.
+        """
+        if scope["type"] != "http" or not self.enabled or self._is_excluded(scope["path"]):
+            await self.app(scope, receive, send)
+            return
 
-        # Se disabilitato, passa through
-        if not self.enabled:
-            return await call_next(request)
+        await super().__call__(scope, receive, send)
 
-        # Skippa endpoint esclusi
-        if request.url.path in self.excluded_paths:
-            return await call_next(request)
+    def _is_excluded(self, path: str) -> bool:
+        """Check se path è escluso da rate limiting (static files o endpoint pubblici)"""
+        return self._exclude_re.match(path) is not None or path in self.excluded_paths
+
+    async def dispatch(self, request: Request, call_next):
+        """Middleware dispatcher (solo richieste soggette a rate limit)"""
 
-        # Skippa static files
-        if request.url.path.startswith("/static") or request.url.path.startswith("/uploads") or request.url.path.startswith("/outputs"):
-            return await call_next(request)
+        # Avvia GC IP inattivi (lazy: in __init__ non c'è ancora un event loop)
+        if self._gc_task is None:
+            self._gc_task = asyncio.create_task(self._gc_loop())
 
         # Ottieni client IP
         client_ip = self._get_client_ip(request)
 
         # Check rate limit
-        is_allowed, remaining, reset_time = self._check_rate_limit(client_ip)
+        is_allowed, remaining, reset_time = await self._check_rate_limit_async(client_ip)
 
         if not is_allowed:
             # Rate limit exceeded
             logger.warning(f"🚫 Rate limit exceeded for IP: {client_ip}")
 
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "error": "Rate limit exceeded",
@@ -110,7 +140,13 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
         return response
 
-    def _get_client_ip(self, request: Request) -> str:
+    @staticmethod
+    def _get_direct_client_ip(request: Request) -> str:
+        """Estrai IP client dalla connessione (nessun proxy fidato)"""
+        return request.client.host if request.client else "unknown"
+
+    @staticmethod
+    def _get_proxied_client_ip(request: Request) -> str:
         """Estrai IP client (gestisce proxy)"""
         # Check proxy headers
         forwarded = request.headers.get("X-Forwarded-For")
@@ -128,49 +164,110 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
         return "unknown"
 
+    async def _check_rate_limit_async(self, client_ip: str) -> Tuple[bool, int, float]:
+        """Hook async per backend remoti (es. Redis). Default: in-memory."""
+        return self._check_rate_limit(client_ip)
+
+    @staticmethod
+    def _shard_index(ip: str) -> int:
+        """Indice shard per IP"""
+        return hash(ip) & (_NUM_SHARDS - 1)
+
     def _check_rate_limit(self, client_ip: str) -> Tuple[bool, int, float]:
         """
-        Verifica rate limit per IP
+        Verifica rate limit per IP (sliding window counter)
+
+        Stima richieste nell'ultima finestra pesando il contatore della
+        finestra precedente: prev * (1 - elapsed/window) + cur.
+        O(1) per richiesta, memoria costante per IP.
 
         Returns:
             (is_allowed, remaining_requests, reset_timestamp)
         """
         current_time = time.time()
-        window_start = current_time - self.window_seconds
+        window = self.window_seconds
+        window_index = int(current_time // window)
+
+        shard_index = self._shard_index(client_ip)
+        counters = self._shards[shard_index]
 
-        # Cleanup vecchie richieste (fuori dalla finestra)
-        self.requests[client_ip] = [
-            timestamp for timestamp in self.requests[client_ip]
-            if timestamp > window_start
-        ]
+        with self._locks[shard_index]:
+            stored_index, cur, prev = counters.get(client_ip, (window_index, 0, 0))
 
-        # Conta richieste nella finestra corrente
-        request_count = len(self.requests[client_ip])
+            # Rotazione finestre
+            if stored_index == window_index - 1:
+                prev, cur = cur, 0
+            elif stored_index != window_index:
+                prev, cur = 0, 0
 
-        # Check se limite superato
-        if request_count >= self.max_requests:
-            # Reset time = timestamp prima richiesta + window
-            oldest_request = min(self.requests[client_ip]) if self.requests[client_ip] else current_time
-            reset_time = oldest_request + self.window_seconds
+            elapsed = current_time - window_index * window
+            estimated = prev * (1 - elapsed / window) + cur
+            reset_time = (window_index + 1) * window
 
-            return False, 0, reset_time
+            # Check se limite superato
+            if estimated >= self.max_requests:
+                counters[client_ip] = (window_index, cur, prev)
+                return False, 0, reset_time
 
-        # Aggiungi richiesta corrente
-        self.requests[client_ip].append(current_time)
+            # Conta richiesta corrente
+            counters[client_ip] = (window_index, cur + 1, prev)
 
         # Calcola remaining
-        remaining = self.max_requests - (request_count + 1)
-        reset_time = current_time + self.window_seconds
+        remaining = max(0, int(self.max_requests - estimated - 1))
 
         return True, remaining, reset_time
 
+    async def _gc_loop(self):
+        """
+        Rimuove periodicamente (ogni mezza finestra) i contatori degli IP inattivi.
+
+        Evita crescita illimitata della memoria con molti IP unici (es. scanner)
+        senza scansionare il dict nel path della richiesta.
+        """
+        interval = self.window_seconds / 2
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self._collect_idle_ips()
+            except Exception as e:
+                logger.warning(f"⚠️  Errore GC rate limit: {e}")
+
+    def _collect_idle_ips(self) -> int:
+        """
+        Elimina IP senza richieste nella finestra corrente né nella precedente.
+
+        Returns:
+            int: Numero di IP rimossi
+        """
+        current_index = int(time.time() // self.window_seconds)
+        removed = 0
+
+        for counters, lock in zip(self._shards, self._locks):
+            with lock:
+                idle = [
+                    ip for ip, (window_index, _, _) in counters.items()
+                    if window_index < current_index - 1
+                ]
+                for ip in idle:
+                    del counters[ip]
+            removed += len(idle)
+
+        if removed:
+            logger.debug(f"Rate limit GC: rimossi {removed} IP inattivi")
+
+        return removed
+
     def clear_ip(self, ip: str):
         """Pulisci rate limit per IP specifico (admin use)"""
-        if ip in self.requests:
-            del self.requests[ip]
+        shard_index = self._shard_index(ip)
+        with self._locks[shard_index]:
+            removed = self._shards[shard_index].pop(ip, None)
+        if removed is not None:
             logger.info(f"Rate limit cleared for IP: {ip}")
 
     def clear_all(self):
         """Pulisci tutti rate limits (admin use)"""
-        self.requests.clear()
+        for counters, lock in zip(self._shards, self._locks):
+            with lock:
+                counters.clear()
         logger.info("All rate limits cleared")
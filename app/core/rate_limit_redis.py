@@ -0,0 +1,102 @@
+"""
+Redis Rate Limiting Middleware
+===============================
+Rate limiting distribuito con Redis: il limite è condiviso tra tutti i
+worker uvicorn / istanze dell'app (l'in-memory è per-processo, quindi con
+N worker il limite effettivo diventa N * max_requests).
+
+Fixed window atomica via script Lua (INCR + PEXPIRE in un solo round-trip).
+Le chiavi scadono da sole con il TTL: nessuna crescita di memoria per IP inattivi.
+
+Se Redis non è installato o non raggiungibile, degrada al rate limiting
+in-memory di RateLimitMiddleware.
+"""
+
+import time
+import logging
+from typing import Tuple
+
+from app.core.config import settings
+from app.core.rate_limit import RateLimitMiddleware
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    RedisError = Exception
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = chiave IP, ARGV[1] = finestra in ms
+# Ritorna {count, ttl_ms_residuo}
+RATE_LIMIT_LUA = """
+local c = redis.call('INCR', KEYS[1])
+if c == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[1])
+end
+return {c, redis.call('PTTL', KEYS[1])}
+"""
+
+
+class RedisRateLimitMiddleware(RateLimitMiddleware):
+    """
+    Middleware rate limiting con backend Redis.
+
+    Stessi endpoint esclusi e headers di RateLimitMiddleware;
+    cambia solo lo storage dei contatori.
+    """
+
+    KEY_PREFIX = "ratelimit:"
+
+    def __init__(self, app, enabled: bool = True):
+        super().__init__(app, enabled=enabled)
+
+        self.redis = None
+        self._script = None
+
+        if not self.enabled:
+            return
+
+        if not REDIS_AVAILABLE or not settings.redis_url:
+            logger.warning("⚠️  Redis non disponibile: rate limiting in-memory (per-processo)")
+            return
+
+        # Il client si connette in modo lazy alla prima richiesta
+        self.redis = aioredis.from_url(settings.redis_url)
+        # register_script: SCRIPT LOAD una volta, poi EVALSHA (fallback EVAL su NOSCRIPT)
+        self._script = self.redis.register_script(RATE_LIMIT_LUA)
+        self._window_ms = self.window_seconds * 1000
+
+        logger.info(f"✅ Rate limiting su Redis: {settings.redis_url}")
+
+    async def _check_rate_limit_async(self, client_ip: str) -> Tuple[bool, int, float]:
+        """
+        Verifica rate limit per IP su Redis
+
+        Returns:
+            (is_allowed, remaining_requests, reset_timestamp)
+        """
+        if self._script is None:
+            return self._check_rate_limit(client_ip)
+
+        try:
+            count, ttl_ms = await self._script(
+                keys=[self.KEY_PREFIX + client_ip],
+                args=[self._window_ms]
+            )
+        except RedisError as e:
+            # Degradazione graceful: meglio un limite per-processo che nessun limite
+            logger.warning(f"⚠️  Redis rate limit non disponibile, fallback in-memory: {e}")
+            return self._check_rate_limit(client_ip)
+
+        count = int(count)
+        ttl_ms = int(ttl_ms)
+        reset_time = time.time() + (ttl_ms if ttl_ms > 0 else self._window_ms) / 1000
+
+        if count > self.max_requests:
+            return False, 0, reset_time
+
+        return True, self.max_requests - count, reset_time
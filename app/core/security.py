@@ -5,18 +5,28 @@ JWT tokens, password hashing, API keys management.
 """
 
 from datetime import datetime, timedelta
-from typing import Optional, Any
+from typing import Optional, Any, Union
 from uuid import UUID
-from jose import JWTError, jwt
+import jwt
+from jwt import PyJWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Security, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func, bindparam, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from functools import lru_cache
+from collections import OrderedDict
+import time
 import secrets
 import hashlib
+import hmac
+import base64
+import threading
+from cachetools import TTLCache
 
 from app.core.config import settings
 from app.core.database import get_db
+from app.core import write_buffer
 
 # Password hashing context
 # Usiamo Argon2 invece di bcrypt (più moderno, vincitore PHC 2015)
@@ -27,9 +37,28 @@ bearer_scheme = HTTPBearer()
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 
+# Cache verifiche password riuscite: {(hash, sha256(plain)): True}
+# Solo risultati positivi (i negativi pagano sempre Argon2). L'hash nella chiave
+# invalida le entry quando la password viene cambiata.
+_password_verify_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+_password_verify_lock = threading.Lock()
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica password contro hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verifica password contro hash (con cache TTL dei successi)"""
+    cache_key = (hashed_password, hashlib.sha256(plain_password.encode()).digest())
+
+    with _password_verify_lock:
+        if cache_key in _password_verify_cache:
+            return True
+
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False
+
+    with _password_verify_lock:
+        _password_verify_cache[cache_key] = True
+
+    return True
 
 
 def get_password_hash(password: str) -> str:
@@ -41,12 +70,46 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# Versione encoding claim "sub": 2 = UUID come base64url dei 16 byte (22 caratteri)
+JWT_SUB_VERSION = 2
+
+
+def encode_token_subject(user_id: UUID) -> str:
+    """Codifica UUID come base64url senza padding (22 caratteri)"""
+    return base64.urlsafe_b64encode(user_id.bytes).rstrip(b"=").decode()
+
+
+def get_token_subject(payload: dict) -> Optional[UUID]:
+    """
+    Estrae user_id (UUID) dal claim "sub" di un payload JWT.
+
+    Supporta sia il formato compatto (sv=2, base64url) che il legacy (UUID stringa).
+
+    Args:
+        payload: Payload JWT decodificato
+
+    Returns:
+        UUID: User ID, None se assente o malformato
+    """
+    sub = payload.get("sub")
+    if not isinstance(sub, str):
+        return None
+
+    try:
+        if payload.get("sv") == JWT_SUB_VERSION:
+            return UUID(bytes=base64.urlsafe_b64decode(sub + "=="))
+        return UUID(sub)
+    except (ValueError, TypeError):
+        return None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Crea JWT access token
 
     Args:
-        data: Payload del token (es: {"sub": user_id})
+        data: Payload del token (es: {"sub": user_id}). Se "sub" è un UUID
+            viene serializzato in forma compatta (vedi get_token_subject)
         expires_delta: Durata token (default da config)
 
     Returns:
@@ -54,12 +117,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     """
     to_encode = data.copy()
 
+    if isinstance(to_encode.get("sub"), UUID):
+        to_encode["sub"] = encode_token_subject(to_encode["sub"])
+        to_encode["sv"] = JWT_SUB_VERSION
+
+    # Epoch interi: nessun datetime da allocare/convertire
+    now = int(time.time())
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
+        expire = now + settings.access_token_expire_minutes * 60
 
-    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
+    to_encode.update({"exp": expire, "iat": now})
 
     encoded_jwt = jwt.encode(
         to_encode,
@@ -70,26 +139,53 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+# Cache LRU token già verificati: {token: (payload, exp)}
+# Solo token con firma valida entrano in cache; scaduti vengono ri-decodificati (e rifiutati).
+_TOKEN_CACHE_MAX_SIZE = 4096
+_token_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
 def decode_access_token(token: str) -> Optional[dict]:
     """
     Decodifica e valida JWT token
 
+    Verifica firma una sola volta per token: le chiamate successive entro
+    la scadenza usano il payload in cache.
+
     Args:
         token: JWT token string
 
     Returns:
         dict: Payload token se valido, None altrimenti
     """
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+        if cached is not None:
+            payload, exp = cached
+            if exp > time.time():
+                _token_cache.move_to_end(token)
+                return dict(payload)
+            del _token_cache[token]
+
     try:
         payload = jwt.decode(
             token,
             settings.secret_key,
             algorithms=[settings.algorithm]
         )
-        return payload
-    except JWTError:
+    except PyJWTError:
         return None
 
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        with _token_cache_lock:
+            _token_cache[token] = (payload, exp)
+            if len(_token_cache) > _TOKEN_CACHE_MAX_SIZE:
+                _token_cache.popitem(last=False)
+
+    return dict(payload)
+
 
 def generate_api_key() -> str:
     """
@@ -101,6 +197,62 @@ def generate_api_key() -> str:
     return secrets.token_hex(32)
 
 
+# Cache utenti autenticati: {user_id: snapshot User detached}
+# Su hit l'utente viene riattaccato alla session corrente con merge(load=False), senza query.
+# Invalidata dagli eventi ORM update/delete su User (registrati in app.models.user);
+# TTL breve copre gli altri worker.
+_user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+_user_cache_lock = threading.Lock()
+
+
+def invalidate_cached_user(user_id: UUID):
+    """Rimuove utente dalla cache di get_current_user"""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+@lru_cache(maxsize=None)
+def _user_by_id_statement():
+    """Statement SELECT utente per id, costruito una sola volta (con bindparam)"""
+    # Import qui per evitare circular import
+    from app.models.user import User
+
+    return select(User).where(User.id == bindparam("uid"))
+
+
+def _load_user(db: Session, user_id: UUID) -> Any:
+    """
+    Carica utente per id passando dalla cache.
+
+    Args:
+        db: Database session
+        user_id: ID utente
+
+    Returns:
+        User: Utente attaccato a `db`, None se non esiste
+    """
+    statement = _user_by_id_statement()
+
+    with _user_cache_lock:
+        cached = _user_cache.get(user_id)
+
+    if cached is not None:
+        return db.merge(cached, load=False)
+
+    user = db.execute(statement, {"uid": user_id}).scalar_one_or_none()
+
+    if user is not None:
+        # Snapshot detached delle sole colonne: l'istanza della request resta alla sua session
+        mapper = inspect(type(user))
+        snapshot = mapper.class_(**{attr.key: getattr(user, attr.key) for attr in mapper.column_attrs})
+        make_transient_to_detached(snapshot)
+
+        with _user_cache_lock:
+            _user_cache[user_id] = snapshot
+
+    return user
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Security(bearer_scheme),
     db: Session = Depends(get_db)
@@ -131,23 +283,14 @@ async def get_current_user(
         if payload is None:
             raise credentials_exception
 
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-
-        # Converti user_id da stringa a UUID per query SQLAlchemy
-        try:
-            user_id_uuid = UUID(user_id)
-        except (ValueError, AttributeError):
+        user_id_uuid = get_token_subject(payload)
+        if user_id_uuid is None:
             raise credentials_exception
 
     except Exception:
         raise credentials_exception
 
-    # Import qui per evitare circular import
-    from app.models.user import User
-
-    user = db.query(User).filter(User.id == user_id_uuid).first()
+    user = _load_user(db, user_id_uuid)
 
     if user is None:
         raise credentials_exception
@@ -161,27 +304,9 @@ async def get_current_user(
     return user
 
 
-async def get_current_active_user(
-    current_user = Depends(get_current_user)
-) -> Any:
-    """
-    Dependency per ottenere utente attivo.
-
-    Args:
-        current_user: Utente da get_current_user
-
-    Returns:
-        User: Utente attivo
-
-    Raises:
-        HTTPException: Se utente non attivo
-    """
-    if not current_user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Inactive user"
-        )
-    return current_user
+# get_current_user verifica già is_active: alias per evitare una dependency
+# (e un await) in più su ogni richiesta autenticata
+get_current_active_user = get_current_user
 
 
 async def verify_api_key(
@@ -221,9 +346,19 @@ async def verify_api_key(
             detail="Invalid API key"
         )
 
-    # Aggiorna last_used
-    db_api_key.last_used_at = datetime.utcnow()
-    db.commit()
+    # Aggiorna last_used + usage_count (bufferizzato fuori dal request path).
+    # Fallback: un solo UPDATE atomico (usage_count + 1 calcolato dal DB, niente read-modify-write)
+    now = datetime.utcnow()
+    if not write_buffer.touch_api_key(db_api_key.id, now):
+        db.execute(
+            update(APIKey.__table__)
+            .where(APIKey.__table__.c.id == db_api_key.id)
+            .values(
+                usage_count=func.coalesce(APIKey.__table__.c.usage_count, 0) + 1,
+                last_used_at=now
+            )
+        )
+        db.commit()
 
     return db_api_key.user
 
@@ -254,22 +389,24 @@ def generate_refresh_token() -> str:
     Genera refresh token sicuro (64 caratteri hex = 256 bit)
 
     Returns:
-        str: Refresh token
+        str: Refresh token (hex, per trasporto al client)
     """
-    return secrets.token_hex(32)
+    return secrets.token_bytes(32).hex()
 
 
-def hash_refresh_token(token: str) -> str:
+def hash_refresh_token(token: Union[str, bytes]) -> bytes:
     """
     Hash refresh token con SHA256 per storage sicuro nel database.
 
     Args:
-        token: Refresh token in chiaro
+        token: Refresh token in chiaro (str hex dal client o bytes già codificati)
 
     Returns:
-        str: Hash SHA256 del token
+        bytes: Digest SHA256 del token (32 byte, formato colonna token_hash)
     """
-    return hashlib.sha256(token.encode()).hexdigest()
+    if isinstance(token, str):
+        token = token.encode()
+    return hashlib.sha256(token).digest()
 
 
 def create_refresh_token(
@@ -345,16 +482,19 @@ def verify_refresh_token(token: str, db: Session) -> Optional[UUID]:
         RefreshToken.token_hash == token_hash
     ).first()
 
-    if not db_token:
+    # Confronto constant-time dell'hash (difesa in profondità oltre al lookup indicizzato)
+    if not db_token or not hmac.compare_digest(db_token.token_hash, token_hash):
         return None
 
     # Verifica validità
     if not db_token.is_valid:
         return None
 
-    # Aggiorna last_used_at
-    db_token.last_used_at = datetime.utcnow()
-    db.commit()
+    # Aggiorna last_used_at (bufferizzato fuori dal request path)
+    now = datetime.utcnow()
+    if not write_buffer.touch_refresh_token(db_token.id, now):
+        db_token.last_used_at = now
+        db.commit()
 
     return db_token.user_id
 
@@ -4,10 +4,48 @@ Custom SQLAlchemy Types
 Tipi personalizzati compatibili con tutti i database.
 """
 
-from sqlalchemy import TypeDecorator, CHAR
-from sqlalchemy.dialects.postgresql import UUID as pgUUID
+from sqlalchemy import TypeDecorator, CHAR, JSON, DateTime, Enum, String, LargeBinary
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.dialects.postgresql import UUID as pgUUID, JSONB as pgJSONB, CITEXT as pgCITEXT
 import uuid
 
+import msgspec
+
+# Lookup globale (evita attribute lookup per riga nel result path)
+_UUID = uuid.UUID
+
+
+class _PGUUID(TypeDecorator):
+    """UUID nativo PostgreSQL: il driver ritorna già uuid.UUID, nessun result processing"""
+
+    impl = pgUUID(as_uuid=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        return str(value)
+
+
+class _CharUUID(TypeDecorator):
+    """UUID come CHAR(36) per database senza tipo UUID nativo (SQLite)"""
+
+    impl = CHAR(36)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        if isinstance(value, _UUID):
+            return str(value)
+        return str(_UUID(value))
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, _UUID):
+            return value
+        return _UUID(value)
+
 
 class UUID(TypeDecorator):
     """
@@ -15,6 +53,9 @@ class UUID(TypeDecorator):
 
     - PostgreSQL: usa UUID nativo
     - SQLite: usa CHAR(36) con conversione automatica
+
+    L'implementazione specializzata per dialect viene scelta una volta in
+    load_dialect_impl: bind/result processing per riga senza branch sul dialect.
     """
 
     impl = CHAR
@@ -22,26 +63,101 @@ class UUID(TypeDecorator):
 
     def load_dialect_impl(self, dialect):
         if dialect.name == 'postgresql':
-            return dialect.type_descriptor(pgUUID(as_uuid=True))
+            return dialect.type_descriptor(_PGUUID())
         else:
-            return dialect.type_descriptor(CHAR(36))
+            return dialect.type_descriptor(_CharUUID())
+
+
+def StringEnum(enum_class, length: int = 32) -> Enum:
+    """
+    Enum Python salvato come VARCHAR + CHECK constraint (niente CREATE TYPE PostgreSQL).
+
+    - Sul DB finisce il .value del membro ('pending'), non il nome ('PENDING')
+    - Aggiungere uno stato = aggiornare il CHECK, niente ALTER TYPE
+    - Lato Python gli attributi restano membri dell'enum (job.status.value funziona)
+
+    Args:
+        enum_class: Classe enum (str, enum.Enum)
+        length: Lunghezza VARCHAR
+
+    Returns:
+        Enum: Tipo colonna non nativo
+    """
+    return Enum(
+        enum_class,
+        name=f"ck_{enum_class.__name__.lower()}",
+        native_enum=False,
+        create_constraint=True,
+        length=length,
+        values_callable=lambda members: [member.value for member in members],
+        validate_strings=True,
+    )
+
+
+# JSON portabile: JSONB su PostgreSQL (binario già parsato, indicizzabile GIN con @>),
+# JSON standard sugli altri database (SQLite)
+JSONB = JSON().with_variant(pgJSONB(), "postgresql")
+
+
+# Encoder/decoder MessagePack riusati (msgspec, già dipendenza per gli Struct)
+_msgpack_encode = msgspec.msgpack.Encoder().encode
+_msgpack_decode = msgspec.msgpack.Decoder().decode
+
+
+class Msgpack(TypeDecorator):
+    """
+    Valore JSON-like (dict/list di stringhe e numeri) serializzato MessagePack
+    in colonna binaria (BYTEA su PostgreSQL, BLOB su SQLite).
+
+    Per dati letti/scritti solo da Python (mappe di path file): encode/decode
+    più veloci di JSON e righe più piccole. Non interrogabile lato SQL:
+    per colonne filtrate nelle query usare JSONB.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
 
     def process_bind_param(self, value, dialect):
         if value is None:
-            return value
-        elif dialect.name == 'postgresql':
-            return str(value)
-        else:
-            if isinstance(value, uuid.UUID):
-                return str(value)
-            else:
-                return str(uuid.UUID(value))
+            return None
+        return _msgpack_encode(value)
 
     def process_result_value(self, value, dialect):
         if value is None:
-            return value
-        else:
-            if isinstance(value, uuid.UUID):
-                return value
-            else:
-                return uuid.UUID(value)
+            return None
+        # BYTEA arriva come memoryview: il decoder accetta qualsiasi buffer
+        return _msgpack_decode(value)
+
+
+# Testo case-insensitive (email, username): CITEXT su PostgreSQL (estensione citext),
+# collation NOCASE su SQLite. L'indice unique serve direttamente i lookup
+# case-insensitive senza lower() per query
+CIText = (
+    String(255)
+    .with_variant(String(255, collation="NOCASE"), "sqlite")
+    .with_variant(pgCITEXT(), "postgresql")
+)
+
+
+class utc_now(FunctionElement):
+    """
+    Timestamp UTC corrente calcolato dal database (colonne DateTime naive UTC).
+
+    Usato come server_default / onupdate al posto di datetime.utcnow: nessuna
+    chiamata Python né timestamp serializzato per riga nelle INSERT/UPDATE.
+    """
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utc_now)
+def _utc_now_default(element, compiler, **kw):
+    # SQLite: CURRENT_TIMESTAMP è già UTC
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utc_now, "postgresql")
+def _utc_now_postgresql(element, compiler, **kw):
+    # now() è timestamptz nel fuso della sessione: normalizza a UTC naive
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
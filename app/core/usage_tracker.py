@@ -2,15 +2,125 @@
 Usage Tracker - Helper per tracciare azioni utente
 ==================================================
 Funzioni utility per registrare usage logs in modo semplice
+
+Gli insert sono fire-and-forget: track_action mette la riga in una coda
+in-process e un worker thread dedicato la scrive in batch (max BATCH_SIZE
+righe o BATCH_WAIT secondi), fuori dal request path.
+
+La stessa coda è usata per le altre tabelle append-only (AdminAuditLog, via
+enqueue_insert): INSERT Core multi-riga, senza unit-of-work né identity map.
 """
 
+import queue
+import threading
+import time
+import logging
+from collections import defaultdict
+from sqlalchemy import insert, Table
 from sqlalchemy.orm import Session
 from fastapi import Request
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from uuid import UUID
+from datetime import datetime
 
+from app.core.database import SessionLocal
 from app.models.usage_log import UsageLog
 
+logger = logging.getLogger(__name__)
+
+# Batch insert: max righe per INSERT e attesa max prima di scrivere un batch parziale
+BATCH_SIZE = 500
+BATCH_WAIT = 0.2
+
+_queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+_STOP = object()
+
+
+def _write_batch(batch: List[Tuple[Table, Dict[str, Any]]]):
+    """Scrive un batch di righe con un INSERT Core multi-riga per tabella"""
+    if not batch:
+        return
+
+    rows_by_table: Dict[Table, List[Dict[str, Any]]] = defaultdict(list)
+    for table, row in batch:
+        rows_by_table[table].append(row)
+
+    db = SessionLocal()
+    try:
+        for table, rows in rows_by_table.items():
+            db.execute(insert(table), rows)
+        db.commit()
+    except Exception as e:
+        logger.error(f"Errore scrittura batch log ({len(batch)} righe perse): {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def _drain():
+    """Worker thread: raccoglie righe dalla coda e le scrive in batch"""
+    while True:
+        item = _queue.get()
+        if item is _STOP:
+            return
+
+        batch = [item]
+        deadline = time.monotonic() + BATCH_WAIT
+
+        while len(batch) < BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = _queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                _write_batch(batch)
+                return
+            batch.append(item)
+
+        _write_batch(batch)
+
+
+def _ensure_worker():
+    """Avvia worker thread al primo uso"""
+    global _worker
+
+    if _worker is not None and _worker.is_alive():
+        return
+
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_drain, name="usage-tracker", daemon=True)
+            _worker.start()
+
+
+def enqueue_insert(table: Table, row: Dict[str, Any]):
+    """
+    Accoda una riga per INSERT in batch su una tabella append-only.
+
+    Args:
+        table: Tabella Core di destinazione (es. AdminAuditLog.__table__)
+        row: Valori colonna (default Python della tabella applicati all'INSERT)
+    """
+    _queue.put((table, row))
+    _ensure_worker()
+
+
+def shutdown_usage_tracker(timeout: float = 5.0):
+    """
+    Scrive le righe in coda e ferma il worker. Chiamare allo shutdown app.
+
+    Args:
+        timeout: Attesa massima (secondi) per lo svuotamento della coda
+    """
+    if _worker is not None and _worker.is_alive():
+        _queue.put(_STOP)
+        _worker.join(timeout)
+
 
 def track_action(
     db: Session,
@@ -23,7 +133,7 @@ def track_action(
     Traccia un'azione utente nel database.
 
     Args:
-        db: Database session
+        db: Database session (non usata: insert asincrono in batch, mantenuta per compatibilità)
         user_id: ID dell'utente che compie l'azione
         action_type: Tipo azione ('chromakey', 'video_download', 'audio_transcribe', etc.)
         action_details: Dettagli extra (opzionale, JSON)
@@ -55,20 +165,16 @@ def track_action(
         ```
     """
     try:
-        log = UsageLog(
-            user_id=user_id,
-            action_type=action_type,
-            action_details=action_details,
-            ip_address=request.client.host if request else None,
-            user_agent=request.headers.get('user-agent') if request else None
-        )
-
-        db.add(log)
-        db.commit()
+        enqueue_insert(UsageLog.__table__, {
+            "user_id": user_id,
+            "action_type": action_type,
+            "action_details": action_details,
+            "timestamp": datetime.utcnow(),
+            "ip_address": request.client.host if request else None,
+            "user_agent": request.headers.get('user-agent') if request else None
+        })
 
     except Exception as e:
         # Non vogliamo che il tracking blocchi l'operazione principale
         # Logga errore ma non propagare
-        import logging
-        logging.error(f"Errore tracking action '{action_type}' per user {user_id}: {e}")
-        db.rollback()
+        logger.error(f"Errore tracking action '{action_type}' per user {user_id}: {e}")
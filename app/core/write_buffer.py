@@ -0,0 +1,199 @@
+"""
+Write Buffer - Scritture DB differite fuori dal request path
+============================================================
+Accumula in memoria le scritture "soft" ad alta frequenza e le scrive in
+batch ogni `FLUSH_INTERVAL` secondi (o appena il buffer supera `MAX_PENDING`
+elementi), in una sola transazione.
+
+Scritture bufferizzate:
+- RefreshToken.last_used_at (ultima verifica refresh token)
+- APIKey.last_used_at + usage_count (ultima verifica API key e numero utilizzi)
+
+(Gli UsageLog hanno un worker dedicato in app.core.usage_tracker.)
+
+Staleness massima accettata: ~FLUSH_INTERVAL secondi su campi puramente informativi.
+
+Il flusher è un task asyncio avviato nel lifespan dell'app (start_write_buffer).
+Se non è attivo (script, CLI, test) le funzioni di enqueue ritornano False e il
+chiamante esegue la scrittura sincrona come prima.
+
+Usage:
+    from app.core import write_buffer
+
+    if not write_buffer.touch_refresh_token(db_token.id, now):
+        db_token.last_used_at = now
+        db.commit()
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import update, bindparam, func
+
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Intervallo flush (secondi) e soglia flush anticipato
+FLUSH_INTERVAL = 1.0
+MAX_PENDING = 1000
+
+_lock = threading.Lock()
+_refresh_token_touches: Dict[UUID, datetime] = {}
+# api_key_id -> (ultimo utilizzo, utilizzi accumulati dall'ultimo flush)
+_api_key_touches: Dict[UUID, Tuple[datetime, int]] = {}
+
+_flusher_task: Optional[asyncio.Task] = None
+_flush_requested: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def is_running() -> bool:
+    """True se il flusher in background è attivo"""
+    return _flusher_task is not None and not _flusher_task.done()
+
+
+def _pending_count() -> int:
+    return len(_refresh_token_touches) + len(_api_key_touches)
+
+
+def _notify_if_full():
+    """Richiede flush anticipato se il buffer è pieno (thread-safe)"""
+    if _pending_count() >= MAX_PENDING and _loop is not None and _flush_requested is not None:
+        _loop.call_soon_threadsafe(_flush_requested.set)
+
+
+def touch_refresh_token(token_id: UUID, used_at: datetime) -> bool:
+    """
+    Accoda aggiornamento RefreshToken.last_used_at.
+
+    Returns:
+        bool: True se accodato, False se il flusher non è attivo (scrivere subito)
+    """
+    if not is_running():
+        return False
+
+    with _lock:
+        _refresh_token_touches[token_id] = used_at
+    _notify_if_full()
+    return True
+
+
+def touch_api_key(api_key_id: UUID, used_at: datetime) -> bool:
+    """
+    Accoda aggiornamento APIKey.last_used_at e incremento usage_count.
+
+    Gli utilizzi della stessa key tra due flush diventano un solo
+    UPDATE ... SET usage_count = usage_count + N.
+
+    Returns:
+        bool: True se accodato, False se il flusher non è attivo (scrivere subito)
+    """
+    if not is_running():
+        return False
+
+    with _lock:
+        _, uses = _api_key_touches.get(api_key_id, (used_at, 0))
+        _api_key_touches[api_key_id] = (used_at, uses + 1)
+    _notify_if_full()
+    return True
+
+
+def flush() -> int:
+    """
+    Scrive su DB tutte le scritture in attesa (sincrono, una transazione).
+
+    Returns:
+        int: Numero di scritture eseguite
+    """
+    global _refresh_token_touches, _api_key_touches
+
+    from app.models.refresh_token import RefreshToken
+    from app.models.api_key import APIKey
+
+    # Swap atomico dei buffer: i request thread non aspettano il DB
+    with _lock:
+        token_touches, _refresh_token_touches = _refresh_token_touches, {}
+        key_touches, _api_key_touches = _api_key_touches, {}
+
+    total = len(token_touches) + len(key_touches)
+    if total == 0:
+        return 0
+
+    db = SessionLocal()
+    try:
+        # executemany: un solo statement preparato per tutte le righe
+        if token_touches:
+            db.execute(
+                update(RefreshToken.__table__)
+                .where(RefreshToken.__table__.c.id == bindparam("_id"))
+                .values(last_used_at=bindparam("_used_at")),
+                [{"_id": k, "_used_at": v} for k, v in token_touches.items()]
+            )
+
+        if key_touches:
+            table = APIKey.__table__
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("_id"))
+                .values(
+                    last_used_at=bindparam("_used_at"),
+                    usage_count=func.coalesce(table.c.usage_count, 0) + bindparam("_uses")
+                ),
+                [{"_id": k, "_used_at": used_at, "_uses": uses} for k, (used_at, uses) in key_touches.items()]
+            )
+
+        db.commit()
+        return total
+
+    except Exception as e:
+        # Scritture soft: si perdono, ma non bloccano mai le richieste
+        logger.error(f"❌ Errore flush write buffer ({total} scritture perse): {e}")
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+
+async def _flusher_loop():
+    """Loop flush periodico (ogni FLUSH_INTERVAL o a buffer pieno)"""
+    while True:
+        try:
+            await asyncio.wait_for(_flush_requested.wait(), timeout=FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _flush_requested.clear()
+
+        await asyncio.to_thread(flush)
+
+
+def start_write_buffer():
+    """Avvia flusher in background. Chiamare nello startup (event loop attivo)."""
+    global _flusher_task, _flush_requested, _loop
+
+    if is_running():
+        return
+
+    _loop = asyncio.get_running_loop()
+    _flush_requested = asyncio.Event()
+    _flusher_task = asyncio.create_task(_flusher_loop())
+    logger.info(f"✅ Write buffer avviato (flush ogni {FLUSH_INTERVAL}s)")
+
+
+async def stop_write_buffer():
+    """Ferma flusher e scrive le scritture residue. Chiamare nello shutdown."""
+    global _flusher_task
+
+    if _flusher_task is not None:
+        _flusher_task.cancel()
+        try:
+            await _flusher_task
+        except asyncio.CancelledError:
+            pass
+        _flusher_task = None
+
+    await asyncio.to_thread(flush)
@@ -5,19 +5,57 @@ Database Models - Export tutti i modelli
 
 from app.models.user import User
 from app.models.api_key import APIKey
-from app.models.job import Job, JobType, JobStatus
+from app.models.job import Job, JobPayload, JobType, JobStatus
 from app.models.pipeline import Pipeline, PipelineStatus
 from app.models.file_metadata import FileMetadata
-from app.models.user_settings import UserSettings, DEFAULT_SETTINGS
+from app.models.user_settings import (
+    UserSettings, DEFAULT_SETTINGS, get_default_settings, iter_settings, get_settings, update_settings
+)
 from app.models.usage_log import UsageLog
 from app.models.admin_audit_log import AdminAuditLog
 from app.models.refresh_token import RefreshToken
 from app.models.scheduled_job import ScheduledJob, ScheduledJobStatus
 
+from app.core.database import Base
+from sqlalchemy.dialects.postgresql import UUID as _PGDialectUUID
+
+
+def _check_model_registry():
+    """
+    Verifica a import-time che ogni tabella sia mappata da una sola classe
+    e che le colonne UUID usino il tipo portabile app.core.types.UUID.
+
+    Una definizione duplicata di un modello (stesso __tablename__ in due moduli)
+    verrebbe altrimenti registrata e poi sovrascritta in silenzio nel registry.
+    """
+    seen = {}
+    for mapper in Base.registry.mappers:
+        table = mapper.local_table
+        if table is None or mapper.inherits is not None:
+            continue
+        assert table.name not in seen, (
+            f"Tabella '{table.name}' mappata due volte: "
+            f"{seen[table.name]} e {mapper.class_.__module__}.{mapper.class_.__name__}"
+        )
+        assert Base.metadata.tables.get(table.key) is table, (
+            f"Tabella '{table.name}' non registrata in Base.metadata"
+        )
+        seen[table.name] = f"{mapper.class_.__module__}.{mapper.class_.__name__}"
+
+        for column in table.columns:
+            assert not isinstance(column.type, _PGDialectUUID), (
+                f"{table.name}.{column.name}: usare app.core.types.UUID, "
+                f"non postgresql.UUID"
+            )
+
+
+_check_model_registry()
+
 __all__ = [
     "User",
     "APIKey",
     "Job",
+    "JobPayload",
     "JobType",
     "JobStatus",
     "Pipeline",
@@ -25,6 +63,10 @@ __all__ = [
     "FileMetadata",
     "UserSettings",
     "DEFAULT_SETTINGS",
+    "get_default_settings",
+    "iter_settings",
+    "get_settings",
+    "update_settings",
     "UsageLog",
     "AdminAuditLog",
     "RefreshToken",
@@ -12,12 +12,11 @@ Ogni azione admin viene loggata con:
 - Dettagli (details JSON)
 """
 
-from sqlalchemy import Column, String, DateTime, JSON, Text, ForeignKey
-from datetime import datetime
-import uuid
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Index
 
 from app.core.database import Base
-from app.core.types import UUID
+from app.core.types import UUID, JSONB, utc_now
+from app.core.ids import uuid7
 
 
 class AdminAuditLog(Base):
@@ -33,15 +32,15 @@ class AdminAuditLog(Base):
     """
     __tablename__ = "admin_audit_logs"
 
-    id = Column(UUID(), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(), primary_key=True, default=uuid7)
 
     # Chi ha eseguito l'azione
-    admin_user_id = Column(UUID(), ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
-    admin_username = Column(String, nullable=False)  # Denormalizzato per sicurezza (se admin eliminato)
-    admin_email = Column(String, nullable=False)  # Denormalizzato
+    admin_user_id = Column(UUID(), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    admin_username = Column(String(255), nullable=False)  # Denormalizzato per sicurezza (se admin eliminato)
+    admin_email = Column(String(255), nullable=False)  # Denormalizzato
 
     # Azione eseguita
-    action = Column(String, nullable=False, index=True)
+    action = Column(String(64), nullable=False)
     """
     Tipi azione:
     - user.view: Visualizza dettagli utente
@@ -58,12 +57,12 @@ class AdminAuditLog(Base):
     """
 
     # Target dell'azione (cosa è stato modificato)
-    target_type = Column(String, nullable=True, index=True)  # 'user', 'system', 'job', etc.
+    target_type = Column(String(32), nullable=True)  # 'user', 'system', 'job', etc.
     target_id = Column(UUID(), nullable=True, index=True)  # ID entità target
-    target_identifier = Column(String, nullable=True)  # Username/email target (denormalizzato)
+    target_identifier = Column(String(255), nullable=True)  # Username/email target (denormalizzato)
 
     # Dettagli azione (JSON)
-    details = Column(JSON, nullable=True)
+    details = Column(JSONB, nullable=True)
     """
     Esempi:
     {
@@ -77,15 +76,26 @@ class AdminAuditLog(Base):
     """
 
     # Metadati richiesta
-    ip_address = Column(String, nullable=True)
+    ip_address = Column(String(45), nullable=True)  # IPv6 support
     user_agent = Column(Text, nullable=True)
 
     # Timestamp
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    timestamp = Column(DateTime, server_default=utc_now(), nullable=False, index=True)
+
+    # Indici composti (colonna filtro, timestamp DESC): "filtra e ordina per più recenti LIMIT N"
+    # cammina l'indice già ordinato. Coprono anche i lookup sulla sola colonna iniziale.
+    __table_args__ = (
+        Index("ix_admin_audit_admin_time", admin_user_id, timestamp.desc()),
+        Index("ix_admin_audit_action_time", action, timestamp.desc()),
+        Index("ix_admin_audit_target", target_type, target_id, timestamp.desc()),
+        # GIN su JSONB per filtri di contenimento (details @> '{...}'), solo PostgreSQL
+        Index("ix_admin_audit_details_gin", details, postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
 
     def __repr__(self):
+        d = self.__dict__
         return (
-            f"<AdminAuditLog {self.admin_username} "
-            f"{self.action} on {self.target_type}:{self.target_identifier} "
-            f"at {self.timestamp}>"
+            f"<AdminAuditLog {d.get('admin_username')} "
+            f"{d.get('action')} on {d.get('target_type')}:{d.get('target_identifier')} "
+            f"at {d.get('timestamp')}>"
         )
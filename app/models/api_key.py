@@ -4,10 +4,9 @@ API Key Model - Gestione API keys
 """
 
 from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Integer
-from app.core.types import UUID
+from app.core.types import UUID, utc_now
+from app.core.ids import uuid7
 from sqlalchemy.orm import relationship
-from datetime import datetime
-import uuid
 
 from app.core.database import Base
 
@@ -18,14 +17,14 @@ class APIKey(Base):
     __tablename__ = "api_keys"
 
     # Primary Key
-    id = Column(UUID(), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(), primary_key=True, default=uuid7)
 
     # Foreign Key
-    user_id = Column(UUID(), ForeignKey("users.id"), nullable=False)
+    user_id = Column(UUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     # Key
     key = Column(String(64), unique=True, index=True, nullable=False)
-    name = Column(String, nullable=False, comment="Nome descrittivo API key")
+    name = Column(String(255), nullable=False, comment="Nome descrittivo API key")
     description = Column(Text, nullable=True)
 
     # Status
@@ -36,11 +35,12 @@ class APIKey(Base):
     usage_count = Column(Integer, default=0)
 
     # Timestamp
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
     expires_at = Column(DateTime, nullable=True, comment="Scadenza key (NULL = mai)")
 
     # Relationships
     user = relationship("User", back_populates="api_keys")
 
     def __repr__(self):
-        return f"<APIKey(id={self.id}, name={self.name}, user_id={self.user_id})>"
+        d = self.__dict__
+        return f"<APIKey(id={d.get('id')}, name={d.get('name')}, user_id={d.get('user_id')})>"
@@ -3,11 +3,10 @@ File Metadata Model - Tracking file caricati
 ============================================
 """
 
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Boolean, Float
-from app.core.types import UUID
+from sqlalchemy import Column, String, BigInteger, DateTime, ForeignKey, Boolean, Float, LargeBinary
+from app.core.types import UUID, utc_now
+from app.core.ids import uuid7
 from sqlalchemy.orm import relationship
-from datetime import datetime
-import uuid
 
 from app.core.database import Base
 
@@ -18,23 +17,23 @@ class FileMetadata(Base):
     __tablename__ = "file_metadata"
 
     # Primary Key
-    id = Column(UUID(), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(), primary_key=True, default=uuid7)
 
     # Foreign Key
-    user_id = Column(UUID(), ForeignKey("users.id"), nullable=False)
+    user_id = Column(UUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     # File info
     filename = Column(String, nullable=False)
     original_filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False, unique=True)
-    file_size = Column(Integer, nullable=False, comment="Dimensione in bytes")
-    mime_type = Column(String, nullable=False)
+    file_size = Column(BigInteger, nullable=False, comment="Dimensione in bytes (BIGINT: video > 2 GB)")
+    mime_type = Column(String(127), nullable=False)
 
     # Tipo file
-    file_type = Column(String, nullable=False, index=True, comment="video, image, audio, etc")
+    file_type = Column(String(32), nullable=False, index=True, comment="video, image, audio, etc")
 
     # Hash per dedup
-    file_hash = Column(String(64), nullable=True, index=True, comment="SHA256 hash")
+    file_hash = Column(LargeBinary(32), nullable=True, index=True, comment="SHA256 digest (32 byte)")
 
     # Status
     is_temporary = Column(Boolean, default=False, comment="File temporaneo da eliminare")
@@ -44,11 +43,12 @@ class FileMetadata(Base):
     expires_at = Column(DateTime, nullable=True, comment="Scadenza file temporanei")
 
     # Timestamp
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
-    accessed_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False, index=True)
+    accessed_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now())
 
     # Relationships
     user = relationship("User")
 
     def __repr__(self):
-        return f"<FileMetadata(id={self.id}, filename={self.filename}, type={self.file_type})>"
+        d = self.__dict__
+        return f"<FileMetadata(id={d.get('id')}, filename={d.get('filename')}, type={d.get('file_type')})>"
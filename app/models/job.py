@@ -4,11 +4,12 @@ Job Model - Gestione job elaborazione
 Job per chromakey, traduzione, thumbnails, etc.
 """
 
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text, JSON, Enum as SQLEnum
-from app.core.types import UUID
+from sqlalchemy import Column, String, SmallInteger, Float, Boolean, DateTime, ForeignKey, Text, Index
+from app.core.types import UUID, JSONB, Msgpack, StringEnum, utc_now
+from app.core.ids import uuid7
 from sqlalchemy.orm import relationship
-from datetime import datetime
-import uuid
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.ext.associationproxy import association_proxy
 import enum
 
 from app.core.database import Base
@@ -42,53 +43,132 @@ class Job(Base):
     __tablename__ = "jobs"
 
     # Primary Key
-    id = Column(UUID(), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(), primary_key=True, default=uuid7)
 
     # Foreign Key
-    user_id = Column(UUID(), ForeignKey("users.id"), nullable=False)
-    pipeline_id = Column(UUID(), ForeignKey("pipelines.id"), nullable=True, comment="NULL se job standalone")
+    user_id = Column(UUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    pipeline_id = Column(UUID(), ForeignKey("pipelines.id", ondelete="CASCADE"), nullable=True, comment="NULL se job standalone")
+
+    # Denormalizzati dalla Pipeline (come admin_username in AdminAuditLog):
+    # liste/dashboard "job X di pipeline P, step N" senza join su pipelines
+    pipeline_name = Column(String, nullable=True, comment="Nome pipeline al momento della creazione")
+    pipeline_step_number = Column(SmallInteger, nullable=True, comment="Numero step nella pipeline")
 
     # Job info
-    job_type = Column(SQLEnum(JobType), nullable=False, index=True)
-    status = Column(SQLEnum(JobStatus), default=JobStatus.PENDING, nullable=False, index=True)
+    job_type = Column(StringEnum(JobType), nullable=False, index=True)
+    status = Column(StringEnum(JobStatus, length=16), default=JobStatus.PENDING, nullable=False)
 
     # Progress
-    progress = Column(Integer, default=0, comment="Progresso 0-100")
+    progress = Column(SmallInteger, default=0, comment="Progresso 0-100")
     message = Column(Text, nullable=True, comment="Messaggio corrente")
 
-    # Input/Output
-    input_files = Column(JSON, nullable=True, comment="Lista file input {file_id: path}")
-    output_files = Column(JSON, nullable=True, comment="Lista file output {file_id: path}")
-
-    # Parametri job (JSON flessibile per ogni tipo)
-    parameters = Column(JSON, nullable=False, default={}, comment="Parametri specifici job")
-
-    # Risultato
-    result = Column(JSON, nullable=True, comment="Risultato elaborazione")
-    error = Column(Text, nullable=True, comment="Messaggio errore se failed")
-
     # Metriche
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
     processing_time = Column(Float, nullable=True, comment="Tempo elaborazione (secondi)")
 
     # Timestamp
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False, index=True)
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now(), nullable=False)
+
+    __table_args__ = (
+        # Liste job utente "più recenti prima": index scan su una sola tabella
+        Index("ix_job_user_created", user_id, created_at.desc()),
+        # Job di una pipeline in ordine di creazione (Pipeline.jobs)
+        Index("ix_jobs_pipeline_created", pipeline_id, created_at),
+        # Indice parziale sulla coda di lavoro aperta (pending/processing): contiene solo
+        # i job attivi, non i terminali che col tempo sono la quasi totalità delle righe
+        Index(
+            "ix_jobs_active",
+            created_at,
+            postgresql_where=status.in_([JobStatus.PENDING, JobStatus.PROCESSING]),
+            sqlite_where=status.in_([JobStatus.PENDING, JobStatus.PROCESSING]),
+        ),
+    )
 
     # Relationships
     user = relationship("User", back_populates="jobs")
     pipeline = relationship("Pipeline", back_populates="jobs")
 
+    # Payload JSON pesante in tabella separata (vedi JobPayload): liste e polling
+    # leggono solo le colonne piccole di jobs. Negli endpoint di dettaglio usare
+    # .options(joinedload(Job.payload)), nelle liste selectinload(Job.payload)
+    payload = relationship(
+        "JobPayload",
+        back_populates="job",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+    # Accesso trasparente ai campi del payload (job.result, job.parameters, ...):
+    # in scrittura il payload viene creato se manca
+    input_files = association_proxy("payload", "input_files", creator=lambda value: JobPayload(input_files=value))
+    output_files = association_proxy("payload", "output_files", creator=lambda value: JobPayload(output_files=value))
+    parameters = association_proxy("payload", "parameters", creator=lambda value: JobPayload(parameters=value))
+    result = association_proxy("payload", "result", creator=lambda value: JobPayload(result=value))
+    error = association_proxy("payload", "error", creator=lambda value: JobPayload(error=value))
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Ogni job ha il suo payload (parameters non nullo, come prima)
+        if self.payload is None:
+            self.payload = JobPayload()
+
     def __repr__(self):
-        return f"<Job(id={self.id}, type={self.job_type}, status={self.status})>"
+        # Solo attributi già caricati: nessun refresh/lazy load da log o traceback
+        d = self.__dict__
+        return f"<Job(id={d.get('id')}, type={d.get('job_type')}, status={d.get('status')})>"
 
-    @property
+    @hybrid_property
     def is_terminal(self) -> bool:
         """Verifica se job è in stato terminale (completato/fallito/cancellato)"""
         return self.status in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
 
-    @property
+    @is_terminal.expression
+    def is_terminal(cls):
+        return cls.status.in_((JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED))
+
+    @hybrid_property
     def is_active(self) -> bool:
         """Verifica se job è attivo (pending/processing)"""
         return self.status in (JobStatus.PENDING, JobStatus.PROCESSING)
+
+    @is_active.expression
+    def is_active(cls):
+        return cls.status.in_((JobStatus.PENDING, JobStatus.PROCESSING))
+
+
+class JobPayload(Base):
+    """
+    Payload JSON di un Job (partizionamento verticale 1:1 con jobs).
+
+    Parametri, file e risultato possono pesare diversi KB: tenerli fuori da
+    jobs mantiene le righe lette da liste e polling di stato strette.
+    """
+
+    __tablename__ = "job_payloads"
+
+    job_id = Column(UUID(), ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True)
+
+    # Input/Output
+    input_files = Column(Msgpack, nullable=True, comment="Lista file input {file_id: path} (MessagePack)")
+    output_files = Column(Msgpack, nullable=True, comment="Lista file output {file_id: path} (MessagePack)")
+
+    # Parametri job (JSON flessibile per ogni tipo)
+    parameters = Column(JSONB, nullable=False, default={}, comment="Parametri specifici job")
+
+    # Risultato
+    result = Column(JSONB, nullable=True, comment="Risultato elaborazione")
+    error = Column(Text, nullable=True, comment="Messaggio errore se failed")
+
+    # GIN su JSONB per filtri di contenimento (parameters @> '{...}'), solo PostgreSQL
+    __table_args__ = (
+        Index("ix_job_payload_params_gin", parameters, postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+    job = relationship("Job", back_populates="payload")
+
+    def __repr__(self):
+        d = self.__dict__
+        return f"<JobPayload(job_id={d.get('job_id')})>"
@@ -13,11 +13,11 @@ Esempio Pipeline AUTO:
 Ogni step è un Job collegato alla Pipeline.
 """
 
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text, JSON, Enum as SQLEnum
-from app.core.types import UUID
+from sqlalchemy import Column, String, SmallInteger, Float, Boolean, DateTime, ForeignKey, Text
+from app.core.types import UUID, JSONB, Msgpack, StringEnum, utc_now
+from app.core.ids import uuid7
 from sqlalchemy.orm import relationship
-from datetime import datetime
-import uuid
+from sqlalchemy.ext.hybrid import hybrid_property
 import enum
 
 from app.core.database import Base
@@ -44,20 +44,20 @@ class Pipeline(Base):
     __tablename__ = "pipelines"
 
     # Primary Key
-    id = Column(UUID(), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(), primary_key=True, default=uuid7)
 
     # Foreign Key
-    user_id = Column(UUID(), ForeignKey("users.id"), nullable=False)
+    user_id = Column(UUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     # Pipeline info
     name = Column(String, nullable=False, comment="Nome descrittivo pipeline")
     description = Column(Text, nullable=True)
 
     # Status
-    status = Column(SQLEnum(PipelineStatus), default=PipelineStatus.PENDING, nullable=False, index=True)
+    status = Column(StringEnum(PipelineStatus, length=16), default=PipelineStatus.PENDING, nullable=False, index=True)
 
     # Configurazione steps
-    steps = Column(JSON, nullable=False, comment="""
+    steps = Column(JSONB, nullable=False, comment="""
         Lista step pipeline. Formato:
         [
             {
@@ -77,24 +77,26 @@ class Pipeline(Base):
     """)
 
     # Esecuzione
-    current_step = Column(Integer, default=0, comment="Step corrente (0 = non iniziato)")
-    total_steps = Column(Integer, nullable=False, comment="Totale step pipeline")
+    current_step = Column(SmallInteger, default=0, comment="Step corrente (0 = non iniziato)")
+    total_steps = Column(SmallInteger, nullable=False, comment="Totale step pipeline")
 
     # Progress
-    progress = Column(Integer, default=0, comment="Progresso globale 0-100")
+    progress = Column(SmallInteger, default=0, comment="Progresso globale 0-100")
     message = Column(Text, nullable=True)
 
     # Input/Output globali pipeline
-    input_files = Column(JSON, nullable=True, comment="File input iniziali")
-    output_files = Column(JSON, nullable=True, comment="File output finali")
+    input_files = Column(Msgpack, nullable=True, comment="File input iniziali (MessagePack)")
+    output_files = Column(Msgpack, nullable=True, comment="File output finali (MessagePack)")
 
     # Risultato
-    result = Column(JSON, nullable=True, comment="Risultato finale pipeline")
+    result = Column(JSONB, nullable=True, comment="Risultato finale pipeline")
+    checkpoint = Column(JSONB, nullable=True, comment="Step completati {step_number: risultato} per resume")
     error = Column(Text, nullable=True)
 
     # Opzioni
     stop_on_error = Column(Boolean, default=True, comment="Ferma pipeline al primo errore")
     auto_cleanup = Column(Boolean, default=True, comment="Elimina file intermedi a fine pipeline")
+    parallel_groups = Column(Boolean, default=False, comment="Esegue in parallelo step consecutivi indipendenti (es. traduzioni)")
 
     # Metriche
     started_at = Column(DateTime, nullable=True)
@@ -102,35 +104,69 @@ class Pipeline(Base):
     total_processing_time = Column(Float, nullable=True, comment="Tempo totale (secondi)")
 
     # Timestamp
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False, index=True)
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now(), nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="pipelines")
-    jobs = relationship("Job", back_populates="pipeline", order_by="Job.created_at")
+    # Caricamento on-demand: dove servono i job di più pipeline usare
+    # .options(selectinload(Pipeline.jobs)) (una query IN invece di N).
+    # L'ORDER BY è servito da ix_jobs_pipeline_created senza sort
+    jobs = relationship(
+        "Job",
+        back_populates="pipeline",
+        order_by="Job.created_at",
+        lazy="select",
+        passive_deletes=True
+    )
 
     def __repr__(self):
-        return f"<Pipeline(id={self.id}, name={self.name}, status={self.status}, step={self.current_step}/{self.total_steps})>"
+        d = self.__dict__
+        return f"<Pipeline(id={d.get('id')}, name={d.get('name')}, status={d.get('status')}, step={d.get('current_step')}/{d.get('total_steps')})>"
 
-    @property
+    @hybrid_property
     def is_terminal(self) -> bool:
         """Verifica se pipeline è in stato terminale"""
         return self.status in (PipelineStatus.COMPLETED, PipelineStatus.FAILED, PipelineStatus.CANCELLED)
 
-    @property
+    @is_terminal.expression
+    def is_terminal(cls):
+        return cls.status.in_((PipelineStatus.COMPLETED, PipelineStatus.FAILED, PipelineStatus.CANCELLED))
+
+    @hybrid_property
     def is_active(self) -> bool:
         """Verifica se pipeline è attiva"""
         return self.status in (PipelineStatus.PENDING, PipelineStatus.RUNNING, PipelineStatus.PAUSED)
 
+    @is_active.expression
+    def is_active(cls):
+        return cls.status.in_((PipelineStatus.PENDING, PipelineStatus.RUNNING, PipelineStatus.PAUSED))
+
+    def _enabled_step_indexes(self) -> list:
+        """
+        Indici (in self.steps) degli step abilitati, calcolati una volta sola.
+
+        La cache è legata all'oggetto lista `steps`: nuova assegnazione o reload
+        dal DB (expire/refresh) la invalidano automaticamente.
+        """
+        steps = self.steps or []
+        cached = self.__dict__.get("_enabled_idx_cache")
+        if cached is None or cached[0] is not steps:
+            indexes = [i for i, step in enumerate(steps) if step.get("enabled", True)]
+            cached = (steps, indexes)
+            self.__dict__["_enabled_idx_cache"] = cached
+        return cached[1]
+
     @property
     def enabled_steps(self) -> list:
         """Ritorna solo step abilitati"""
-        return [step for step in self.steps if step.get("enabled", True)]
+        steps = self.steps
+        return [steps[i] for i in self._enabled_step_indexes()]
 
     @property
     def next_step(self) -> dict:
         """Ritorna prossimo step da eseguire (None se finito)"""
-        enabled = self.enabled_steps
-        if self.current_step < len(enabled):
-            return enabled[self.current_step]
+        indexes = self._enabled_step_indexes()
+        if self.current_step < len(indexes):
+            return self.steps[indexes[self.current_step]]
         return None
@@ -4,13 +4,14 @@ Refresh Token Model
 Modello per gestire refresh tokens persistenti.
 """
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, LargeBinary, and_
 from sqlalchemy.orm import relationship
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
-import uuid
 
 from app.core.database import Base
-from app.core.types import UUID
+from app.core.types import UUID, utc_now
+from app.core.ids import uuid7
 
 
 class RefreshToken(Base):
@@ -21,19 +22,19 @@ class RefreshToken(Base):
     """
     __tablename__ = "refresh_tokens"
 
-    id = Column(UUID(), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(), primary_key=True, default=uuid7)
 
-    # Token hash (non salviamo token in chiaro!)
-    token_hash = Column(String(64), unique=True, nullable=False, index=True)
+    # Token hash (non salviamo token in chiaro!) - digest SHA256 raw: 32 byte invece di 64 hex
+    token_hash = Column(LargeBinary(32), unique=True, nullable=False, index=True)
 
     # User relationship
     user_id = Column(UUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     user = relationship("User", back_populates="refresh_tokens")
 
     # Metadata
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
     expires_at = Column(DateTime, nullable=False)
-    last_used_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, server_default=utc_now())
 
     # Device/client info
     device_info = Column(String(255), nullable=True)
@@ -45,14 +46,24 @@ class RefreshToken(Base):
     revoked_at = Column(DateTime, nullable=True)
 
     def __repr__(self):
-        return f"<RefreshToken user_id={self.user_id} expires_at={self.expires_at}>"
+        d = self.__dict__
+        return f"<RefreshToken user_id={d.get('user_id')} expires_at={d.get('expires_at')}>"
 
-    @property
+    @hybrid_property
     def is_expired(self) -> bool:
         """Check se token è scaduto"""
         return datetime.utcnow() > self.expires_at
 
-    @property
+    @is_expired.expression
+    def is_expired(cls):
+        # utcnow valutato ad ogni uso dell'espressione (colonne naive UTC)
+        return cls.expires_at < datetime.utcnow()
+
+    @hybrid_property
     def is_valid(self) -> bool:
         """Check se token è valido (non scaduto e non revocato)"""
         return not self.is_expired and not self.is_revoked
+
+    @is_valid.expression
+    def is_valid(cls):
+        return and_(cls.expires_at >= datetime.utcnow(), cls.is_revoked.is_(False))
@@ -4,11 +4,12 @@ Scheduled Job Model - Job di registrazione programmati
 Gestisce job di screen recording programmati per avvio futuro
 """
 
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, Enum as SQLEnum, Boolean
-from app.core.types import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, SmallInteger, DateTime, ForeignKey, Index, Boolean
+from app.core.types import UUID, JSONB, StringEnum, utc_now
+from app.core.ids import uuid7
+from sqlalchemy.orm import relationship, backref
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
-import uuid
 import enum
 
 from app.core.database import Base
@@ -35,51 +36,79 @@ class ScheduledJob(Base):
     __tablename__ = "scheduled_jobs"
 
     # Primary Key
-    id = Column(UUID(), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(), primary_key=True, default=uuid7)
 
     # Foreign Keys
-    user_id = Column(UUID(), ForeignKey("users.id"), nullable=False, index=True)
-    job_id = Column(UUID(), ForeignKey("jobs.id"), nullable=True, comment="Job creato quando parte la registrazione")
+    user_id = Column(UUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    job_id = Column(UUID(), ForeignKey("jobs.id", ondelete="SET NULL"), nullable=True, comment="Job creato quando parte la registrazione")
 
     # Scheduling info
     scheduled_time = Column(DateTime, nullable=False, index=True, comment="Quando deve partire")
-    duration_seconds = Column(Integer, nullable=False, comment="Durata massima registrazione")
+    duration_seconds = Column(SmallInteger, nullable=False, comment="Durata massima registrazione (max 8h)")
 
     # Status
-    status = Column(SQLEnum(ScheduledJobStatus), default=ScheduledJobStatus.SCHEDULED, nullable=False, index=True)
+    status = Column(StringEnum(ScheduledJobStatus, length=16), default=ScheduledJobStatus.SCHEDULED, nullable=False)
 
     # Parametri registrazione (come ScreenRecordRequest)
-    parameters = Column(JSON, nullable=False, comment="Parametri per la registrazione")
+    parameters = Column(JSONB, nullable=False, comment="Parametri per la registrazione")
 
     # APScheduler job ID
-    scheduler_job_id = Column(String(255), nullable=True, unique=True, comment="ID job in APScheduler")
+    scheduler_job_id = Column(String(255), nullable=True, comment="ID job in APScheduler")
 
     # Risultato/errore
     error_message = Column(String(1000), nullable=True)
     output_path = Column(String(500), nullable=True, comment="Path del video registrato")
 
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
     started_at = Column(DateTime, nullable=True, comment="Quando è effettivamente partita")
     completed_at = Column(DateTime, nullable=True)
 
+    # Indice parziale sulle sole registrazioni ancora da avviare, ordinate per orario:
+    # "status = SCHEDULED AND scheduled_time <= now()" legge solo il lavoro aperto
+    __table_args__ = (
+        Index(
+            "ix_sched_due",
+            scheduled_time,
+            postgresql_where=status == ScheduledJobStatus.SCHEDULED,
+            sqlite_where=status == ScheduledJobStatus.SCHEDULED,
+        ),
+        # Univocità ID APScheduler solo tra i job aperti: i terminali non occupano l'indice
+        Index(
+            "uq_sched_active_apsid",
+            scheduler_job_id,
+            unique=True,
+            postgresql_where=status.in_([ScheduledJobStatus.SCHEDULED, ScheduledJobStatus.RUNNING]),
+            sqlite_where=status.in_([ScheduledJobStatus.SCHEDULED, ScheduledJobStatus.RUNNING]),
+        ),
+    )
+
     # Relationships
-    user = relationship("User", backref="scheduled_jobs")
-    job = relationship("Job", foreign_keys=[job_id], backref="scheduled_recording")
+    user = relationship("User", backref=backref("scheduled_jobs", passive_deletes=True))
+    job = relationship("Job", foreign_keys=[job_id], backref=backref("scheduled_recording", passive_deletes=True))
 
     def __repr__(self):
-        return f"<ScheduledJob(id={self.id}, scheduled_time={self.scheduled_time}, status={self.status})>"
+        d = self.__dict__
+        return f"<ScheduledJob(id={d.get('id')}, scheduled_time={d.get('scheduled_time')}, status={d.get('status')})>"
 
-    @property
+    @hybrid_property
     def is_active(self) -> bool:
         """Verifica se è ancora schedulato o in esecuzione"""
         return self.status in (ScheduledJobStatus.SCHEDULED, ScheduledJobStatus.RUNNING)
 
-    @property
+    @is_active.expression
+    def is_active(cls):
+        return cls.status.in_((ScheduledJobStatus.SCHEDULED, ScheduledJobStatus.RUNNING))
+
+    @hybrid_property
     def can_cancel(self) -> bool:
         """Verifica se può essere cancellato"""
         return self.status == ScheduledJobStatus.SCHEDULED
 
+    @can_cancel.expression
+    def can_cancel(cls):
+        return cls.status == ScheduledJobStatus.SCHEDULED
+
     @property
     def time_until_start(self) -> int:
         """Secondi mancanti all'avvio (negativo se già passato)"""
@@ -4,13 +4,12 @@ Usage Log Model - Tracciamento utilizzo funzionalità
 Registra ogni azione degli utenti per statistiche admin
 """
 
-from sqlalchemy import Column, String, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
-from datetime import datetime
-import uuid
 
 from app.core.database import Base
-from app.core.types import UUID
+from app.core.types import UUID, JSONB, utc_now
+from app.core.ids import uuid7
 
 
 class UsageLog(Base):
@@ -19,24 +18,33 @@ class UsageLog(Base):
     __tablename__ = "usage_logs"
 
     # Primary Key
-    id = Column(UUID(), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(), primary_key=True, default=uuid7)
 
     # User reference
-    user_id = Column(UUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(UUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     # Azione tracciata
-    action_type = Column(String, nullable=False, index=True)  # 'chromakey', 'video_download', 'audio_transcribe', 'seo_analyze', 'youtube_upload', 'screen_record', 'pipeline_run'
-    action_details = Column(JSON, nullable=True)  # Dettagli extra (es. video_id, duration, source, etc.)
+    action_type = Column(String(64), nullable=False)  # 'chromakey', 'video_download', 'audio_transcribe', 'seo_analyze', 'youtube_upload', 'screen_record', 'pipeline_run'
+    action_details = Column(JSONB, nullable=True)  # Dettagli extra (es. video_id, duration, source, etc.)
 
     # Timestamp
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    timestamp = Column(DateTime, server_default=utc_now(), nullable=False, index=True)
 
     # IP e User Agent (opzionale, per analytics avanzato)
-    ip_address = Column(String, nullable=True)
+    ip_address = Column(String(45), nullable=True)  # IPv6 support
     user_agent = Column(String, nullable=True)
 
+    # Indici composti (colonna filtro, timestamp DESC) per query "ultime azioni di X"
+    __table_args__ = (
+        Index("ix_usage_log_user_time", user_id, timestamp.desc()),
+        Index("ix_usage_log_action_time", action_type, timestamp.desc()),
+        # GIN su JSONB per filtri di contenimento (action_details @> '{...}'), solo PostgreSQL
+        Index("ix_usage_log_details_gin", action_details, postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
     # Relationship
     user = relationship("User", back_populates="usage_logs")
 
     def __repr__(self):
-        return f"<UsageLog(id={self.id}, user_id={self.user_id}, action={self.action_type}, time={self.timestamp})>"
+        d = self.__dict__
+        return f"<UsageLog(id={d.get('id')}, user_id={d.get('user_id')}, action={d.get('action_type')}, time={d.get('timestamp')})>"
@@ -3,13 +3,13 @@ User Model - Gestione utenti
 =============================
 """
 
-from sqlalchemy import Column, String, Boolean, DateTime, Numeric
+from sqlalchemy import Column, String, Boolean, DateTime, Numeric, event
 from sqlalchemy.orm import relationship
-from datetime import datetime
-import uuid
 
 from app.core.database import Base
-from app.core.types import UUID
+from app.core.security import invalidate_cached_user
+from app.core.types import UUID, CIText, utc_now
+from app.core.ids import uuid7
 
 
 class User(Base):
@@ -18,11 +18,11 @@ class User(Base):
     __tablename__ = "users"
 
     # Primary Key
-    id = Column(UUID(), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(), primary_key=True, default=uuid7)
 
     # Credenziali
-    email = Column(String, unique=True, index=True, nullable=False)
-    username = Column(String, unique=True, index=True, nullable=False)
+    email = Column(CIText, unique=True, index=True, nullable=False)
+    username = Column(CIText, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
 
     # Info utente
@@ -34,8 +34,8 @@ class User(Base):
     is_verified = Column(Boolean, default=False)
 
     # Timestamp
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now(), nullable=False)
     last_login_at = Column(DateTime, nullable=True)
 
     # Subscription (per future subscription system)
@@ -45,11 +45,23 @@ class User(Base):
     total_spent = Column(Numeric(10, 2), default=0.00, nullable=False)  # Importo totale speso in EUR
 
     # Relationships
-    api_keys = relationship("APIKey", back_populates="user", cascade="all, delete-orphan")
-    jobs = relationship("Job", back_populates="user", cascade="all, delete-orphan")
-    pipelines = relationship("Pipeline", back_populates="user", cascade="all, delete-orphan")
-    usage_logs = relationship("UsageLog", back_populates="user", cascade="all, delete-orphan")
-    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
+    # Eliminazione figli delegata al DB (ForeignKey ondelete="CASCADE"): delete utente =
+    # un solo DELETE, senza caricare in sessione job/log/token per cancellarli riga per riga.
+    # passive_deletes="all": anche i figli già caricati non vengono toccati (niente UPDATE
+    # user_id=NULL, che violerebbe il NOT NULL prima del DELETE)
+    api_keys = relationship("APIKey", back_populates="user", cascade="save-update, merge", passive_deletes="all")
+    jobs = relationship("Job", back_populates="user", cascade="save-update, merge", passive_deletes="all")
+    pipelines = relationship("Pipeline", back_populates="user", cascade="save-update, merge", passive_deletes="all")
+    usage_logs = relationship("UsageLog", back_populates="user", cascade="save-update, merge", passive_deletes="all")
+    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="save-update, merge", passive_deletes="all")
 
     def __repr__(self):
-        return f"<User(id={self.id}, email={self.email}, username={self.username})>"
+        d = self.__dict__
+        return f"<User(id={d.get('id')}, email={d.get('email')}, username={d.get('username')})>"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    """Utente modificato o eliminato via ORM: rimuove lo snapshot dalla cache di get_current_user"""
+    invalidate_cached_user(target.id)
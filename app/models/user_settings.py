@@ -4,13 +4,20 @@ User Settings Model - Gestione impostazioni utente
 Salva preferenze e stato UI per ogni utente
 """
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON
-from sqlalchemy.orm import relationship
-from datetime import datetime
-import uuid
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar
+
+import msgspec
+import orjson
+from cachetools import TTLCache
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Text, cast, select
+from sqlalchemy.orm import relationship, backref, Session
 
 from app.core.database import Base
-from app.core.types import UUID
+from app.core.types import UUID, utc_now
+from app.core.ids import uuid7
 
 
 class UserSettings(Base):
@@ -19,10 +26,10 @@ class UserSettings(Base):
     __tablename__ = "user_settings"
 
     # Primary Key
-    id = Column(UUID(), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(), primary_key=True, default=uuid7)
 
     # Foreign Key
-    user_id = Column(UUID(), ForeignKey("users.id"), nullable=False, unique=True, index=True)
+    user_id = Column(UUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, unique=True, index=True)
 
     # Settings (JSON flessibile - può contenere qualsiasi cosa)
     settings = Column(
@@ -33,111 +40,310 @@ class UserSettings(Base):
     )
 
     # Timestamp
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now(), nullable=False)
 
     # Relationships
-    user = relationship("User", backref="settings")
+    user = relationship("User", backref=backref("settings", passive_deletes=True))
 
     def __repr__(self):
-        return f"<UserSettings(user_id={self.user_id})>"
+        d = self.__dict__
+        return f"<UserSettings(user_id={d.get('user_id')})>"
 
 
 # ==================== DEFAULT SETTINGS ====================
+# Schema tipizzato dei default (msgspec.Struct): unica sorgente dei valori di default.
+# La colonna `settings` resta un dict JSON libero (PATCH accetta path arbitrari):
+# decodificarla in Settings perderebbe le chiavi non previste dallo schema.
+
+
+class UiStateSettings(msgspec.Struct):
+    """Current UI state"""
+    current_tab: str = "chromakey"
+    current_subtab: Optional[str] = None
+    last_video_path: Optional[str] = None
+    last_video_name: Optional[str] = None
+
+
+class ChromakeySettings(msgspec.Struct):
+    """Chromakey preferences"""
+    green_color: str = "#00ff00"
+    threshold: int = 30
+    background_type: str = "color"
+    background_color: str = "#ffffff"
+    background_image: Optional[str] = None
+    background_video: Optional[str] = None
+
+
+class LogoSettings(msgspec.Struct):
+    """Logo Overlay preferences"""
+    logo_path: Optional[str] = None
+    position: str = "top-right"
+    size: int = 15
+    opacity: int = 100
+
+
+class TranslationSettings(msgspec.Struct):
+    """Translation preferences"""
+    source_language: str = "auto"
+    target_language: str = "it"
+    voice_id: str = "21m00Tcm4TlvDq8ikWAM"
+    preserve_original_audio: bool = False
+    model: str = "eleven_multilingual_v2"
+
+
+class TranscriptionSettings(msgspec.Struct):
+    """Transcription preferences"""
+    language: str = "auto"
+    model_size: str = "base"
+    output_format: str = "srt"
+
+
+class SeoMetadataSettings(msgspec.Struct):
+    """SEO Metadata preferences"""
+    target_platform: str = "youtube"
+    language: str = "it"
+    num_hashtags: int = 10
+    num_tags: int = 30
+    generate_thumbnail: bool = True
+    thumbnail_style: str = "modern"
+
+
+class YouTubeSettings(msgspec.Struct):
+    """YouTube Upload preferences"""
+    title: str = ""
+    description: str = ""
+    tags: str = ""
+    category: str = "22"
+    privacy: str = "private"
+    auto_publish: bool = False
+    playlist_id: Optional[str] = None
+
+
+class VideoDownloadSettings(msgspec.Struct):
+    """Video Download preferences"""
+    quality: str = "best"
+    format: str = "mp4"
+    audio_only: bool = False
+    subtitles: bool = False
+
+
+class ScreenRecorderSettings(msgspec.Struct):
+    """Screen Recorder preferences"""
+    video_quality: str = "high"
+    fps: int = 30
+    audio_source: str = "system"
+    include_microphone: bool = False
+
+
+class PipelineSettings(msgspec.Struct):
+    """Pipeline Orchestrator state"""
+    last_source: Optional[str] = None
+    last_steps: List[Any] = msgspec.field(default_factory=list)
+    favorite_templates: List[Any] = msgspec.field(default_factory=list)
+
+
+class ThumbnailSettings(msgspec.Struct):
+    """Thumbnail Generator preferences"""
+    style: str = "modern"
+    overlay_text: bool = True
+    font_size: int = 48
+    text_color: str = "#ffffff"
+    text_position: str = "center"
+
+
+class Settings(msgspec.Struct):
+    """Impostazioni utente complete (una sezione per tool)"""
+    ui_state: UiStateSettings = msgspec.field(default_factory=UiStateSettings)
+    chromakey: ChromakeySettings = msgspec.field(default_factory=ChromakeySettings)
+    logo: LogoSettings = msgspec.field(default_factory=LogoSettings)
+    translation: TranslationSettings = msgspec.field(default_factory=TranslationSettings)
+    transcription: TranscriptionSettings = msgspec.field(default_factory=TranscriptionSettings)
+    seo_metadata: SeoMetadataSettings = msgspec.field(default_factory=SeoMetadataSettings)
+    youtube: YouTubeSettings = msgspec.field(default_factory=YouTubeSettings)
+    video_download: VideoDownloadSettings = msgspec.field(default_factory=VideoDownloadSettings)
+    screen_recorder: ScreenRecorderSettings = msgspec.field(default_factory=ScreenRecorderSettings)
+    pipeline: PipelineSettings = msgspec.field(default_factory=PipelineSettings)
+    thumbnail: ThumbnailSettings = msgspec.field(default_factory=ThumbnailSettings)
+
+
+def _freeze(value):
+    """Copia read-only ricorsiva (dict → MappingProxyType, list → tuple)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# Default serializzati una volta all'import: ogni copia è un orjson.loads (C),
+# molto più veloce di copy.deepcopy su un albero JSON
+_DEFAULT_SETTINGS_BYTES = orjson.dumps(msgspec.to_builtins(Settings()))
+
+# Vista immutabile dei default (solo lettura). Per ottenere un dict modificabile
+# da salvare nella colonna usare get_default_settings()
+DEFAULT_SETTINGS = _freeze(orjson.loads(_DEFAULT_SETTINGS_BYTES))
+
+
+def get_default_settings() -> dict:
+    """
+    Copia profonda e modificabile delle impostazioni di default.
+
+    Returns:
+        dict: Nuovo dict indipendente (nessun riferimento condiviso con altri utenti)
+    """
+    return orjson.loads(_DEFAULT_SETTINGS_BYTES)
+
+
+# ==================== LETTURA BULK ====================
 
-DEFAULT_SETTINGS = {
-    # Current UI state
-    "ui_state": {
-        "current_tab": "chromakey",
-        "current_subtab": None,
-        "last_video_path": None,
-        "last_video_name": None
-    },
-
-    # Chromakey preferences
-    "chromakey": {
-        "green_color": "#00ff00",
-        "threshold": 30,
-        "background_type": "color",
-        "background_color": "#ffffff",
-        "background_image": None,
-        "background_video": None
-    },
-
-    # Logo Overlay preferences
-    "logo": {
-        "logo_path": None,
-        "position": "top-right",
-        "size": 15,
-        "opacity": 100
-    },
-
-    # Translation preferences
-    "translation": {
-        "source_language": "auto",
-        "target_language": "it",
-        "voice_id": "21m00Tcm4TlvDq8ikWAM",
-        "preserve_original_audio": False,
-        "model": "eleven_multilingual_v2"
-    },
-
-    # Transcription preferences
-    "transcription": {
-        "language": "auto",
-        "model_size": "base",
-        "output_format": "srt"
-    },
-
-    # SEO Metadata preferences
-    "seo_metadata": {
-        "target_platform": "youtube",
-        "language": "it",
-        "num_hashtags": 10,
-        "num_tags": 30,
-        "generate_thumbnail": True,
-        "thumbnail_style": "modern"
-    },
-
-    # YouTube Upload preferences
-    "youtube": {
-        "title": "",
-        "description": "",
-        "tags": "",
-        "category": "22",
-        "privacy": "private",
-        "auto_publish": False,
-        "playlist_id": None
-    },
-
-    # Video Download preferences
-    "video_download": {
-        "quality": "best",
-        "format": "mp4",
-        "audio_only": False,
-        "subtitles": False
-    },
-
-    # Screen Recorder preferences
-    "screen_recorder": {
-        "video_quality": "high",
-        "fps": 30,
-        "audio_source": "system",
-        "include_microphone": False
-    },
-
-    # Pipeline Orchestrator state
-    "pipeline": {
-        "last_source": None,
-        "last_steps": [],
-        "favorite_templates": []
-    },
-
-    # Thumbnail Generator preferences
-    "thumbnail": {
-        "style": "modern",
-        "overlay_text": True,
-        "font_size": 48,
-        "text_color": "#ffffff",
-        "text_position": "center"
+T = TypeVar("T", bound=msgspec.Struct)
+
+
+@lru_cache(maxsize=None)
+def _settings_decoder(view_type: type) -> msgspec.json.Decoder:
+    """Decoder msgspec tipizzato, creato una volta per tipo di vista"""
+    return msgspec.json.Decoder(view_type)
+
+
+def iter_settings(
+    db: Session,
+    view_type: Type[T] = Settings,
+    user_ids: Optional[Iterable[Any]] = None,
+    batch_size: int = 1000
+) -> Iterator[Tuple[Any, T]]:
+    """
+    Lettura bulk impostazioni (admin/analytics) con decodifica tipizzata msgspec.
+
+    La colonna viene letta come testo e decodificata direttamente in view_type:
+    niente json.loads per riga in un dict completo, e i campi non dichiarati
+    nella vista vengono saltati dal parser. Righe in streaming (yield_per).
+
+    Per leggere solo alcune sezioni basta una vista ridotta, es.:
+
+        class LanguageView(msgspec.Struct):
+            translation: TranslationSettings = msgspec.field(default_factory=TranslationSettings)
+
+    Args:
+        db: Database session
+        view_type: Struct msgspec in cui decodificare (default: Settings completo)
+        user_ids: Limita agli utenti indicati (default: tutti)
+        batch_size: Righe per fetch
+
+    Yields:
+        tuple: (user_id, impostazioni decodificate)
+
+    Raises:
+        msgspec.ValidationError: Se una riga ha tipi diversi da quelli della vista
+    """
+    decoder = _settings_decoder(view_type)
+
+    stmt = select(UserSettings.user_id, cast(UserSettings.settings, Text))
+    if user_ids is not None:
+        stmt = stmt.where(UserSettings.user_id.in_(list(user_ids)))
+
+    for user_id, raw in db.execute(stmt.execution_options(yield_per=batch_size)):
+        yield user_id, decoder.decode(raw)
+
+
+# ==================== CACHE PER UTENTE ====================
+
+# Snapshot impostazioni per utente: {user_id: dict risposta API}. Letture servite
+# dalla cache; le scritture vanno sempre sulla riga DB e aggiornano la cache
+# (write-through). Il TTL breve limita la staleness vista dagli altri worker.
+# Gli snapshot sono condivisi tra richieste: non vanno modificati in place.
+_settings_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+_settings_cache_lock = threading.Lock()
+
+
+def _snapshot(user_settings: UserSettings) -> Dict[str, Any]:
+    """Snapshot colonne della riga (detached, sicuro da condividere tra session)"""
+    return {
+        "id": user_settings.id,
+        "user_id": user_settings.user_id,
+        "settings": user_settings.settings,
+        "created_at": user_settings.created_at,
+        "updated_at": user_settings.updated_at,
     }
-}
+
+
+def invalidate_cached_settings(user_id: Any):
+    """Rimuove impostazioni utente dalla cache"""
+    with _settings_cache_lock:
+        _settings_cache.pop(user_id, None)
+
+
+def get_settings(db: Session, user_id: Any) -> Dict[str, Any]:
+    """
+    Impostazioni utente passando dalla cache (crea la riga con i default se manca).
+
+    Args:
+        db: Database session
+        user_id: ID utente
+
+    Returns:
+        dict: id, user_id, settings, created_at, updated_at (sola lettura)
+    """
+    with _settings_cache_lock:
+        cached = _settings_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    user_settings = db.query(UserSettings).filter(UserSettings.user_id == user_id).first()
+    if user_settings is None:
+        return update_settings(db, user_id, lambda current: current)
+
+    snapshot = _snapshot(user_settings)
+    with _settings_cache_lock:
+        _settings_cache[user_id] = snapshot
+    return snapshot
+
+
+def update_settings(
+    db: Session,
+    user_id: Any,
+    update: Callable[[dict], dict]
+) -> Dict[str, Any]:
+    """
+    Read-modify-write delle impostazioni utente + aggiornamento cache.
+
+    Legge sempre la riga dal DB (FOR UPDATE su PostgreSQL), mai dalla cache:
+    un altro worker può aver scritto nel frattempo e il merge su uno snapshot
+    vecchio perderebbe le sue modifiche.
+
+    Args:
+        db: Database session
+        user_id: ID utente
+        update: Funzione impostazioni correnti -> nuove impostazioni. Riceve i
+            default se l'utente non ha ancora una riga; deve ritornare un nuovo
+            dict senza modificare quello ricevuto
+
+    Returns:
+        dict: Snapshot aggiornato (come get_settings)
+    """
+    user_settings = (
+        db.query(UserSettings)
+        .filter(UserSettings.user_id == user_id)
+        .with_for_update()
+        .first()
+    )
+
+    if user_settings is None:
+        user_settings = UserSettings(user_id=user_id, settings=update(get_default_settings()))
+        db.add(user_settings)
+    else:
+        user_settings.settings = update(user_settings.settings)
+
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        invalidate_cached_settings(user_id)
+        raise
+
+    db.refresh(user_settings)
+
+    snapshot = _snapshot(user_settings)
+    with _settings_cache_lock:
+        _settings_cache[user_id] = snapshot
+    return snapshot
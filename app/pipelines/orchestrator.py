@@ -22,14 +22,22 @@ Esempio Pipeline AUTO completa:
 """
 
 import logging
-from typing import Dict, Any, Optional, Callable, List
+import os
+import threading
+import time
+from functools import partial, cached_property
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, Callable, List, Tuple, ClassVar
 from pathlib import Path
+from uuid import UUID
 from dataclasses import dataclass
 from datetime import datetime
+from sqlalchemy import insert, update, bindparam
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.models.job import Job, JobType, JobStatus
+from app.core.ids import uuid7
+from app.models.job import Job, JobPayload, JobType, JobStatus
 from app.models.pipeline import Pipeline, PipelineStatus
 from app.services.chromakey_service import ChromakeyService, ChromakeyParams
 from app.services.translation_service import TranslationService, TranslationParams
@@ -43,8 +51,75 @@ from app.services.logo_overlay_service import LogoOverlayService, LogoOverlayPar
 
 logger = logging.getLogger(__name__)
 
-
-@dataclass
+# Commit progresso job solo se avanzato di almeno N punti o dopo T secondi:
+# gli aggiornamenti intermedi restano in memoria (scritti col prossimo UPDATE)
+PROGRESS_COMMIT_MIN_DELTA = 5
+PROGRESS_COMMIT_MIN_INTERVAL = 1.0
+
+# Step eseguibili in parallelo (opt-in con pipeline.parallel_groups): leggono tutti
+# lo stesso input e scrivono output distinti (es. traduzioni in lingue diverse).
+# Con parameters['depends_on'] negli step il raggruppamento segue il DAG (_build_dag)
+PARALLEL_JOB_TYPES = frozenset({JobType.TRANSLATION})
+MAX_PARALLEL_STEPS = 3
+
+# Default parametri step: un solo merge {**defaults, **params} invece di N params.get()
+_CHROMAKEY_DEFAULTS: Dict[str, Any] = {
+    'start_time': 0.0,
+    'duration': None,
+    'lower_hsv': (40, 40, 40),
+    'upper_hsv': (80, 255, 255),
+    'audio_mode': 'synced',
+    'x_pos': 0,
+    'y_pos': 0,
+    'scale': 1.0,
+    'opacity': 1.0,
+    'fast_mode': True,
+    'gpu_accel': False,
+    'fused_kernel': False,
+    'ffmpeg_filtergraph': False,
+    'mask_interp': 'linear',
+    'green_approx': False,
+    'logo_x': 0,
+    'logo_y': 0,
+}
+
+_THUMBNAIL_DEFAULTS: Dict[str, Any] = {
+    'ai_description': None,
+    'ai_style': None,
+    'video_path': None,
+    'upload_image_path': None,
+    'frame_timestamp': 0.0,
+    'text': None,
+    'text_position': 'center',
+    'text_color': '#FFFFFF',
+    'text_bg_color': '#000000',
+    'text_bg_opacity': 0.7,
+    'enhance_ctr': True,
+}
+
+# UPDATE progresso job costruito una volta (Core, su Table: niente identity map
+# né synchronize_session); i tick passano solo i parametri
+_JOB_PROGRESS_UPDATE = (
+    update(Job.__table__)
+    .where(Job.__table__.c.id == bindparam("_id"))
+    .values(progress=bindparam("_progress"), message=bindparam("_message"))
+)
+
+# Lookup diretto valore -> membro JobType (salta il validator di Enum.__new__)
+_JOB_TYPES_BY_VALUE = JobType._value2member_map_
+
+
+def _to_job_type(value: Any) -> JobType:
+    """Converte job_type di uno step (stringa da JSON) in JobType"""
+    job_type = _JOB_TYPES_BY_VALUE.get(value)
+    if job_type is None:
+        if isinstance(value, JobType):
+            return value
+        raise ValueError(f"{value!r} is not a valid JobType")
+    return job_type
+
+
+@dataclass(slots=True)
 class PipelineStep:
     """Singolo step pipeline"""
     step_number: int
@@ -61,6 +136,78 @@ class PipelineOrchestrator:
     passando output come input tra step.
     """
 
+    # Servizi condivisi tra orchestratori (un orchestratore per richiesta): i modelli
+    # Whisper restano caricati tra una pipeline e l'altra. Le pipeline girano in thread
+    # concorrenti (BackgroundTasks): si condividono solo servizi thread-safe, i modelli
+    # Whisper sono usati sotto il lock del service (un transcribe alla volta).
+    # id(config) -> (config, {nome: servizio}); il config è tenuto in vita per non riusarne l'id
+    _services_cache: ClassVar[Dict[int, Tuple[Any, Dict[str, Any]]]] = {}
+    _services_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def _shared_service(self, name: str, factory: Callable[[Any], Any]) -> Any:
+        """
+        Servizio condiviso per il config di questo orchestratore, creato al primo uso.
+
+        Args:
+            name: Nome servizio (chiave cache)
+            factory: Classe servizio (chiamata con il config)
+
+        Returns:
+            Istanza servizio condivisa
+        """
+        config = self._services_config
+
+        with self._services_lock:
+            entry = self._services_cache.get(id(config))
+            if entry is None:
+                entry = self._services_cache[id(config)] = (config, {})
+
+            services = entry[1]
+            service = services.get(name)
+            if service is None:
+                service = services[name] = factory(config)
+                logger.info(f"✅ Servizio pipeline inizializzato: {name}")
+
+        return service
+
+    # Servizi lazy: una pipeline solo chromakey non inizializza Whisper né OAuth YouTube.
+    # cached_property: dopo il primo accesso il servizio è nel __dict__ dell'istanza
+
+    @cached_property
+    def chromakey_service(self) -> ChromakeyService:
+        return self._shared_service("chromakey_service", ChromakeyService)
+
+    @cached_property
+    def translation_service(self) -> TranslationService:
+        return self._shared_service("translation_service", TranslationService)
+
+    @cached_property
+    def thumbnail_service(self) -> ThumbnailService:
+        return self._shared_service("thumbnail_service", ThumbnailService)
+
+    @cached_property
+    def youtube_service(self) -> YouTubeService:
+        # Non condiviso: il client API (httplib2) non è thread-safe e un upload dura minuti
+        return YouTubeService(self._services_config)
+
+    @cached_property
+    def metadata_service(self) -> MetadataService:
+        return self._shared_service("metadata_service", MetadataService)
+
+    @cached_property
+    def transcription_service(self) -> TranscriptionService:
+        return self._shared_service("transcription_service", TranscriptionService)
+
+    @cached_property
+    def logo_overlay_service(self) -> LogoOverlayService:
+        return self._shared_service("logo_overlay_service", LogoOverlayService)
+
+    # screen_record_service: richiede PyGetWindow (temporaneamente disabilitato)
+
+    @cached_property
+    def seo_metadata_service(self) -> SEOMetadataService:
+        return self._shared_service("seo_metadata_service", SEOMetadataService)
+
     def __init__(self, db: Session, config: Optional[Any] = None):
         """
         Inizializza orchestratore
@@ -71,31 +218,50 @@ class PipelineOrchestrator:
         """
         self.db = db
         self.config = config or settings
-
-        # Inizializza servizi disponibili (8 di 9 - 1 temporaneamente disabilitato)
-        self.chromakey_service = ChromakeyService(config)
-        self.translation_service = TranslationService(config)
-        self.thumbnail_service = ThumbnailService(config)
-        self.youtube_service = YouTubeService(config)
-        self.metadata_service = MetadataService(config)
-        self.transcription_service = TranscriptionService(config)
-        self.logo_overlay_service = LogoOverlayService(config)
-        # self.screen_record_service = ScreenRecordService(config)  # Richiede PyGetWindow
-        self.seo_metadata_service = SEOMetadataService(config)
-
-        logger.info("✅ PipelineOrchestrator inizializzato con 8 servizi (1 temporaneamente disabilitato: screen_record)")
+        self._output_dir = Path(self.config.output_dir)
+        # Prefisso stringa (dir + separatore): i path output si compongono come str,
+        # Path solo dove il service lo richiede
+        self._output_prefix = os.path.join(str(self._output_dir), "")
+
+        # Ultimo progresso job persistito: (progress, time.monotonic())
+        self._last_progress_commit = (0, 0.0)
+        # Ultimo progresso job ricevuto e non ancora scritto: {progress, message}
+        self._pending_progress: Dict[str, Any] = {}
+
+        # Servizi creati al primo uso e condivisi (vedi _shared_service): i service
+        # ricevono il config originale (None = settings globale)
+        self._services_config = config
+
+        # Dispatch job_type -> handler, costruito una volta per orchestratore
+        self._dispatch: Dict[JobType, Callable] = {
+            JobType.CHROMAKEY: self._execute_chromakey,
+            JobType.THUMBNAIL: self._execute_thumbnail,
+            JobType.TRANSLATION: self._execute_translation,
+            JobType.YOUTUBE_UPLOAD: self._execute_youtube_upload,
+            JobType.METADATA_EXTRACTION: self._execute_metadata,
+            JobType.TRANSCRIPTION: self._execute_transcription,
+            JobType.LOGO_OVERLAY: self._execute_logo_overlay,
+            # JobType.SCREEN_RECORD: self._execute_screen_record,  # Richiede PyGetWindow
+            JobType.SEO_METADATA: self._execute_seo_metadata,
+        }
 
     def execute_pipeline(
         self,
         pipeline: Pipeline,
-        progress_callback: Optional[Callable[[int, str], bool]] = None
+        progress_callback: Optional[Callable[[int, str], bool]] = None,
+        resume: bool = False
     ) -> Dict[str, Any]:
         """
         Esegue pipeline completa
 
+        Dopo ogni step completato il risultato viene salvato in pipeline.checkpoint
+        (stesso commit della chiusura job). Con resume=True gli step già completati
+        nell'esecuzione precedente, con file output ancora su disco, vengono saltati.
+
         Args:
             pipeline: Oggetto Pipeline da database
             progress_callback: Callback progresso globale
+            resume: Riprende dal checkpoint dell'esecuzione precedente
 
         Returns:
             dict: Risultato finale pipeline con output di tutti gli step
@@ -103,60 +269,105 @@ class PipelineOrchestrator:
         Raises:
             RuntimeError: Se pipeline fallisce e stop_on_error=True
         """
-        logger.info(f"🚀 Avvio esecuzione pipeline: {pipeline.name} (ID: {pipeline.id})")
-        logger.info(f"   Totale step: {pipeline.total_steps}")
-        logger.info(f"   Stop on error: {pipeline.stop_on_error}")
-
-        # Aggiorna stato pipeline
-        pipeline.status = PipelineStatus.RUNNING
-        pipeline.started_at = datetime.utcnow()
-        pipeline.message = "Pipeline avviata..."
-        self.db.commit()
+        # Snapshot attributi pipeline in locali: ogni commit espira l'istanza ORM,
+        # rileggerli nel loop significherebbe un SELECT (e parse JSON di steps) per accesso
+        pipeline_id = pipeline.id
+        pipeline_name = pipeline.name
+        user_id = pipeline.user_id
+        total_steps = pipeline.total_steps
+        stop_on_error = pipeline.stop_on_error
+        enabled_steps = pipeline.enabled_steps
+        parallel_groups = pipeline.parallel_groups
+        current_files = dict(pipeline.input_files or {})
+
+        # step_number (str, chiave JSON) -> risultato step completato
+        checkpoint: Dict[str, Any] = {}
+        results = {}
+        if resume:
+            checkpoint, results = self._load_checkpoint(
+                pipeline.checkpoint or {}, enabled_steps, current_files
+            )
+
+        # Campi strutturati (extra) comuni ai log della pipeline: argomenti %-style
+        # formattati solo se il record viene emesso
+        log_extra = {"pipeline_id": pipeline_id, "pipeline_name": pipeline_name}
+
+        logger.info(
+            "🚀 Avvio esecuzione pipeline: %s (ID: %s) - %s step, stop on error: %s",
+            pipeline_name, pipeline_id, total_steps, stop_on_error,
+            extra={**log_extra, "total_steps": total_steps, "stop_on_error": stop_on_error}
+        )
+        if checkpoint:
+            logger.info(
+                "   Resume: %s step già completati saltati", len(checkpoint),
+                extra={**log_extra, "resumed_steps": len(checkpoint)}
+            )
+
+        # Aggiorna stato pipeline: checkpoint ridotto agli step ripresi (vuoto senza resume)
+        self._update_pipeline(
+            pipeline_id,
+            status=PipelineStatus.RUNNING,
+            started_at=datetime.utcnow(),
+            message="Pipeline avviata...",
+            checkpoint=checkpoint
+        )
 
         if progress_callback:
-            progress_callback(0, f"Pipeline {pipeline.name} avviata")
-
-        results = {}
-        current_files = pipeline.input_files or {}
+            progress_callback(0, f"Pipeline {pipeline_name} avviata")
 
         try:
-            # Esegui ogni step abilitato
-            for step_data in pipeline.enabled_steps:
+            # Dentro il try: depends_on non valido chiude la pipeline come FAILED
+            if parallel_groups:
+                step_groups = self._build_dag(enabled_steps)
+            else:
+                step_groups = [[step_data] for step_data in enabled_steps]
+
+            # Esegui ogni step abilitato (o gruppo di step indipendenti)
+            for group in step_groups:
+                if checkpoint:
+                    group = [s for s in group if str(s['step_number']) not in checkpoint]
+                    if not group:
+                        continue
+
+                if len(group) > 1:
+                    self._execute_parallel_group(
+                        group, pipeline_id, user_id, pipeline_name, total_steps,
+                        stop_on_error, current_files, results, checkpoint, progress_callback
+                    )
+                    continue
+
+                step_data = group[0]
                 step_num = step_data['step_number']
-                job_type = JobType(step_data['job_type'])
+                job_type = _to_job_type(step_data['job_type'])
                 params = step_data['parameters']
 
-                logger.info(f"📋 Step {step_num}/{pipeline.total_steps}: {job_type.value}")
+                step_extra = {**log_extra, "step": step_num, "job_type": job_type.value}
+                logger.info("📋 Step %s/%s: %s", step_num, total_steps, job_type.value, extra=step_extra)
 
-                # Aggiorna pipeline
-                pipeline.current_step = step_num
-                pipeline.message = f"Esecuzione {job_type.value}..."
-                self.db.commit()
+                # Aggiorna pipeline e crea Job per tracking: un solo commit per inizio step
+                self.db.execute(
+                    update(Pipeline.__table__)
+                    .where(Pipeline.__table__.c.id == pipeline_id)
+                    .values(current_step=step_num, message=f"Esecuzione {job_type.value}...")
+                )
+                job_id = self._create_job(
+                    pipeline_id, user_id, pipeline_name, job_type, params, current_files, step_num
+                )
 
                 # Calcola progress globale
-                global_progress = int((step_num / pipeline.total_steps) * 100)
+                global_progress = int((step_num / total_steps) * 100)
                 if progress_callback:
                     progress_callback(global_progress, f"Step {step_num}: {job_type.value}")
 
-                # Crea Job nel database per tracking
-                job = self._create_job(pipeline, job_type, params, current_files)
-
                 try:
                     # Esegui step
                     step_result = self._execute_step(
                         job_type,
                         params,
                         current_files,
-                        lambda p, m: self._step_progress_callback(job, p, m, progress_callback)
+                        partial(self._step_progress_callback, job_id, global_callback=progress_callback)
                     )
 
-                    # Aggiorna job success
-                    job.status = JobStatus.COMPLETED
-                    job.completed_at = datetime.utcnow()
-                    job.result = step_result
-                    job.output_files = step_result.get('output_files', {})
-                    self.db.commit()
-
                     # Accumula risultati
                     results[job_type.value] = step_result
 
@@ -164,56 +375,321 @@ class PipelineOrchestrator:
                     if step_result.get('output_files'):
                         current_files.update(step_result['output_files'])
 
-                    logger.info(f"✅ Step {step_num} completato: {job_type.value}")
+                    # Checkpoint pipeline + job success in un solo commit
+                    checkpoint[str(step_num)] = step_result
+                    self._save_checkpoint(pipeline_id, checkpoint, current_files)
+                    self._finish_job(
+                        job_id,
+                        {"status": JobStatus.COMPLETED, "progress": 100},
+                        {"result": step_result, "output_files": step_result.get('output_files', {})}
+                    )
+
+                    logger.info("✅ Step %s completato: %s", step_num, job_type.value, extra=step_extra)
 
                 except Exception as e:
                     # Step fallito
-                    logger.error(f"❌ Step {step_num} fallito: {e}")
+                    logger.error("❌ Step %s fallito: %s", step_num, e, extra=step_extra)
 
-                    job.status = JobStatus.FAILED
-                    job.error = str(e)
-                    job.completed_at = datetime.utcnow()
-                    self.db.commit()
+                    self._finish_job(job_id, {"status": JobStatus.FAILED}, {"error": str(e)})
 
                     results[job_type.value] = {"success": False, "error": str(e)}
 
-                    if pipeline.stop_on_error:
+                    if stop_on_error:
                         raise RuntimeError(f"Pipeline interrotta: step {step_num} fallito: {e}")
 
             # Pipeline completata
-            pipeline.status = PipelineStatus.COMPLETED
-            pipeline.completed_at = datetime.utcnow()
-            pipeline.output_files = current_files
-            pipeline.result = results
-            pipeline.message = "Pipeline completata con successo!"
-            self.db.commit()
+            self._update_pipeline(
+                pipeline_id,
+                status=PipelineStatus.COMPLETED,
+                completed_at=datetime.utcnow(),
+                output_files=current_files,
+                result=results,
+                message="Pipeline completata con successo!"
+            )
 
             if progress_callback:
                 progress_callback(100, "✅ Pipeline completata!")
 
-            logger.info(f"✅ Pipeline {pipeline.name} completata con successo")
+            logger.info("✅ Pipeline %s completata con successo", pipeline_name, extra=log_extra)
 
             return {
                 "success": True,
-                "pipeline_id": str(pipeline.id),
+                "pipeline_id": str(pipeline_id),
                 "results": results,
                 "output_files": current_files
             }
 
         except Exception as e:
             # Pipeline fallita
-            logger.error(f"❌ Pipeline {pipeline.name} fallita: {e}")
+            logger.error("❌ Pipeline %s fallita: %s", pipeline_name, e, extra=log_extra)
 
-            pipeline.status = PipelineStatus.FAILED
-            pipeline.error = str(e)
-            pipeline.completed_at = datetime.utcnow()
-            self.db.commit()
+            self.db.rollback()
+            self._update_pipeline(
+                pipeline_id,
+                status=PipelineStatus.FAILED,
+                error=str(e),
+                completed_at=datetime.utcnow()
+            )
 
             if progress_callback:
                 progress_callback(-1, f"❌ Pipeline fallita: {e}")
 
             raise
 
+    @staticmethod
+    def _plan_step_groups(enabled_steps: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Raggruppa step consecutivi indipendenti eseguibili in parallelo.
+
+        Un gruppo è una sequenza contigua di step dello stesso job_type in
+        PARALLEL_JOB_TYPES con target_language distinte: nessuno consuma
+        l'output degli altri. Tutti gli altri step restano gruppi da 1.
+
+        Args:
+            enabled_steps: Step abilitati in ordine di esecuzione
+
+        Returns:
+            list: Gruppi di step (liste) in ordine di esecuzione
+        """
+        groups: List[List[Dict[str, Any]]] = []
+
+        for step_data in enabled_steps:
+            job_type = _to_job_type(step_data['job_type'])
+            last = groups[-1] if groups else None
+
+            if (
+                last is not None
+                and job_type in PARALLEL_JOB_TYPES
+                and last[0]['job_type'] == step_data['job_type']
+                and len(last) < MAX_PARALLEL_STEPS
+                and step_data['parameters'].get('target_language') not in {
+                    s['parameters'].get('target_language') for s in last
+                }
+            ):
+                last.append(step_data)
+            else:
+                groups.append([step_data])
+
+        return groups
+
+    @classmethod
+    def _build_dag(cls, enabled_steps: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Raggruppa gli step in ondate (wave) secondo le dipendenze dichiarate.
+
+        parameters['depends_on'] (opzionale) elenca gli step_number di cui lo step
+        usa gli output; uno step senza depends_on dipende dallo step abilitato
+        precedente (catena lineare, come l'esecuzione sequenziale). Ogni step va
+        nell'ondata successiva alla più alta delle sue dipendenze: gli step di
+        una stessa ondata leggono gli output delle ondate precedenti e girano in
+        parallelo (al massimo MAX_PARALLEL_STEPS per gruppo).
+
+        Se nessuno step dichiara depends_on si usa _plan_step_groups.
+
+        Args:
+            enabled_steps: Step abilitati in ordine di esecuzione
+
+        Returns:
+            list: Gruppi di step (liste) in ordine di esecuzione
+
+        Raises:
+            ValueError: Se depends_on riferisce uno step non precedente o non abilitato
+        """
+        if not any('depends_on' in s['parameters'] for s in enabled_steps):
+            return cls._plan_step_groups(enabled_steps)
+
+        # step_number -> indice ondata
+        wave_of: Dict[int, int] = {}
+        waves: List[List[Dict[str, Any]]] = []
+        previous = None
+
+        for step_data in enabled_steps:
+            step_num = step_data['step_number']
+            depends_on = step_data['parameters'].get('depends_on')
+            if depends_on is None:
+                depends_on = [] if previous is None else [previous]
+
+            wave = 0
+            for dep in depends_on:
+                if dep >= step_num:
+                    raise ValueError(
+                        f"Step {step_num}: depends_on può riferire solo step precedenti (trovato {dep})"
+                    )
+                # Step disabilitato o inesistente: il suo output non verrebbe mai prodotto
+                if dep not in wave_of:
+                    raise ValueError(
+                        f"Step {step_num}: depends_on riferisce lo step {dep}, non abilitato"
+                    )
+                wave = max(wave, wave_of[dep] + 1)
+
+            wave_of[step_num] = wave
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append(step_data)
+            previous = step_num
+
+        return [
+            wave[i:i + MAX_PARALLEL_STEPS]
+            for wave in waves
+            for i in range(0, len(wave), MAX_PARALLEL_STEPS)
+        ]
+
+    def _execute_parallel_group(
+        self,
+        group: List[Dict[str, Any]],
+        pipeline_id: UUID,
+        user_id: UUID,
+        pipeline_name: str,
+        total_steps: int,
+        stop_on_error: bool,
+        current_files: Dict[str, str],
+        results: Dict[str, Any],
+        checkpoint: Dict[str, Any],
+        progress_callback: Optional[Callable]
+    ):
+        """
+        Esegue un gruppo di step indipendenti su un ThreadPoolExecutor.
+
+        La sessione DB non è thread-safe: job creati, progresso e chiusura job
+        vengono scritti solo dal thread chiamante. I worker registrano l'ultimo
+        progresso in memoria, scritto ogni PROGRESS_COMMIT_MIN_INTERVAL secondi.
+        Output e risultati vengono uniti in ordine di step dopo che tutto il
+        gruppo è terminato.
+
+        Raises:
+            RuntimeError: Se uno step fallisce e stop_on_error=True
+        """
+        first_step = group[0]['step_number']
+        last_step = group[-1]['step_number']
+        job_types = [_to_job_type(step_data['job_type']) for step_data in group]
+        # Etichetta gruppo: "translation" (stesso tipo) o "thumbnail+translation" (ondata DAG)
+        label = "+".join(dict.fromkeys(job_type.value for job_type in job_types))
+
+        logger.info(
+            "📋 Step %s-%s/%s: %s x%s in parallelo",
+            first_step, last_step, total_steps, label, len(group),
+            extra={"pipeline_id": pipeline_id, "step": first_step, "job_type": label, "parallel": len(group)}
+        )
+
+        self.db.execute(
+            update(Pipeline.__table__)
+            .where(Pipeline.__table__.c.id == pipeline_id)
+            .values(
+                current_step=first_step,
+                message=f"Esecuzione {label} x{len(group)} in parallelo..."
+            )
+        )
+
+        # Tutti gli step del gruppo leggono lo stesso snapshot degli input
+        group_input = dict(current_files)
+        job_ids = [
+            self._create_job(
+                pipeline_id, user_id, pipeline_name, job_type,
+                step_data['parameters'], group_input, step_data['step_number']
+            )
+            for step_data, job_type in zip(group, job_types)
+        ]
+
+        if progress_callback:
+            progress_callback(
+                int((last_step / total_steps) * 100),
+                f"Step {first_step}-{last_step}: {label}"
+            )
+
+        # job_id -> ultimo progresso ricevuto dai worker (non ancora scritto)
+        latest: Dict[UUID, Dict[str, Any]] = {}
+        latest_lock = threading.Lock()
+
+        def make_callback(job_id):
+            def callback(progress, message):
+                with latest_lock:
+                    latest[job_id] = {"progress": progress, "message": message}
+                return True
+            return callback
+
+        outcomes: Dict[UUID, Any] = {}
+
+        with ThreadPoolExecutor(max_workers=min(len(group), MAX_PARALLEL_STEPS)) as executor:
+            futures = {
+                executor.submit(
+                    self._execute_step,
+                    job_type,
+                    step_data['parameters'],
+                    dict(group_input),
+                    make_callback(job_id)
+                ): job_id
+                for step_data, job_type, job_id in zip(group, job_types, job_ids)
+            }
+
+            pending = set(futures)
+            while pending:
+                done, pending = wait(
+                    pending, timeout=PROGRESS_COMMIT_MIN_INTERVAL, return_when=FIRST_COMPLETED
+                )
+
+                with latest_lock:
+                    ticks = dict(latest)
+                    latest.clear()
+
+                # Job terminati: chiusura con l'ultimo progresso nello stesso UPDATE
+                for future in done:
+                    job_id = futures[future]
+                    last_tick = ticks.pop(job_id, {})
+                    try:
+                        step_result = future.result()
+                        self._finish_job(
+                            job_id,
+                            {"status": JobStatus.COMPLETED, "progress": 100},
+                            {"result": step_result, "output_files": step_result.get('output_files', {})}
+                        )
+                        outcomes[job_id] = step_result
+                    except Exception as e:
+                        self._finish_job(job_id, {"status": JobStatus.FAILED, **last_tick}, {"error": str(e)})
+                        outcomes[job_id] = e
+
+                # Job ancora in corso: progresso in un solo executemany
+                if ticks:
+                    self.db.execute(
+                        _JOB_PROGRESS_UPDATE,
+                        [
+                            {"_id": job_id, "_progress": t["progress"], "_message": t["message"]}
+                            for job_id, t in ticks.items()
+                        ]
+                    )
+                    self.db.commit()
+
+        # Merge in ordine di step: stesso risultato finale dell'esecuzione sequenziale
+        failed = None
+        for step_data, job_type, job_id in zip(group, job_types, job_ids):
+            step_num = step_data['step_number']
+            outcome = outcomes[job_id]
+
+            if isinstance(outcome, Exception):
+                logger.error(
+                    "❌ Step %s fallito: %s", step_num, outcome,
+                    extra={"pipeline_id": pipeline_id, "step": step_num, "job_type": job_type.value}
+                )
+                results[job_type.value] = {"success": False, "error": str(outcome)}
+                failed = failed or (step_num, outcome)
+                continue
+
+            results[job_type.value] = outcome
+            if outcome.get('output_files'):
+                current_files.update(outcome['output_files'])
+            checkpoint[str(step_num)] = outcome
+
+            logger.info(
+                "✅ Step %s completato: %s", step_num, job_type.value,
+                extra={"pipeline_id": pipeline_id, "step": step_num, "job_type": job_type.value}
+            )
+
+        self._save_checkpoint(pipeline_id, checkpoint, current_files)
+        self.db.commit()
+
+        if failed and stop_on_error:
+            step_num, error = failed
+            raise RuntimeError(f"Pipeline interrotta: step {step_num} fallito: {error}")
+
     def _execute_step(
         self,
         job_type: JobType,
@@ -238,36 +714,12 @@ class PipelineOrchestrator:
             RuntimeError: Se esecuzione fallisce
         """
 
-        if job_type == JobType.CHROMAKEY:
-            return self._execute_chromakey(parameters, input_files, progress_callback)
-
-        elif job_type == JobType.THUMBNAIL:
-            return self._execute_thumbnail(parameters, input_files, progress_callback)
-
-        elif job_type == JobType.TRANSLATION:
-            return self._execute_translation(parameters, input_files, progress_callback)
-
-        elif job_type == JobType.YOUTUBE_UPLOAD:
-            return self._execute_youtube_upload(parameters, input_files, progress_callback)
-
-        elif job_type == JobType.METADATA_EXTRACTION:
-            return self._execute_metadata(parameters, input_files, progress_callback)
-
-        elif job_type == JobType.TRANSCRIPTION:
-            return self._execute_transcription(parameters, input_files, progress_callback)
-
-        elif job_type == JobType.LOGO_OVERLAY:
-            return self._execute_logo_overlay(parameters, input_files, progress_callback)
-
-        # elif job_type == JobType.SCREEN_RECORD:
-        #     return self._execute_screen_record(parameters, input_files, progress_callback)
-
-        elif job_type == JobType.SEO_METADATA:
-            return self._execute_seo_metadata(parameters, input_files, progress_callback)
-
-        else:
+        handler = self._dispatch.get(job_type)
+        if handler is None:
             raise ValueError(f"Job type non supportato (o temporaneamente disabilitato): {job_type}")
 
+        return handler(parameters, input_files, progress_callback)
+
     def _execute_chromakey(
         self,
         params: Dict[str, Any],
@@ -279,25 +731,33 @@ class PipelineOrchestrator:
         # Resolve paths da input_files
         foreground_path = Path(input_files.get('foreground') or params['foreground_path'])
         background_path = Path(input_files.get('background') or params['background_path'])
-        output_path = Path(self.config.output_dir) / f"chromakey_{datetime.now().timestamp()}.mp4"
+        output_str = f"{self._output_prefix}chromakey_{time.time_ns()}.mp4"
+        output_path = Path(output_str)
+
+        p = {**_CHROMAKEY_DEFAULTS, **params}
+        logo = input_files.get('logo')
 
         # Crea parametri
         chromakey_params = ChromakeyParams(
             foreground_path=foreground_path,
             background_path=background_path,
             output_path=output_path,
-            start_time=params.get('start_time', 0.0),
-            duration=params.get('duration'),
-            lower_hsv=tuple(params.get('lower_hsv', [40, 40, 40])),
-            upper_hsv=tuple(params.get('upper_hsv', [80, 255, 255])),
-            audio_mode=params.get('audio_mode', 'synced'),
-            position=(params.get('x_pos', 0), params.get('y_pos', 0)),
-            scale=params.get('scale', 1.0),
-            opacity=params.get('opacity', 1.0),
-            fast_mode=params.get('fast_mode', True),
-            gpu_accel=params.get('gpu_accel', False),
-            logo_path=Path(input_files['logo']) if 'logo' in input_files else None,
-            logo_position=(params.get('logo_x', 0), params.get('logo_y', 0)) if 'logo' in input_files else None
+            start_time=p['start_time'],
+            duration=p['duration'],
+            lower_hsv=tuple(p['lower_hsv']),
+            upper_hsv=tuple(p['upper_hsv']),
+            audio_mode=p['audio_mode'],
+            position=(p['x_pos'], p['y_pos']),
+            scale=p['scale'],
+            opacity=p['opacity'],
+            fast_mode=p['fast_mode'],
+            gpu_accel=p['gpu_accel'],
+            fused_kernel=p['fused_kernel'],
+            ffmpeg_filtergraph=p['ffmpeg_filtergraph'],
+            mask_interp=p['mask_interp'],
+            green_approx=p['green_approx'],
+            logo_path=Path(logo) if logo is not None else None,
+            logo_position=(p['logo_x'], p['logo_y']) if logo is not None else None
         )
 
         # Esegui
@@ -305,8 +765,8 @@ class PipelineOrchestrator:
 
         # Aggiungi output_files per prossimo step
         result['output_files'] = {
-            'chromakey_output': str(output_path),
-            'video': str(output_path)  # Alias generico
+            'chromakey_output': output_str,
+            'video': output_str  # Alias generico
         }
 
         return result
@@ -319,37 +779,41 @@ class PipelineOrchestrator:
     ) -> Dict[str, Any]:
         """Esegue thumbnail generation"""
 
-        output_path = Path(self.config.output_dir) / f"thumbnail_{datetime.now().timestamp()}.jpg"
+        output_str = f"{self._output_prefix}thumbnail_{time.time_ns()}.jpg"
+        output_path = Path(output_str)
+
+        p = {**_THUMBNAIL_DEFAULTS, **params}
+        source_type = params['source_type']
 
         # Resolve video path se source_type = frame
         video_path = None
-        if params.get('source_type') == 'frame':
-            video_path = Path(input_files.get('video') or params.get('video_path'))
+        if source_type == 'frame':
+            video_path = Path(input_files.get('video') or p['video_path'])
 
         upload_image_path = None
-        if params.get('source_type') == 'upload':
-            upload_image_path = Path(params.get('upload_image_path'))
+        if source_type == 'upload':
+            upload_image_path = Path(p['upload_image_path'])
 
         thumbnail_params = ThumbnailParams(
             output_path=output_path,
-            source_type=params['source_type'],
-            ai_description=params.get('ai_description'),
-            ai_style=params.get('ai_style'),
+            source_type=source_type,
+            ai_description=p['ai_description'],
+            ai_style=p['ai_style'],
             upload_image_path=upload_image_path,
             video_path=video_path,
-            frame_timestamp=params.get('frame_timestamp', 0.0),
-            text=params.get('text'),
-            text_position=params.get('text_position', 'center'),
-            text_color=params.get('text_color', '#FFFFFF'),
-            text_bg_color=params.get('text_bg_color', '#000000'),
-            text_bg_opacity=params.get('text_bg_opacity', 0.7),
-            enhance_ctr=params.get('enhance_ctr', True)
+            frame_timestamp=p['frame_timestamp'],
+            text=p['text'],
+            text_position=p['text_position'],
+            text_color=p['text_color'],
+            text_bg_color=p['text_bg_color'],
+            text_bg_opacity=p['text_bg_opacity'],
+            enhance_ctr=p['enhance_ctr']
         )
 
         result = self.thumbnail_service.generate(thumbnail_params, progress_callback)
 
         result['output_files'] = {
-            'thumbnail': str(output_path)
+            'thumbnail': output_str
         }
 
         return result
@@ -364,7 +828,8 @@ class PipelineOrchestrator:
 
         # Resolve video path
         input_video_path = Path(input_files.get('video') or params['input_video_path'])
-        output_path = Path(self.config.output_dir) / f"translated_{params['target_language']}_{datetime.now().timestamp()}.mp4"
+        output_str = f"{self._output_prefix}translated_{params['target_language']}_{time.time_ns()}.mp4"
+        output_path = Path(output_str)
 
         translation_params = TranslationParams(
             input_video_path=input_video_path,
@@ -377,7 +842,7 @@ class PipelineOrchestrator:
         result = self.translation_service.translate(translation_params, progress_callback)
 
         result['output_files'] = {
-            f'video_{params["target_language"]}': str(output_path)
+            f'video_{params["target_language"]}': output_str
         }
 
         return result
@@ -410,27 +875,131 @@ class PipelineOrchestrator:
 
     def _create_job(
         self,
-        pipeline: Pipeline,
+        pipeline_id: UUID,
+        user_id: UUID,
+        pipeline_name: str,
         job_type: JobType,
         parameters: Dict[str, Any],
-        input_files: Dict[str, str]
-    ) -> Job:
-        """Crea job nel database"""
-        job = Job(
-            user_id=pipeline.user_id,
-            pipeline_id=pipeline.id,
-            job_type=job_type,
-            status=JobStatus.PROCESSING,
-            parameters=parameters,
-            input_files=input_files,
-            started_at=datetime.utcnow()
+        input_files: Dict[str, str],
+        step_number: Optional[int] = None
+    ) -> UUID:
+        """
+        Crea job nel database con INSERT Core (job + payload), senza identity map.
+
+        Returns:
+            UUID: ID del job creato
+        """
+        # id generato lato client (uuid7): nessun RETURNING né refresh dopo il commit
+        job_id = uuid7()
+        self.db.execute(
+            insert(Job.__table__).values(
+                id=job_id,
+                user_id=user_id,
+                pipeline_id=pipeline_id,
+                pipeline_name=pipeline_name,
+                pipeline_step_number=step_number,
+                job_type=job_type,
+                status=JobStatus.PROCESSING,
+                progress=0,
+                started_at=datetime.utcnow()
+            )
         )
+        self.db.execute(
+            insert(JobPayload.__table__).values(
+                job_id=job_id,
+                parameters=parameters,
+                input_files=input_files
+            )
+        )
+        self.db.commit()
+        self._last_progress_commit = (0, time.monotonic())
+        self._pending_progress = {}
+
+        return job_id
+
+    def _save_checkpoint(self, pipeline_id: UUID, checkpoint: Dict[str, Any], current_files: Dict[str, str]):
+        """Salva checkpoint e file correnti della pipeline (UPDATE Core, commit a carico del chiamante)"""
+        self.db.execute(
+            update(Pipeline.__table__)
+            .where(Pipeline.__table__.c.id == pipeline_id)
+            .values(checkpoint=checkpoint, output_files=current_files)
+        )
+
+    @staticmethod
+    def _load_checkpoint(
+        saved: Dict[str, Any],
+        enabled_steps: List[Dict[str, Any]],
+        current_files: Dict[str, str]
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Ricostruisce stato di esecuzione dal checkpoint salvato.
+
+        Gli step vengono ripresi in ordine fino al primo non completato o con
+        file output non più su disco: da lì in poi tutto viene rieseguito
+        (gli step successivi possono dipendere dai suoi output).
 
-        self.db.add(job)
+        Args:
+            saved: Checkpoint salvato {step_number: risultato step}
+            enabled_steps: Step abilitati in ordine di esecuzione
+            current_files: File input pipeline (aggiornato con gli output ripresi)
+
+        Returns:
+            tuple: (checkpoint valido, risultati accumulati)
+        """
+        checkpoint: Dict[str, Any] = {}
+        results: Dict[str, Any] = {}
+
+        for step_data in enabled_steps:
+            key = str(step_data['step_number'])
+            step_result = saved.get(key)
+            if step_result is None:
+                break
+
+            output_files = step_result.get('output_files') or {}
+            if not all(
+                Path(path).is_file() for path in output_files.values() if isinstance(path, str)
+            ):
+                logger.warning(f"⚠️  Output step {key} non più su disco: rieseguo da qui")
+                break
+
+            checkpoint[key] = step_result
+            results[step_data['job_type']] = step_result
+            current_files.update(output_files)
+
+        return checkpoint, results
+
+    def _update_pipeline(self, pipeline_id: UUID, **values: Any):
+        """Aggiorna stato pipeline con un solo UPDATE Core + commit"""
+        self.db.execute(
+            update(Pipeline.__table__)
+            .where(Pipeline.__table__.c.id == pipeline_id)
+            .values(**values)
+        )
         self.db.commit()
-        self.db.refresh(job)
 
-        return job
+    def _finish_job(self, job_id: UUID, job_values: Dict[str, Any], payload_values: Dict[str, Any]):
+        """
+        Chiude job (completato o fallito) con UPDATE Core su jobs e job_payloads.
+
+        L'eventuale progresso non ancora scritto viene incluso nello stesso UPDATE.
+
+        Args:
+            job_id: ID job
+            job_values: Colonne jobs (status, progress, ...)
+            payload_values: Colonne job_payloads (result, output_files, error)
+        """
+        values = {**self._pending_progress, **job_values, "completed_at": datetime.utcnow()}
+        self._pending_progress = {}
+
+        self.db.execute(
+            update(Job.__table__).where(Job.__table__.c.id == job_id).values(**values)
+        )
+        self.db.execute(
+            update(JobPayload.__table__)
+            .where(JobPayload.__table__.c.job_id == job_id)
+            .values(**payload_values)
+        )
+        self.db.commit()
 
     def _execute_metadata(
         self,
@@ -470,7 +1039,7 @@ class PipelineOrchestrator:
 
         # Resolve media path
         media_path = Path(input_files.get('video') or params['media_path'])
-        output_dir = Path(self.config.output_dir) / f"transcription_{datetime.now().timestamp()}"
+        output_dir = self._output_dir / f"transcription_{time.time_ns()}"
         output_dir.mkdir(parents=True, exist_ok=True)
 
         transcription_params = TranscriptionParams(
@@ -505,7 +1074,8 @@ class PipelineOrchestrator:
         # Resolve paths
         video_path = Path(input_files.get('video') or params['video_path'])
         logo_path = Path(input_files.get('logo') or params['logo_path'])
-        output_path = Path(self.config.output_dir) / f"logo_overlay_{datetime.now().timestamp()}.mp4"
+        output_str = f"{self._output_prefix}logo_overlay_{time.time_ns()}.mp4"
+        output_path = Path(output_str)
 
         logo_params = LogoOverlayParams(
             video_path=video_path,
@@ -525,8 +1095,8 @@ class PipelineOrchestrator:
         result = self.logo_overlay_service.overlay(logo_params, progress_callback)
 
         result['output_files'] = {
-            'video': str(output_path),
-            'logo_overlay_output': str(output_path)
+            'video': output_str,
+            'logo_overlay_output': output_str
         }
 
         return result
@@ -539,7 +1109,8 @@ class PipelineOrchestrator:
     ) -> Dict[str, Any]:
         """Esegue screen recording"""
 
-        output_path = Path(self.config.output_dir) / f"screen_record_{datetime.now().timestamp()}.mp4"
+        output_str = f"{self._output_prefix}screen_record_{time.time_ns()}.mp4"
+        output_path = Path(output_str)
 
         record_params = ScreenRecordParams(
             output_path=output_path,
@@ -558,8 +1129,8 @@ class PipelineOrchestrator:
         result = self.screen_record_service.record(record_params, progress_callback)
 
         result['output_files'] = {
-            'video': str(output_path),
-            'screen_recording': str(output_path)
+            'video': output_str,
+            'screen_recording': output_str
         }
 
         return result
@@ -574,7 +1145,7 @@ class PipelineOrchestrator:
 
         # Resolve video path
         video_path = Path(input_files.get('video') or params['video_path'])
-        output_dir = Path(self.config.output_dir) / f"seo_{datetime.now().timestamp()}"
+        output_dir = self._output_dir / f"seo_{time.time_ns()}"
         output_dir.mkdir(parents=True, exist_ok=True)
 
         seo_params = SEOMetadataParams(
@@ -604,17 +1175,30 @@ class PipelineOrchestrator:
 
     def _step_progress_callback(
         self,
-        job: Job,
+        job_id: UUID,
         progress: int,
         message: str,
-        global_callback: Optional[Callable]
+        global_callback: Optional[Callable] = None
     ) -> bool:
         """Callback progresso step - aggiorna job e chiama callback globale"""
 
-        # Aggiorna job
-        job.progress = progress
-        job.message = message
-        self.db.commit()
+        # Progresso in memoria; UPDATE + commit solo ogni PROGRESS_COMMIT_MIN_DELTA punti
+        # o PROGRESS_COMMIT_MIN_INTERVAL secondi: niente scrittura per ogni tick
+        self._pending_progress = {"progress": progress, "message": message}
+
+        last_progress, last_time = self._last_progress_commit
+        now = time.monotonic()
+        if (
+            progress - last_progress >= PROGRESS_COMMIT_MIN_DELTA
+            or now - last_time >= PROGRESS_COMMIT_MIN_INTERVAL
+        ):
+            self.db.execute(
+                _JOB_PROGRESS_UPDATE,
+                {"_id": job_id, "_progress": progress, "_message": message}
+            )
+            self.db.commit()
+            self._pending_progress = {}
+            self._last_progress_commit = (progress, now)
 
         # Chiama callback globale se presente
         if global_callback:
@@ -48,6 +48,10 @@ class ChromakeyParams:
     # Performance
     fast_mode: bool = False  # Default False per usare algoritmo avanzato
     gpu_accel: bool = False
+    fused_kernel: bool = False  # Kernel Numba fusi (richiede numba)
+    ffmpeg_filtergraph: bool = False  # Tutto in un filtergraph ffmpeg (CUDA/NVENC se disponibili)
+    mask_interp: str = "linear"  # nearest, linear: upsample maschera a metà risoluzione (fast_mode)
+    green_approx: bool = False  # Maschera verde algebrica senza HSV (richiede numba)
 
     # Logo overlay (opzionale)
     logo_path: Optional[Path] = None
@@ -153,6 +157,10 @@ class ChromakeyService:
                 opacity=params.opacity,
                 fast_mode=params.fast_mode,
                 gpu_accel=params.gpu_accel,
+                fused_kernel=params.fused_kernel,
+                ffmpeg_filtergraph=params.ffmpeg_filtergraph,
+                mask_interp=params.mask_interp,
+                green_approx=params.green_approx,
                 logo_path=str(params.logo_path) if params.logo_path else None,
                 logo_position=params.logo_position,
                 logo_scale=params.logo_scale,
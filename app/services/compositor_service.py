@@ -11,15 +11,53 @@ Supporta sovrapposizione illimitata di video, immagini e audio con:
 import logging
 import subprocess
 import os
+import shutil
 import signal
 import json
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import uuid
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
+# Voci massime nella cache ffprobe (svuotata quando piena)
+PROBE_CACHE_SIZE = 256
+
+# Frame rate oltre cui ffprobe ha letto male lo stream (es. r_frame_rate 90000/1)
+MAX_SANE_FPS = 1000
+FALLBACK_MAX_FPS = 120
+
+# Encoder H.264 hardware in ordine di preferenza. VAAPI escluso: vuole i frame
+# già in superficie GPU (hwupload nel filtergraph)
+HW_ENCODERS = ('h264_nvenc', 'h264_qsv')
+
+# Argomenti encoder video per il compositing (qualità ~ libx264 crf 23)
+VIDEO_CODEC_ARGS = {
+    'h264_nvenc': ['-c:v', 'h264_nvenc', '-preset', 'p4', '-cq', '23', '-b:v', '0'],
+    'h264_qsv': ['-c:v', 'h264_qsv', '-preset', 'veryfast', '-global_quality', '23'],
+    None: ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '23'],
+}
+
+# Righe finali di stderr FFmpeg conservate per il log d'errore
+STDERR_TAIL_LINES = 200
+# Intervallo minimo (secondi) tra due log di progresso
+PROGRESS_LOG_INTERVAL = 2.0
+
+
+def _parse_rate(rate: str) -> float:
+    """Frame rate ffprobe 'num/den' in float (0 se non valido)"""
+    num, _, den = rate.partition('/')
+    try:
+        return int(num) / int(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0
+
 class CompositorService:
     """Servizio per compositing multi-layer video"""
 
@@ -28,20 +66,91 @@ class CompositorService:
         self.output_dir.mkdir(exist_ok=True)
         # Traccia processi FFmpeg attivi per job_id
         self.active_jobs = {}  # {job_id: subprocess.Popen}
+        # Cache ffprobe: {(abspath, mtime_ns, size): info}
+        self._probe_cache: Dict[tuple, Dict[str, Any]] = {}
+        # Inventario FFmpeg (check_ffmpeg), rifatto solo se cambia il binario
+        self._ffmpeg_path: Optional[str] = None
+        self._ffmpeg_ok: Optional[bool] = None
+        self.ffmpeg_version: Optional[str] = None
+        # Encoder hardware rilevato (None = libx264)
+        self.hw_encoder: Optional[str] = None
 
     def check_ffmpeg(self) -> bool:
-        """Verifica disponibilità FFmpeg"""
+        """
+        Verifica disponibilità FFmpeg
+
+        Il binario viene cercato nel PATH (nessun processo); versione, encoder
+        e encoder hardware sono letti con una sola chiamata `ffmpeg -encoders`
+        la prima volta, o quando il binario trovato cambia.
+        """
+        ffmpeg_path = shutil.which('ffmpeg')
+        if ffmpeg_path is None:
+            logger.error("FFmpeg non disponibile: binario non trovato nel PATH")
+            return False
+
+        if ffmpeg_path == self._ffmpeg_path and self._ffmpeg_ok is not None:
+            return self._ffmpeg_ok
+
+        self._ffmpeg_path = ffmpeg_path
+        self._ffmpeg_ok = False
+        self.hw_encoder = None
         try:
             result = subprocess.run(
-                ['ffmpeg', '-version'],
+                [ffmpeg_path, '-encoders'],
                 capture_output=True,
                 text=True,
-                timeout=5
+                timeout=10
             )
-            return result.returncode == 0
         except Exception as e:
             logger.error(f"FFmpeg non disponibile: {e}")
             return False
+        if result.returncode != 0:
+            return False
+
+        # Banner su stderr: "ffmpeg version 7.0.2 Copyright ..."
+        banner = result.stderr.split()
+        self.ffmpeg_version = banner[2] if len(banner) > 2 else None
+        encoders = {line.split()[1] for line in result.stdout.splitlines() if len(line.split()) >= 2}
+
+        self.hw_encoder = self._detect_hw_encoder(encoders)
+        self._ffmpeg_ok = True
+        logger.info(f"✅ FFmpeg {self.ffmpeg_version}: {ffmpeg_path}")
+        return True
+
+    def _detect_hw_encoder(self, encoders: set) -> Optional[str]:
+        """
+        Primo encoder di HW_ENCODERS compilato in FFmpeg e utilizzabile
+
+        Un encoder elencato da -encoders non implica la GPU (build statiche):
+        ognuno viene provato con un encode di un frame.
+
+        Args:
+            encoders: Nomi encoder elencati da `ffmpeg -encoders`
+
+        Returns:
+            Nome encoder, None se nessuno (o COMPOSITOR_FORCE_SW)
+        """
+        if settings.compositor_force_sw:
+            logger.info("🖥️ Encode compositor software (COMPOSITOR_FORCE_SW)")
+            return None
+
+        try:
+            for encoder in HW_ENCODERS:
+                if encoder not in encoders:
+                    continue
+                test = subprocess.run(
+                    [self._ffmpeg_path, '-hide_banner', '-v', 'error',
+                     '-f', 'lavfi', '-i', 'color=s=256x256:d=0.1',
+                     '-frames:v', '1', '-c:v', encoder, '-f', 'null', '-'],
+                    capture_output=True, timeout=15
+                )
+                if test.returncode == 0:
+                    logger.info(f"🚀 Encode compositor hardware: {encoder}")
+                    return encoder
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"⚠️ Rilevamento encoder hardware fallito: {e}")
+
+        return None
 
     def cancel_job(self, job_id: str) -> bool:
         """
@@ -82,14 +191,37 @@ class CompositorService:
                 del self.active_jobs[job_id]
 
     def get_video_info(self, video_path: str) -> Dict[str, Any]:
-        """Ottieni informazioni video usando ffprobe"""
+        """
+        Ottieni informazioni video usando ffprobe
+
+        Ogni file viene analizzato una sola volta: il risultato resta in cache
+        finché path, mtime e dimensione non cambiano.
+        """
+        try:
+            st = os.stat(video_path)
+            key = (os.path.abspath(video_path), st.st_mtime_ns, st.st_size)
+        except OSError:
+            key = None
+
+        if key is not None and key in self._probe_cache:
+            return self._probe_cache[key]
+
+        info = self._probe_video(video_path)
+
+        if key is not None:
+            if len(self._probe_cache) >= PROBE_CACHE_SIZE:
+                self._probe_cache.clear()
+            self._probe_cache[key] = info
+        return info
+
+    def _probe_video(self, video_path: str) -> Dict[str, Any]:
+        """Esegue ffprobe: primo stream video (solo i campi usati) e presenza audio"""
         try:
             cmd = [
                 'ffprobe',
                 '-v', 'quiet',
                 '-print_format', 'json',
-                '-show_format',
-                '-show_streams',
+                '-show_entries', 'stream=codec_type,width,height,r_frame_rate,avg_frame_rate:format=duration',
                 video_path
             ]
 
@@ -117,6 +249,14 @@ class CompositorService:
             fps_parts = fps_str.split('/')
             fps = int(fps_parts[0]) / int(fps_parts[1]) if len(fps_parts) == 2 else 30
 
+            # Stream rotti: r_frame_rate da decine di migliaia di fps farebbe
+            # generare a fps/tpad centinaia di migliaia di frame
+            if fps > MAX_SANE_FPS:
+                avg_fps = _parse_rate(video_stream.get('avg_frame_rate', '0/0'))
+                sane_fps = min(avg_fps, FALLBACK_MAX_FPS) if avg_fps > 0 else FALLBACK_MAX_FPS
+                logger.warning(f"⚠️ FPS non plausibile ({fps:.0f}) per {video_path}: uso {sane_fps:.2f}")
+                fps = sane_fps
+
             # Durata
             duration = float(data['format'].get('duration', 0))
 
@@ -124,18 +264,156 @@ class CompositorService:
                 'width': width,
                 'height': height,
                 'fps': fps,
-                'duration': duration
+                'duration': duration,
+                'has_audio': any(s.get('codec_type') == 'audio' for s in data['streams'])
             }
 
         except Exception as e:
             logger.error(f"Errore get_video_info: {e}")
             raise
 
+    def _layer_geometry(
+        self,
+        main_w: int,
+        main_h: int,
+        layer: Dict[str, Any],
+        layer_info_map: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> Tuple[int, int, int, int]:
+        """
+        Dimensioni e posizione di un layer sul video principale
+
+        Returns:
+            (layer_w, layer_h, pos_x, pos_y) in pixel
+        """
+        # Calcola dimensioni finali del layer
+        scale_percent = layer['scale'] / 100.0
+        keep_aspect = layer.get('keepAspectRatio', True)  # Default: mantieni proporzioni
+
+        if keep_aspect:
+            # Ottieni info del layer per mantenere aspect ratio
+            layer_info = (layer_info_map or {}).get(layer['path'])
+            if layer_info is None:
+                layer_info = self.get_video_info(layer['path'])
+            layer_original_w = layer_info['width']
+            layer_original_h = layer_info['height']
+            aspect_ratio = layer_original_w / layer_original_h
+
+            # Scala in base all'orientamento
+            if aspect_ratio >= 1:
+                # Landscape o quadrato: scala su larghezza
+                layer_w = int(main_w * scale_percent)
+                layer_h = int(layer_w / aspect_ratio)
+            else:
+                # Portrait: scala su altezza
+                layer_h = int(main_h * scale_percent)
+                layer_w = int(layer_h * aspect_ratio)
+        else:
+            # Adatta al video principale (può deformare)
+            layer_w = int(main_w * scale_percent)
+            layer_h = int(main_h * scale_percent)
+
+        # Calcola posizione assoluta
+        # posX e posY sono offset dal centro
+        pos_x = int((main_w / 2) + layer['posX'] - (layer_w / 2))
+        pos_y = int((main_h / 2) + layer['posY'] - (layer_h / 2))
+
+        return layer_w, layer_h, pos_x, pos_y
+
+    def _visible_layers(
+        self,
+        main_info: Dict[str, Any],
+        visual_layers: List[Dict[str, Any]],
+        layer_info_map: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Scarta i layer completamente coperti da un layer successivo opaco
+
+        Copre solo un layer video a opacità piena, senza chromakey e visibile
+        per tutta la durata (niente startTime/endTime): overlay ne ripete
+        l'ultimo frame a fine stream, quindi il rettangolo resta coperto.
+
+        Returns:
+            Layer visivi da comporre, nell'ordine originale
+        """
+        main_w = main_info['width']
+        main_h = main_info['height']
+
+        visible = []
+        covers = []  # (x0, y0, x1, y1) dei layer opachi già visti (dall'alto)
+        for layer in reversed(visual_layers):
+            layer_w, layer_h, pos_x, pos_y = self._layer_geometry(main_w, main_h, layer, layer_info_map)
+            # Solo la parte dentro il frame conta
+            x0, y0 = max(pos_x, 0), max(pos_y, 0)
+            x1, y1 = min(pos_x + layer_w, main_w), min(pos_y + layer_h, main_h)
+
+            if any(cx0 <= x0 and cy0 <= y0 and x1 <= cx1 and y1 <= cy1
+                   for cx0, cy0, cx1, cy1 in covers):
+                logger.info(f"   🙈 Layer {layer.get('name', 'unknown')} coperto: non composto")
+                continue
+            visible.append(layer)
+
+            if (layer['type'] == 'video'
+                    and layer.get('opacity', 1.0) >= 1.0
+                    and not layer.get('chromakey', False)
+                    and layer.get('startTime', 0) <= 0
+                    and layer.get('endTime') is None):
+                # force_original_aspect_ratio=decrease può arrotondare 1px in meno
+                margin = 1 if layer.get('keepAspectRatio', True) else 0
+                covers.append((pos_x, pos_y, pos_x + layer_w - margin, pos_y + layer_h - margin))
+
+        visible.reverse()
+        return visible
+
+    def _build_inputs(
+        self,
+        main_video_path: str,
+        main_info: Dict[str, Any],
+        drawn_layers: List[Dict[str, Any]],
+        hidden_videos: List[Dict[str, Any]],
+        audio_layers: List[Dict[str, Any]],
+        duration: float
+    ) -> Tuple[List[str], Dict[int, int]]:
+        """
+        Argomenti -i FFmpeg e indice input di ogni layer, costruiti insieme
+
+        Ordine input: 0 video principale, poi layer composti, video coperti
+        (solo audio) e file audio. build_filter_complex e il mix audio leggono
+        gli indici da qui, mai ricalcolandoli.
+
+        Returns:
+            (argomenti input, {id(layer): indice input FFmpeg})
+        """
+        args = []
+        input_index = {}
+
+        # Input 0: video principale (con NVENC decodifica su GPU; i frame
+        # tornano in memoria di sistema per i filtri software)
+        if self.hw_encoder == 'h264_nvenc':
+            args.extend(['-hwaccel', 'cuda'])
+        args.extend(['-i', main_video_path])
+
+        for layer in drawn_layers + hidden_videos + audio_layers:
+            if layer['type'] == 'image':
+                # Per immagini: usa -loop 1 -framerate FPS -t DURATA
+                # Questo crea un video dalla singola immagine (MOLTO più veloce del filtro loop!)
+                fps = main_info.get('fps', 24)
+                args.extend([
+                    '-loop', '1',           # Loop dell'immagine
+                    '-framerate', str(fps), # FPS del video principale
+                    '-t', str(duration),    # Durata uguale al video principale
+                ])
+            input_index[id(layer)] = len(input_index) + 1
+            args.extend(['-i', layer['path']])
+
+        return args, input_index
+
     def build_filter_complex(
         self,
         main_video_info: Dict[str, Any],
         layers: List[Dict[str, Any]],
-        target_duration: Optional[float] = None
+        target_duration: Optional[float] = None,
+        layer_info_map: Optional[Dict[str, Dict[str, Any]]] = None,
+        input_index: Optional[Dict[int, int]] = None
     ) -> str:
         """
         Costruisce il filtro FFmpeg per overlay multipli
@@ -153,6 +431,10 @@ class CompositorService:
                 - threshold: soglia chromakey (0-255)
                 - tolerance: tolleranza chromakey (0-255)
                 - startTime: tempo inizio in secondi
+            target_duration: Durata finale (tpad del video principale se più lunga)
+            layer_info_map: Info già lette per path layer (evita un nuovo ffprobe)
+            input_index: Indice input FFmpeg per id(layer) (da _build_inputs);
+                default: layer nell'ordine degli input 1..N
 
         Returns:
             Filter complex string per FFmpeg
@@ -167,8 +449,11 @@ class CompositorService:
         # Se target_duration è maggiore della durata del video, applica tpad per estenderlo
         if target_duration and target_duration > main_video_info['duration']:
             pad_duration = target_duration - main_video_info['duration']
-            # tpad estende il video ripetendo l'ultimo frame
-            filter_parts.append(f'[0:v]tpad=stop_mode=clone:stop_duration={pad_duration}[base]')
+            # tpad estende il video ripetendo l'ultimo frame; fps prima di tpad
+            # limita i frame clonati a pad_duration * fps del video principale
+            filter_parts.append(
+                f"[0:v]fps={main_video_info['fps']},tpad=stop_mode=clone:stop_duration={pad_duration}[base]"
+            )
             current_base = '[base]'
             logger.info(f"   🎞️ Applicato tpad: video esteso di {pad_duration:.1f}s")
         else:
@@ -180,38 +465,13 @@ class CompositorService:
                 # Audio viene gestito separatamente
                 continue
 
-            input_idx = idx + 1  # Input 0 è il video principale
+            # Input 0 è il video principale
+            input_idx = input_index[id(layer)] if input_index is not None else idx + 1
             layer_label = f'[{input_idx}:v]'
 
-            # Calcola dimensioni finali del layer
-            scale_percent = layer['scale'] / 100.0
+            # Calcola dimensioni finali e posizione assoluta del layer
             keep_aspect = layer.get('keepAspectRatio', True)  # Default: mantieni proporzioni
-
-            if keep_aspect:
-                # Ottieni info del layer per mantenere aspect ratio
-                layer_info = self.get_video_info(layer['path'])
-                layer_original_w = layer_info['width']
-                layer_original_h = layer_info['height']
-                aspect_ratio = layer_original_w / layer_original_h
-
-                # Scala in base all'orientamento
-                if aspect_ratio >= 1:
-                    # Landscape o quadrato: scala su larghezza
-                    layer_w = int(main_w * scale_percent)
-                    layer_h = int(layer_w / aspect_ratio)
-                else:
-                    # Portrait: scala su altezza
-                    layer_h = int(main_h * scale_percent)
-                    layer_w = int(layer_h * aspect_ratio)
-            else:
-                # Adatta al video principale (può deformare)
-                layer_w = int(main_w * scale_percent)
-                layer_h = int(main_h * scale_percent)
-
-            # Calcola posizione assoluta
-            # posX e posY sono offset dal centro
-            pos_x = int((main_w / 2) + layer['posX'] - (layer_w / 2))
-            pos_y = int((main_h / 2) + layer['posY'] - (layer_h / 2))
+            layer_w, layer_h, pos_x, pos_y = self._layer_geometry(main_w, main_h, layer, layer_info_map)
 
             # Costruisci filtro per questo layer
             layer_filters = []
@@ -341,8 +601,10 @@ class CompositorService:
 
             # Calcola durata massima necessaria basata sui layer
             max_duration = main_info['duration']
+            layer_info_map = {}
             for layer in visual_layers:
                 layer_info = self.get_video_info(layer['path'])
+                layer_info_map[layer['path']] = layer_info
                 layer_start = layer.get('startTime', 0)
                 layer_end = layer.get('endTime', None)
 
@@ -361,6 +623,12 @@ class CompositorService:
             if max_duration > main_info['duration']:
                 logger.info(f"   🎞️ Video principale esteso da {main_info['duration']:.1f}s a {max_duration:.1f}s")
 
+            # Layer coperti da un layer opaco successivo: niente decode/scale/overlay.
+            # I video coperti restano come input solo per il loro audio
+            drawn_layers = self._visible_layers(main_info, visual_layers, layer_info_map)
+            drawn_ids = {id(l) for l in drawn_layers}
+            hidden_videos = [l for l in visual_layers if id(l) not in drawn_ids and l['type'] == 'video']
+
             # Output path
             if not output_filename:
                 timestamp = int(datetime.now().timestamp() * 1000)
@@ -371,39 +639,23 @@ class CompositorService:
             # Costruisci comando FFmpeg
             cmd = ['ffmpeg', '-y']  # -y sovrascrive
 
-            # Input 0: video principale
-            cmd.extend(['-i', main_video_path])
-
-            # Input 1-N: layer
-            for layer in visual_layers:
-                if layer['type'] == 'image':
-                    # Per immagini: usa -loop 1 -framerate FPS -t DURATA
-                    # Questo crea un video dalla singola immagine (MOLTO più veloce del filtro loop!)
-                    fps = main_info.get('fps', 24)
-                    duration = max_duration  # Usa la durata massima calcolata
-                    cmd.extend([
-                        '-loop', '1',           # Loop dell'immagine
-                        '-framerate', str(fps), # FPS del video principale
-                        '-t', str(duration),    # Durata uguale al video principale
-                        '-i', layer['path']
-                    ])
-                else:
-                    # Video normali
-                    cmd.extend(['-i', layer['path']])
-
-            # Audio layers
-            for layer in audio_layers:
-                cmd.extend(['-i', layer['path']])
+            # Input 0: video principale, poi layer (indici usati da filtri video e audio)
+            input_args, input_index = self._build_inputs(
+                main_video_path, main_info, drawn_layers, hidden_videos, audio_layers, max_duration
+            )
+            cmd.extend(input_args)
 
             # Build unified filter_complex for video + audio
             filter_parts = []
 
             # Video filters
-            if visual_layers:
-                video_filter = self.build_filter_complex(main_info, visual_layers, max_duration)
+            if drawn_layers:
+                video_filter = self.build_filter_complex(
+                    main_info, drawn_layers, max_duration, layer_info_map, input_index
+                )
                 if video_filter:
                     filter_parts.append(video_filter)
-                    final_video_output = f'[out{len(visual_layers)-1}]'
+                    final_video_output = f'[out{len(drawn_layers)-1}]'
                 else:
                     final_video_output = '[0:v]'
             else:
@@ -412,23 +664,25 @@ class CompositorService:
             # Audio mixing: main video audio + layer video audios + separate audio files
             audio_inputs = []
 
-            # Audio dai layer video (se presenti) con delay se startTime > 0
-            for i, layer in enumerate(visual_layers):
-                if layer['type'] == 'video':
+            # Audio dai layer video (se presenti) con delay se startTime > 0.
+            # Un [N:a] su un input senza audio farebbe fallire il filtergraph
+            for layer in visual_layers:
+                if layer['type'] == 'video' and layer_info_map[layer['path']].get('has_audio', True):
+                    layer_index = input_index[id(layer)]
                     start_time = layer.get('startTime', 0)
                     if start_time > 0:
                         # Applica delay all'audio (in millisecondi)
                         delay_ms = int(start_time * 1000)
-                        delayed_label = f'[a{i+1}d]'
-                        filter_parts.append(f'[{i+1}:a]adelay={delay_ms}|{delay_ms}{delayed_label}')
+                        delayed_label = f'[a{layer_index}d]'
+                        filter_parts.append(f'[{layer_index}:a]adelay={delay_ms}|{delay_ms}{delayed_label}')
                         audio_inputs.append(delayed_label)
                         logger.info(f"   🔊 Audio layer ritardato di {start_time} secondi")
                     else:
-                        audio_inputs.append(f'[{i+1}:a]')
+                        audio_inputs.append(f'[{layer_index}:a]')
 
             # Audio dai file audio separati
-            for i, layer in enumerate(audio_layers):
-                layer_index = len(visual_layers) + i + 1
+            for layer in audio_layers:
+                layer_index = input_index[id(layer)]
                 start_time = layer.get('startTime', 0)
                 if start_time > 0:
                     delay_ms = int(start_time * 1000)
@@ -441,9 +695,11 @@ class CompositorService:
             # Aggiungi audio dal video principale SOLO se ci sono altri audio da mixare
             if len(audio_inputs) > 0:
                 # Se ci sono layer audio/video, aggiungi anche l'audio del video principale e mixa
-                audio_inputs.insert(0, '[0:a]')  # Metti il main audio per primo
-                # Mix multipli stream audio
-                audio_filter = f'{"".join(audio_inputs)}amix=inputs={len(audio_inputs)}:duration=longest[aout]'
+                if main_info.get('has_audio', True):
+                    audio_inputs.insert(0, '[0:a]')  # Metti il main audio per primo
+                # Mix multipli stream audio; normalize=0: ogni traccia a volume pieno
+                # (il default divide il volume per il numero di input)
+                audio_filter = f'{"".join(audio_inputs)}amix=inputs={len(audio_inputs)}:duration=longest:normalize=0[aout]'
                 filter_parts.append(audio_filter)
                 final_audio_output = '[aout]'
             else:
@@ -470,13 +726,15 @@ class CompositorService:
                 cmd.extend(['-map', '0:a?'])  # Audio opzionale
 
             # Codec e qualità
+            cmd.extend(VIDEO_CODEC_ARGS[self.hw_encoder])
             cmd.extend([
-                '-c:v', 'libx264',
-                '-preset', 'ultrafast',
-                '-crf', '23',
                 '-c:a', 'aac',
                 '-b:a', '192k',
                 '-movflags', '+faststart',
+                # Progresso key=value su stdout; stderr solo per gli errori
+                '-progress', 'pipe:1',
+                '-nostats',
+                '-loglevel', 'error',
                 str(output_path)
             ])
 
@@ -487,7 +745,8 @@ class CompositorService:
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                universal_newlines=True
+                universal_newlines=True,
+                bufsize=1
             )
 
             # Salva processo per permettere cancellazione
@@ -495,43 +754,53 @@ class CompositorService:
                 self.active_jobs[job_id] = process
                 logger.info(f"   📝 Processo FFmpeg registrato per job {job_id} (PID: {process.pid})")
 
+            # stderr (solo errori con -loglevel error) drenato in un thread nelle
+            # ultime righe: la pipe non si riempie mentre leggiamo il progresso
+            stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+            stderr_reader = threading.Thread(
+                target=stderr_tail.extend, args=(process.stderr,), daemon=True
+            )
+            stderr_reader.start()
+
             try:
-                # Leggi output e parsa progresso
-                stderr_output = []
+                # Leggi il progresso: blocchi di righe key=value chiusi da progress=continue|end
+                progress = {}
                 total_duration = max_duration  # Durata totale video
-
-                for line in process.stderr:
-                    stderr_output.append(line)
-
-                    # Parsa progress da FFmpeg (cerca "time=HH:MM:SS.MS")
-                    if 'time=' in line and job_object:
-                        try:
-                            # Estrai time da linea tipo: "frame= 123 fps=45 q=28.0 size= 1024kB time=00:00:05.12 bitrate=1234.5kbits/s speed=2.3x"
-                            import re
-                            match = re.search(r'time=(\d{2}):(\d{2}):(\d{2}\.\d{2})', line)
-                            if match:
-                                hours, minutes, seconds = match.groups()
-                                current_time = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
-
-                                # Calcola percentuale (30-90% del range)
-                                if total_duration > 0:
-                                    percent = min(90, 30 + int((current_time / total_duration) * 60))
-                                    job_object.progress = percent
-                                    job_object.message = f'Elaborazione video... ({int(current_time)}s / {int(total_duration)}s)'
-
-                                    # Log ogni 10%
-                                    if percent % 10 == 0:
-                                        logger.info(f"   📊 Progresso: {percent}% ({int(current_time)}s / {int(total_duration)}s)")
-                        except Exception as e:
-                            # Ignora errori parsing (non bloccare elaborazione)
-                            pass
-
-                    # Log generale ogni 100 righe
-                    if len(stderr_output) % 100 == 0:
-                        logger.info(f"   FFmpeg processing... ({len(stderr_output)} lines)")
+                last_log = time.monotonic()
+
+                for line in process.stdout:
+                    key, _, value = line.strip().partition('=')
+                    progress[key] = value
+                    if key != 'progress':
+                        continue
+
+                    try:
+                        # out_time_ms è in microsecondi come out_time_us (nome storico FFmpeg)
+                        current_time = int(progress.get('out_time_us') or progress.get('out_time_ms', 0)) / 1_000_000
+                    except ValueError:
+                        current_time = 0  # N/A prima del primo frame
+
+                    # Calcola percentuale (30-90% del range)
+                    if job_object and total_duration > 0:
+                        percent = min(90, 30 + int((current_time / total_duration) * 60))
+                        job_object.progress = percent
+                        job_object.message = f'Elaborazione video... ({int(current_time)}s / {int(total_duration)}s)'
+
+                    # Log al massimo ogni PROGRESS_LOG_INTERVAL secondi
+                    now = time.monotonic()
+                    if now - last_log >= PROGRESS_LOG_INTERVAL:
+                        last_log = now
+                        logger.info(
+                            f"   📊 Progresso FFmpeg: {int(current_time)}s / {int(total_duration)}s "
+                            f"(frame {progress.get('frame', '?')}, speed {progress.get('speed', '?')})"
+                        )
+
+                    if value == 'end':
+                        break
 
                 # Attendi completamento
                 returncode = process.wait()
+                stderr_reader.join(timeout=5)
             finally:
                 # Rimuovi processo dalla lista attivi
                 if job_id and job_id in self.active_jobs:
@@ -539,12 +808,11 @@ class CompositorService:
                     logger.info(f"   📝 Processo FFmpeg rimosso per job {job_id}")
 
             if returncode != 0:
-                # Log TUTTO lo stderr per debug
-                full_stderr = ''.join(stderr_output)
-                logger.error(f"❌ FFmpeg fallito - OUTPUT COMPLETO:")
-                logger.error(full_stderr)
+                # Log delle ultime righe di stderr per debug
+                logger.error(f"❌ FFmpeg fallito - ultime {len(stderr_tail)} righe di output:")
+                logger.error(''.join(stderr_tail))
                 # Prendi solo le ultime 50 righe per l'eccezione
-                error_msg = ''.join(stderr_output[-50:])
+                error_msg = ''.join(list(stderr_tail)[-50:])
                 raise Exception(f"FFmpeg error: {error_msg}")
 
             # Verifica output
@@ -16,6 +16,7 @@ from __future__ import annotations  # Lazy type hint evaluation per supportare w
 import subprocess
 import tempfile
 import logging
+import threading
 from pathlib import Path
 
 # Import opzionale di Whisper (per permettere avvio server senza Whisper installato)
@@ -68,6 +69,9 @@ class TranscriptionService:
         self.config = config or settings
         self.ffmpeg_path = self.config.ffmpeg_path
         self.model_cache = {}  # Cache modelli caricati
+        # Il service è condiviso tra pipeline concorrenti: caricamento e transcribe
+        # serializzati (decode concorrenti sullo stesso modello si corrompono la kv-cache)
+        self._model_lock = threading.Lock()
 
     def transcribe(
         self,
@@ -106,20 +110,21 @@ class TranscriptionService:
             if progress_callback:
                 progress_callback(20, f"Caricamento modello Whisper ({params.model_size})...")
 
-            # Carica modello Whisper
-            model = self._load_model(params.model_size)
+            with self._model_lock:
+                # Carica modello Whisper
+                model = self._load_model(params.model_size)
 
-            if progress_callback:
-                progress_callback(40, "Trascrizione in corso...")
+                if progress_callback:
+                    progress_callback(40, "Trascrizione in corso...")
 
-            # Trascrivi
-            result = model.transcribe(
-                str(audio_path),
-                language=params.language,
-                task=params.task,
-                word_timestamps=params.word_timestamps,
-                verbose=False
-            )
+                # Trascrivi
+                result = model.transcribe(
+                    str(audio_path),
+                    language=params.language,
+                    task=params.task,
+                    word_timestamps=params.word_timestamps,
+                    verbose=False
+                )
 
             if progress_callback:
                 progress_callback(80, "Elaborazione risultati...")
@@ -174,7 +179,7 @@ class TranscriptionService:
 
     def _load_model(self, model_size: str) -> whisper.Whisper:
         """
-        Carica modello Whisper (con cache)
+        Carica modello Whisper (con cache). Da chiamare con _model_lock acquisito
 
         Args:
             model_size: Dimensione modello
@@ -18,6 +18,7 @@ from pathlib import Path
 from typing import Optional, Callable, Dict, Any
 from dataclasses import dataclass
 import shutil
+import threading
 
 from app.core.config import settings
 
@@ -74,7 +75,10 @@ class TranslationService:
 
         # Lazy import di librerie pesanti
         self._whisper_model = None
-        self._translator = None
+        # Un translator per lingua target: il service può servire step paralleli
+        self._translators: Dict[str, Any] = {}
+        # Protegge caricamento e uso (transcribe) del modello Whisper
+        self._model_lock = threading.Lock()
 
         self._verify_dependencies()
 
@@ -286,17 +290,21 @@ class TranslationService:
         """Trascrivi audio con Whisper"""
         import whisper
 
-        # Lazy load model
+        # Lazy load model (una sola volta anche con step paralleli)
         if self._whisper_model is None:
-            logger.info("Caricamento modello Whisper (base)...")
-            self._whisper_model = whisper.load_model("base")
-
-        # Transcribe
-        result = self._whisper_model.transcribe(
-            audio_path,
-            language=None if language == "auto" else language,
-            fp16=False  # CPU compatibility
-        )
+            with self._model_lock:
+                if self._whisper_model is None:
+                    logger.info("Caricamento modello Whisper (base)...")
+                    self._whisper_model = whisper.load_model("base")
+
+        # Transcribe: un decode alla volta sul modello condiviso (ogni decode aggancia
+        # hook kv-cache ai moduli del decoder). Traduzione, TTS e ffmpeg restano paralleli
+        with self._model_lock:
+            result = self._whisper_model.transcribe(
+                audio_path,
+                language=None if language == "auto" else language,
+                fp16=False  # CPU compatibility
+            )
 
         return result
 
@@ -304,19 +312,19 @@ class TranslationService:
         """Traduci testo con Google Translate"""
         from deep_translator import GoogleTranslator
 
-        if self._translator is None:
-            self._translator = GoogleTranslator(source='auto', target=target_language)
-        else:
-            self._translator.target = target_language
+        translator = self._translators.get(target_language)
+        if translator is None:
+            translator = GoogleTranslator(source='auto', target=target_language)
+            self._translators[target_language] = translator
 
         # Split testo lungo in chunks (Google Translate ha limiti)
         max_length = 5000
         if len(text) <= max_length:
-            return self._translator.translate(text)
+            return translator.translate(text)
 
         # Traduci in chunks
         chunks = [text[i:i+max_length] for i in range(0, len(text), max_length)]
-        translated_chunks = [self._translator.translate(chunk) for chunk in chunks]
+        translated_chunks = [translator.translate(chunk) for chunk in chunks]
 
         return ' '.join(translated_chunks)
 
@@ -1,249 +1,1345 @@
 import cv2
 import numpy as np
 import argparse
+import colorsys
+import json
 import os
+import queue
 import subprocess
 import tempfile
+import threading
+from fractions import Fraction
+from functools import lru_cache
+
+# Frame in volo per stadio nella pipeline CPU (reader -> chromakey -> writer)
+PREFETCH_FRAMES = 8
+# Frame per passaggio tra gli stadi: una put/get (e un risveglio di thread) ogni N frame
+PIPELINE_BATCH = 4
+
+# Da questa dimensione kernel il blur della maschera usa 3 box filter (costo O(1)
+# per pixel) invece della gaussiana separabile (O(k)); sotto la gaussiana è più veloce
+BOX_BLUR_MIN_KERNEL = 15
+
+# Interpolazione per riportare a piena risoluzione la maschera fast_mode (già sfumata)
+MASK_INTERPOLATIONS = {
+    'nearest': cv2.INTER_NEAREST,
+    'linear': cv2.INTER_LINEAR,
+}
+
+# Numba (opzionale): kernel chromakey fuso per la modalità veloce
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# PyAV (opzionale): decode multi-thread / NVDEC al posto di cv2.VideoCapture
+try:
+    import av
+    AV_AVAILABLE = True
+except ImportError:
+    AV_AVAILABLE = False
+
+
+# Tabelle divisione di cvtColor BGR2HSV 8 bit (fixed point << 12): stesso HSV di OpenCV
+_HSV_SHIFT = 12
+_SDIV_TABLE = np.array([0] + [round((255 << _HSV_SHIFT) / i) for i in range(1, 256)], dtype=np.int32)
+_HDIV_TABLE = np.array([0] + [round((180 << _HSV_SHIFT) / (6 * i)) for i in range(1, 256)], dtype=np.int32)
+
+
+if NUMBA_AVAILABLE:
+    @numba.njit(inline='always', cache=True)
+    def _is_green(b, g, r, lo, hi):
+        """BGR -> HSV (aritmetica intera di cvtColor 8 bit) + test di range, in registro"""
+        v = max(max(r, g), b)
+        diff = v - min(min(r, g), b)
+        s = (diff * _SDIV_TABLE[v] + (1 << (_HSV_SHIFT - 1))) >> _HSV_SHIFT
+        num = r - g + 4 * diff
+        if v == r:
+            num = g - b
+        elif v == g:
+            num = b - r + 2 * diff
+        hue = (num * _HDIV_TABLE[diff] + (1 << (_HSV_SHIFT - 1))) >> _HSV_SHIFT
+        if hue < 0:
+            hue += 180
+        return (lo[0] <= hue <= hi[0]) & (lo[1] <= s <= hi[1]) & (lo[2] <= v <= hi[2])
+
+    @numba.njit(parallel=True, fastmath=True, boundscheck=False, cache=True)
+    def green_mask(frame_bgr, lo, hi, out_mask):
+        """
+        cvtColor(BGR2HSV) + inRange in un solo passaggio: 255 dove il pixel è verde.
+
+        Niente buffer HSV intermedio a 3 canali: ogni pixel BGR viene letto una
+        volta e la maschera scritta direttamente (stesso risultato di OpenCV).
+        """
+        for y in numba.prange(frame_bgr.shape[0]):
+            for x in range(frame_bgr.shape[1]):
+                green = _is_green(np.int32(frame_bgr[y, x, 0]), np.int32(frame_bgr[y, x, 1]),
+                                  np.int32(frame_bgr[y, x, 2]), lo, hi)
+                out_mask[y, x] = 255 if green else 0
+
+    @numba.njit(parallel=True, fastmath=True, boundscheck=False, cache=True)
+    def fast_green_mask(frame_bgr, lo, hi, out_mask):
+        """
+        Maschera verde con soli confronti interi su BGR, senza sintetizzare l'HSV.
+
+        Valida per un range "a cuneo verde" (vedi _is_green_wedge): il verde è il
+        canale massimo, quindi V = G, S >= smin <=> 255 * (G - min) >= smin * G e la
+        tinta 60 + 30 * (B - R) / (G - min) si confronta moltiplicando invece di
+        dividere. Differisce da cvtColor + inRange solo per l'arrotondamento
+        delle tabelle di OpenCV sui pixel al bordo del range.
+        """
+        for y in numba.prange(frame_bgr.shape[0]):
+            for x in range(frame_bgr.shape[1]):
+                b = np.int32(frame_bgr[y, x, 0])
+                g = np.int32(frame_bgr[y, x, 1])
+                r = np.int32(frame_bgr[y, x, 2])
+                diff = g - min(r, b)
+                tint = 30 * (b - r)
+                green = ((g > r) & (g >= b) & (g >= lo[2])
+                         & (255 * diff >= lo[1] * g)
+                         & (tint >= (lo[0] - 60) * diff) & (tint <= (hi[0] - 60) * diff))
+                out_mask[y, x] = 255 if green else 0
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def fuse_chromakey(frame_bgr, lo, hi, weights, opacity_lut, out_bgr_scaled, out_mask_scaled, tmp_a, tmp_b):
+        """
+        resize + BGR->HSV + inRange + bitwise_not + GaussianBlur + opacità in un kernel.
+
+        Ogni pixel sorgente viene letto una volta: il campionamento bilineare
+        (come cv2.INTER_LINEAR), l'HSV (aritmetica intera di cvtColor 8 bit) e
+        il test di range avvengono in registro; il blur separabile lavora su
+        due buffer float32 preallocati (tmp_a, tmp_b) della dimensione di output.
+        Senza resize (stessa dimensione) il frame non viene copiato: passare
+        frame_bgr anche come out_bgr_scaled.
+
+        Args:
+            frame_bgr: Frame sorgente uint8 (H, W, 3)
+            lo, hi: Range HSV del verde (int32, 3 valori)
+            weights: Kernel gaussiano 1D float32 (cv2.getGaussianKernel)
+            opacity_lut: Tabella opacità uint8 (256 valori, vedi _opacity_lut)
+            out_bgr_scaled: Output frame scalato uint8 (h, w, 3)
+            out_mask_scaled: Output maschera soggetto uint8 (h, w)
+            tmp_a, tmp_b: Buffer float32 (h, w)
+        """
+        src_h, src_w = frame_bgr.shape[0], frame_bgr.shape[1]
+        h, w = out_mask_scaled.shape[0], out_mask_scaled.shape[1]
+        resample = h != src_h or w != src_w
+        radius = weights.shape[0] // 2
+
+        # Coordinate bilineari per colonna/riga, calcolate una volta per chiamata
+        sx = src_w / w
+        xs0 = np.empty(w, np.int64)
+        xs1 = np.empty(w, np.int64)
+        wxs = np.empty(w, np.float32)
+        for x in range(w):
+            fx = (x + 0.5) * sx - 0.5
+            x0 = min(max(int(np.floor(fx)), 0), src_w - 1)
+            xs0[x] = x0
+            xs1[x] = min(x0 + 1, src_w - 1)
+            wxs[x] = min(max(fx - x0, 0.0), 1.0) if x0 + 1 < src_w else 0.0
+
+        # Passo 1: campionamento + HSV + maschera invertita (255 = soggetto)
+        for y in numba.prange(h):
+            fy = (y + 0.5) * (src_h / h) - 0.5
+            y0 = min(max(int(np.floor(fy)), 0), src_h - 1)
+            y1 = min(y0 + 1, src_h - 1)
+            wy = min(max(fy - y0, 0.0), 1.0) if y0 + 1 < src_h else 0.0
+
+            for x in range(w):
+                if resample:
+                    x0, x1, wx = xs0[x], xs1[x], wxs[x]
+                    for c in range(3):
+                        top = frame_bgr[y0, x0, c] * (1.0 - wx) + frame_bgr[y0, x1, c] * wx
+                        bottom = frame_bgr[y1, x0, c] * (1.0 - wx) + frame_bgr[y1, x1, c] * wx
+                        out_bgr_scaled[y, x, c] = np.uint8(top * (1.0 - wy) + bottom * wy + 0.5)
+
+                green = _is_green(np.int32(out_bgr_scaled[y, x, 0]), np.int32(out_bgr_scaled[y, x, 1]),
+                                  np.int32(out_bgr_scaled[y, x, 2]), lo, hi)
+                tmp_a[y, x] = 0.0 if green else 255.0
+
+        # Passo 2: blur orizzontale (bordo BORDER_REFLECT_101 come cv2)
+        for y in numba.prange(h):
+            for x in range(w):
+                acc = 0.0
+                for k in range(-radius, radius + 1):
+                    xx = x + k
+                    if xx < 0:
+                        xx = -xx
+                    elif xx >= w:
+                        xx = 2 * w - 2 - xx
+                    acc += tmp_a[y, xx] * weights[k + radius]
+                tmp_b[y, x] = acc
+
+        # Passo 3: blur verticale + opacità -> maschera uint8
+        for y in numba.prange(h):
+            for x in range(w):
+                acc = 0.0
+                for k in range(-radius, radius + 1):
+                    yy = y + k
+                    if yy < 0:
+                        yy = -yy
+                    elif yy >= h:
+                        yy = 2 * h - 2 - yy
+                    acc += tmp_b[yy, x] * weights[k + radius]
+                out_mask_scaled[y, x] = opacity_lut[np.uint8(min(acc + 0.5, 255.0))]
+
+    @numba.njit(parallel=True, fastmath=True, boundscheck=False, cache=True)
+    def _blend_plane_numba(fg, roi, alpha):
+        """
+        roi = (fg * a + roi * (255 - a)) / 255 in place su un piano colore.
+
+        Un canale per chiamata: accessi a passo 1 su fg/roi/alpha che LLVM
+        vettorizza (con BGR interlacciato il loop sui 3 canali non vettorizza).
+        """
+        for y in numba.prange(roi.shape[0]):
+            for x in range(roi.shape[1]):
+                a = np.uint16(alpha[y, x])
+                roi[y, x] = np.uint8((fg[y, x] * a + roi[y, x] * (np.uint16(255) - a)) // 255)
+
+
+def _is_green_wedge(lower_green, upper_green):
+    """
+    True se il range HSV è tutto nel settore in cui G è il canale massimo
+    (tinta 30-90 su 180) senza limiti superiori di S e V: lì fast_green_mask
+    equivale al test HSV
+    """
+    return (30 <= int(lower_green[0]) and int(upper_green[0]) <= 90
+            and int(upper_green[1]) >= 255 and int(upper_green[2]) >= 255)
 
 
-def remove_background_and_overlay_timed(foreground_video, background_video, output_video,
-                                        start_time=0, duration=None,
-                                        lower_green=None, upper_green=None, blur_kernel=5,
-                                        audio_source='background', position=(0, 0), scale=1.0, opacity=1.0,
-                                        fast_mode=False, gpu_accel=False,
-                                        logo_path=None, logo_position=None, logo_scale=0.1, progress_callback=None):
+def _load_logo(logo_path, logo_scale):
     """
-    Rimuove lo sfondo verde e sovrappone la call to action in un momento specifico
+    Carica il logo (BGRA) e lo scala una volta per video
+
+    Returns:
+        np.ndarray | None: Logo BGRA scalato, None se assente/illeggibile
     """
-    print(f"🎬 Avvio elaborazione...")
-    print(f"   Foreground: {foreground_video}")
-    print(f"   Background: {background_video}")
-    print(f"   Output: {output_video}")
-    print(f"   Modalità veloce: {fast_mode}")
-    print(f"   GPU: {gpu_accel}")
+    if not os.path.exists(logo_path):
+        return None
 
-    if lower_green is None:
-        lower_green = np.array([40, 40, 40])
-    if upper_green is None:
-        upper_green = np.array([80, 255, 255])
+    print(f"📷 Caricando logo: {logo_path}")
+    logo_img = cv2.imread(logo_path, cv2.IMREAD_UNCHANGED)
+    if logo_img is None:
+        return None
+
+    # Scala il logo
+    if logo_img.ndim == 2 or logo_img.shape[2] != 4:  # RGB, aggiungi canale alpha
+        logo_img = cv2.cvtColor(logo_img, cv2.COLOR_GRAY2BGRA if logo_img.ndim == 2 else cv2.COLOR_BGR2BGRA)
+    logo_height, logo_width = logo_img.shape[:2]
+
+    new_logo_width = int(logo_width * logo_scale)
+    new_logo_height = int(logo_height * logo_scale)
+    logo_img = cv2.resize(logo_img, (new_logo_width, new_logo_height))
+    print(f"✅ Logo caricato: {new_logo_width}x{new_logo_height}")
+    return logo_img
 
+
+class PyAVCapture:
+    """
+    Reader con l'interfaccia di cv2.VideoCapture (isOpened/read/get/release)
+    basato su PyAV.
+
+    Il decoder usa i thread di ffmpeg (frame + slice threading) invece del
+    decode single-thread di VideoCapture; con hwaccel decodifica su NVDEC
+    (ripiego software automatico se il codec non è supportato) e scarica il
+    frame in memoria host solo per la conversione in BGR.
+    """
+
+    def __init__(self, video_path, hwaccel=False):
+        options = {}
+        if hwaccel and 'cuda' in av.codec.hwaccel.hwdevices_available():
+            options['hwaccel'] = av.codec.hwaccel.HWAccel('cuda', allow_software_fallback=True)
+        self.container = av.open(video_path, **options)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'
+        self._frames = self.container.decode(self.stream)
+
+    def isOpened(self):
+        return self.container is not None
+
+    def get(self, prop):
+        stream = self.stream
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return stream.codec_context.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return stream.codec_context.height
+        fps = float(stream.average_rate or stream.guessed_rate or 0)
+        if prop == cv2.CAP_PROP_FPS:
+            return fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            if stream.frames:
+                return stream.frames
+            # Container senza numero di frame nell'header: stima dalla durata
+            if stream.duration is not None and stream.time_base is not None:
+                return int(float(stream.duration * stream.time_base) * fps)
+            return 0
+        return 0
+
+    def read(self):
+        try:
+            frame = next(self._frames)
+        except (StopIteration, av.error.FFmpegError):
+            return False, None
+        # Array nuovo per frame: il chiamante ci compone sopra in place
+        return True, frame.to_ndarray(format='bgr24')
+
+    def release(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
+def _open_capture(video_path, hwaccel=False):
+    """Reader video: PyAVCapture se PyAV è installato, altrimenti cv2.VideoCapture"""
+    if AV_AVAILABLE:
+        # Device CUDA non inizializzabile (nessuna GPU): riprova con decode software
+        for use_hwaccel in ([True, False] if hwaccel else [False]):
+            try:
+                return PyAVCapture(video_path, use_hwaccel)
+            except (av.error.FFmpegError, IndexError) as e:
+                error = e
+        print(f"⚠️ PyAV non riesce ad aprire {video_path} ({error}): uso cv2.VideoCapture")
+    return cv2.VideoCapture(video_path)
+
+
+def cuda_available():
+    """True se OpenCV è compilato con CUDA e c'è almeno un device"""
     try:
-        # Apri i video
-        fg_cap = cv2.VideoCapture(foreground_video)
-        bg_cap = cv2.VideoCapture(background_video)
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
 
-        if not fg_cap.isOpened():
-            print(f"❌ Errore: impossibile aprire il video foreground {foreground_video}")
-            return False
 
-        if not bg_cap.isOpened():
-            print(f"❌ Errore: impossibile aprire il video background {background_video}")
+def opencl_available():
+    """True se OpenCV ha un device OpenCL utilizzabile (T-API con cv2.UMat)"""
+    try:
+        if not cv2.ocl.haveOpenCL():
             return False
+        cv2.ocl.setUseOpenCL(True)
+        return cv2.ocl.useOpenCL()
+    except (AttributeError, cv2.error):
+        return False
 
-        # Proprietà video
-        bg_fps = int(bg_cap.get(cv2.CAP_PROP_FPS))
-        bg_width = int(bg_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        bg_height = int(bg_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        bg_frames = int(bg_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        bg_duration = bg_frames / bg_fps
 
-        fg_fps = int(fg_cap.get(cv2.CAP_PROP_FPS))
-        fg_width = int(fg_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        fg_height = int(fg_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fg_frames = int(fg_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fg_duration = fg_frames / fg_fps
+def _cuda_frames(video_path):
+    """
+    Generatore di frame BGR come cv2.cuda_GpuMat.
 
-        print(f"✅ Background: {bg_width}x{bg_height}, {bg_duration:.1f}s, FPS: {bg_fps}")
-        print(f"✅ Foreground: {fg_width}x{fg_height}, {fg_duration:.1f}s, FPS: {fg_fps}")
+    Con cv2.cudacodec (OpenCV con WITH_NVCUVID) il frame viene decodificato da
+    NVDEC direttamente in memoria GPU; altrimenti decode (NVDEC via PyAV se
+    disponibile) + un upload per frame.
+    Il GpuMat restituito può essere riusato al frame successivo.
+    """
+    try:
+        reader = cv2.cudacodec.createVideoReader(video_path)
+    except (AttributeError, cv2.error):
+        reader = None
 
-        # Calcola timing
-        start_frame = int(start_time * bg_fps)
-        if duration is None:
-            duration = fg_duration
-        end_frame = int((start_time + duration) * bg_fps)
+    if reader is not None:
+        while True:
+            ret, gpu_frame = reader.nextFrame()
+            if not ret:
+                return
+            # cudacodec restituisce BGRA di default
+            if gpu_frame.channels() == 4:
+                gpu_frame = cv2.cuda.cvtColor(gpu_frame, cv2.COLOR_BGRA2BGR)
+            yield gpu_frame
+
+    cap = _open_capture(video_path, hwaccel=True)
+    gpu_frame = cv2.cuda_GpuMat()
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            gpu_frame.upload(frame)
+            yield gpu_frame
+    finally:
+        cap.release()
 
-        print(f"📅 Call to action: dal secondo {start_time} per {duration:.1f}s (frame {start_frame}-{end_frame})")
-        print(f"🎵 Audio mode: {audio_source}")
 
-        # Calcola dimensioni scalate
-        new_fg_width = int(fg_width * scale)
-        new_fg_height = int(fg_height * scale)
+def _cuda_blend_weights(gpu_alpha):
+    """
+    Pesi float32 a un canale (alpha / 255, 1 - alpha / 255) per _cuda_blend.
 
-    except Exception as e:
-        print(f"❌ Errore durante l'apertura dei video: {e}")
+    Calcolati una volta per maschera: il soggetto di un frame foreground
+    (e il logo) viene fuso su più frame di background con gli stessi pesi.
+    """
+    weights = gpu_alpha.convertTo(cv2.CV_32FC1, 1.0 / 255.0)
+    return weights, weights.convertTo(cv2.CV_32FC1, -1.0, 1.0)
+
+
+def _cuda_blend(gpu_fg, weights, gpu_roi):
+    """
+    gpu_roi = fg * alpha + roi * (1 - alpha) con cv2.cuda.blendLinear: un solo
+    kernel su GPU che scrive direttamente nella ROI (niente immagini float intermedie)
+
+    Args:
+        gpu_fg: Soggetto BGR uint8
+        weights: Coppia di pesi da _cuda_blend_weights
+        gpu_roi: ROI del frame di destinazione (stessa dimensione di gpu_fg)
+    """
+    cv2.cuda.blendLinear(gpu_fg, gpu_roi, weights[0], weights[1], result=gpu_roi)
+
+
+def _composite_cuda(foreground_video, background_video, out, output_video,
+                    bg_fps, bg_width, bg_height, bg_frames, fg_fps,
+                    start_frame, end_frame, total_needed_frames, fg_size,
+                    lower_green, upper_green, blur_kernel, position, opacity, fast_mode,
+                    logo_img, logo_position, progress_callback):
+    """
+    Chromakey + compositing con cv2.cuda: decode, maschera, blend e logo su GPU.
+
+    Il frame foreground viene elaborato quando serve (nessuna lista di frame
+    in RAM); l'unico trasferimento GPU->CPU è il download del frame finito
+    per il writer `out` (vedi _open_writer).
+
+    Returns:
+        bool: True se il video è stato scritto su `out`
+    """
+    print("🚀 Pipeline CUDA: frame residenti su GPU")
+
+    def abort(message):
+        print(message)
+        out.release()
+        # Pulisci file output incompleto
+        if os.path.exists(output_video):
+            os.remove(output_video)
         return False
 
     try:
-        # Carica il logo se fornito
-        logo_img = None
-        if logo_path and os.path.exists(logo_path):
-            print(f"📷 Caricando logo: {logo_path}")
-            logo_img = cv2.imread(logo_path, cv2.IMREAD_UNCHANGED)
-            if logo_img is not None:
-                # Scala il logo
-                if logo_img.shape[2] == 4:  # RGBA
-                    logo_height, logo_width = logo_img.shape[:2]
-                else:  # RGB, aggiungi canale alpha
-                    logo_img = cv2.cvtColor(logo_img, cv2.COLOR_BGR2BGRA)
-                    logo_height, logo_width = logo_img.shape[:2]
-                
-                new_logo_width = int(logo_width * logo_scale)
-                new_logo_height = int(logo_height * logo_scale)
-                logo_img = cv2.resize(logo_img, (new_logo_width, new_logo_height))
-                print(f"✅ Logo caricato: {new_logo_width}x{new_logo_height}")
-
-        # Pre-processa tutti i frame del foreground con chroma key
-        print("🔄 Pre-processando call to action...")
-        fg_processed_frames = []
-        fg_masks = []
-
-        # Ottimizzazione: se fast_mode, processa solo i frame necessari
-        if fast_mode:
-            print("🚀 Modalità veloce: pre-processando solo frame necessari...")
-            total_needed_frames = min(len(range(int(duration * fg_fps))) if duration else fg_frames, fg_frames)
-        else:
-            total_needed_frames = fg_frames
+        new_fg_width, new_fg_height = fg_size
+        lower = tuple(int(v) for v in lower_green)
+        upper = tuple(int(v) for v in upper_green)
+
+        # Filtri CUDA costruiti una volta per video
+        gauss = cv2.cuda.createGaussianFilter(cv2.CV_8UC1, cv2.CV_8UC1, (blur_kernel, blur_kernel), 0)
+        morph_open = morph_close = None
+        if not fast_mode:
+            kernel = np.ones((3, 3), np.uint8)
+            morph_open = cv2.cuda.createMorphologyFilter(cv2.MORPH_OPEN, cv2.CV_8UC1, kernel)
+            morph_close = cv2.cuda.createMorphologyFilter(cv2.MORPH_CLOSE, cv2.CV_8UC1, kernel)
+
+        # Logo caricato su GPU una volta: BGR + pesi di blend
+        gpu_logo = gpu_logo_weights = None
+        if logo_img is not None and logo_position is not None:
+            gpu_logo = cv2.cuda_GpuMat()
+            gpu_logo.upload(np.ascontiguousarray(logo_img[:, :, :3]))
+            gpu_logo_alpha = cv2.cuda_GpuMat()
+            gpu_logo_alpha.upload(np.ascontiguousarray(logo_img[:, :, 3]))
+            gpu_logo_weights = _cuda_blend_weights(gpu_logo_alpha)
+
+        # Buffer del soggetto scalato allocato una volta (resize/copia con dst)
+        gpu_fg_scaled = cv2.cuda_GpuMat(new_fg_height, new_fg_width, cv2.CV_8UC3)
+
+        fg_reader = _cuda_frames(foreground_video)
+        fg_loaded = -1       # indice dell'ultimo frame foreground decodificato
+        fg_current = None    # (soggetto, pesi di blend) del frame foreground corrente
+        x, y = position
+        frame_count = 0
 
-        frame_idx = 0
-        while frame_idx < total_needed_frames:
-            ret, fg_frame = fg_cap.read()
-            if not ret:
+        for gpu_bg in _cuda_frames(background_video):
+            if frame_count >= bg_frames:
                 break
 
-            # Scala se necessario
-            if scale != 1.0:
-                fg_frame = cv2.resize(fg_frame, (new_fg_width, new_fg_height))
+            if frame_count % 10 == 0 and progress_callback:
+                if progress_callback(None) is False:
+                    return abort("🛑 Processing interrupted - early exit")
 
-            # Chroma key ottimizzato
-            hsv = cv2.cvtColor(fg_frame, cv2.COLOR_BGR2HSV)
-            mask = cv2.inRange(hsv, lower_green, upper_green)
+            if start_frame <= frame_count < end_frame:
+                fg_frame_idx = min(int((frame_count - start_frame) * fg_fps / bg_fps), total_needed_frames - 1)
+
+                # Avanza il reader fino al frame richiesto (l'ultimo resta in uso a fine video)
+                while fg_loaded < fg_frame_idx:
+                    gpu_fg = next(fg_reader, None)
+                    if gpu_fg is None:
+                        break
+                    fg_loaded += 1
+                    if fg_loaded < fg_frame_idx:
+                        continue
+
+                    # Il reader riusa il suo GpuMat: il soggetto va nel buffer dedicato
+                    if (new_fg_width, new_fg_height) != gpu_fg.size():
+                        cv2.cuda.resize(gpu_fg, (new_fg_width, new_fg_height), dst=gpu_fg_scaled,
+                                        interpolation=_resize_interpolation(gpu_fg.size(), fg_size))
+                    else:
+                        gpu_fg.copyTo(gpu_fg_scaled)
+                    gpu_fg = gpu_fg_scaled
+
+                    hsv = cv2.cuda.cvtColor(gpu_fg, cv2.COLOR_BGR2HSV)
+                    mask = cv2.cuda.inRange(hsv, lower, upper)
+                    if morph_open is not None:
+                        mask = morph_close.apply(morph_open.apply(mask))
+                    mask = gauss.apply(mask)
+                    mask_inv = cv2.cuda.bitwise_not(mask)
+                    if opacity < 1.0:
+                        mask_inv = mask_inv.convertTo(cv2.CV_8UC1, opacity)
+                    fg_current = (gpu_fg, _cuda_blend_weights(mask_inv))
+
+                if fg_current is not None:
+                    gpu_fg, weights = fg_current
 
-            # Pulizia maschera (ridotta se fast_mode)
-            if fast_mode:
-                mask = cv2.GaussianBlur(mask, (blur_kernel, blur_kernel), 0)
-            else:
-                kernel = np.ones((3, 3), np.uint8)
-                mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-                mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-                mask = cv2.GaussianBlur(mask, (blur_kernel, blur_kernel), 0)
+                    # Verifica bounds
+                    fg_w, fg_h = gpu_fg.size()
+                    x_safe = max(0, min(x, bg_width - fg_w))
+                    y_safe = max(0, min(y, bg_height - fg_h))
+                    w = min(x_safe + fg_w, bg_width) - x_safe
+                    h = min(y_safe + fg_h, bg_height) - y_safe
+
+                    if w > 0 and h > 0:
+                        roi = cv2.cuda_GpuMat(gpu_bg, (x_safe, y_safe, w, h))
+                        if (w, h) != (fg_w, fg_h):
+                            gpu_fg = cv2.cuda_GpuMat(gpu_fg, (0, 0, w, h))
+                            weights = tuple(cv2.cuda_GpuMat(weight, (0, 0, w, h)) for weight in weights)
+                        _cuda_blend(gpu_fg, weights, roi)
+
+            # Logo (spostato 3 pixel più vicino agli angoli, come nel percorso CPU)
+            if gpu_logo is not None:
+                logo_x, logo_y = logo_position
+                logo_w, logo_h = gpu_logo.size()
+                logo_x_safe = max(3, min(logo_x, bg_width - logo_w - 3))
+                logo_y_safe = max(3, min(logo_y, bg_height - logo_h - 3))
+                roi = cv2.cuda_GpuMat(gpu_bg, (logo_x_safe, logo_y_safe, logo_w, logo_h))
+                _cuda_blend(gpu_logo, gpu_logo_weights, roi)
+
+            out.write(gpu_bg.download())
+            frame_count += 1
+
+            progress_interval = 60 if fast_mode else 30
+            if frame_count % progress_interval == 0:
+                progress = (frame_count / bg_frames) * 100
+                print(f"🔄 Progresso: {progress:.1f}% ({frame_count}/{bg_frames})")
+                if progress_callback:
+                    mapped_progress = 30 + int(progress * 0.65)
+                    if progress_callback(mapped_progress) is False:
+                        return abort("🛑 Processing interrupted by callback")
 
-            # Inverti maschera
-            mask_inv = cv2.bitwise_not(mask)
+        if out.release() is False:
+            return False
+        print("✅ Video processato con successo (CUDA)!")
+        return True
 
-            # Applica opacità
-            if opacity < 1.0:
-                mask_inv = (mask_inv * opacity).astype(np.uint8)
+    except Exception as e:
+        return abort(f"❌ Errore durante elaborazione CUDA: {e}")
 
-            # Estrai soggetto
-            fg_subject = cv2.bitwise_and(fg_frame, fg_frame, mask=mask_inv)
 
-            fg_processed_frames.append(fg_subject)
-            fg_masks.append(mask_inv)
-            frame_idx += 1
+@lru_cache(maxsize=1)
+def _ffmpeg_capabilities():
+    """
+    Encoder e filtri disponibili nel binario ffmpeg (letti una volta per processo)
 
-        fg_cap.release()
-        print(f"✅ Processati {len(fg_processed_frames)} frame della call to action")
+    Returns:
+        frozenset | None: Nomi encoder/filtri, None se ffmpeg non è installato
+    """
+    names = set()
+    try:
+        for listing in ('-encoders', '-filters'):
+            output = subprocess.run(
+                ['ffmpeg', '-hide_banner', listing],
+                capture_output=True, text=True, timeout=10
+            ).stdout
+            for line in output.splitlines():
+                parts = line.split()
+                if len(parts) >= 2:
+                    names.add(parts[1])
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+    return frozenset(names)
+
+
+def _hsv_range_to_chromakey(lower_green, upper_green):
+    """
+    Converte il range HSV (scala OpenCV) nei parametri del filtro chromakey di ffmpeg.
 
-    except Exception as e:
-        print(f"❌ Errore durante pre-processamento: {e}")
+    Colore chiave = centro del range; similarity proporzionale all'ampiezza
+    della tinta (approssimazione: ffmpeg misura la distanza in UV, non in HSV).
+
+    Returns:
+        tuple: (colore '0xRRGGBB', similarity, blend)
+    """
+    h = (int(lower_green[0]) + int(upper_green[0])) / 2 / 180.0
+    s = (int(lower_green[1]) + int(upper_green[1])) / 2 / 255.0
+    v = (int(lower_green[2]) + int(upper_green[2])) / 2 / 255.0
+    r, g, b = colorsys.hsv_to_rgb(h, s, v)
+    color = f"0x{int(r * 255):02X}{int(g * 255):02X}{int(b * 255):02X}"
+    similarity = min(max((int(upper_green[0]) - int(lower_green[0])) / 180.0, 0.01), 1.0)
+    return color, round(similarity, 3), 0.1
+
+
+@lru_cache(maxsize=32)
+def _has_audio(video_path):
+    """True se il file ha almeno una traccia audio (letto dall'header via ffmpeg -i)"""
+    try:
+        probe = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-i', video_path],
+            capture_output=True, text=True, timeout=30
+        )
+    except (FileNotFoundError, subprocess.TimeoutExpired):
         return False
+    return 'Audio:' in probe.stderr
+
+
+@lru_cache(maxsize=32)
+def _probe_video(video_path, mtime_ns, size):
+    """
+    Metadati del primo stream video letti una volta con ffprobe.
+
+    mtime_ns e size fanno parte della chiave di cache: un file sovrascritto
+    viene riletto.
 
+    Returns:
+        dict: fps, width, height, frames (nb_frames del container), oppure
+        None se ffprobe non è disponibile o il file non è leggibile
+    """
     try:
-        # Configura writer con codec ottimizzato
-        if gpu_accel:
-            fourcc = cv2.VideoWriter_fourcc(*'H264')
-            print("🚀 Usando codec hardware H264")
-        elif fast_mode:
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            print("🚀 Usando codec veloce XVID")
+        output = subprocess.check_output(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'stream=width,height,avg_frame_rate,nb_frames,duration',
+             '-of', 'json', video_path],
+            timeout=30
+        )
+        stream = json.loads(output)['streams'][0]
+        fps = float(Fraction(stream['avg_frame_rate']))
+        frames = stream.get('nb_frames')
+        if frames and frames != 'N/A':
+            frames = int(frames)
         else:
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            # Container senza conteggio frame (es. mkv/webm): stima da durata
+            frames = int(round(float(stream['duration']) * fps))
+        return {'fps': fps, 'width': int(stream['width']),
+                'height': int(stream['height']), 'frames': frames}
+    except (FileNotFoundError, subprocess.SubprocessError, KeyError, IndexError,
+            ValueError, ZeroDivisionError):
+        return None
+
+
+def _video_info(video_path, cap):
+    """
+    fps, width, height, frames di un video: ffprobe (in cache) se disponibile,
+    altrimenti le proprietà della capture già aperta
+    """
+    try:
+        stat = os.stat(video_path)
+        info = _probe_video(os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        info = None
+    if info is not None:
+        return info
+    return {'fps': cap.get(cv2.CAP_PROP_FPS),
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'frames': int(cap.get(cv2.CAP_PROP_FRAME_COUNT))}
+
+
+def _audio_mix(audio_source, bg_input, fg_input, start_time, fast_mode):
+    """
+    Filtri e mapping audio ffmpeg per la modalità richiesta.
+
+    Se una delle due tracce manca si usa quella disponibile invece di
+    perdere tutto l'audio.
+
+    Args:
+        audio_source: background, foreground, both, timed, synced, none
+        bg_input, fg_input: Indici input ffmpeg di background e foreground
+        start_time: Inizio call to action (ritardo audio foreground)
+        fast_mode: Con solo audio background lo copia senza ricodifica
+
+    Returns:
+        tuple: (filtri filter_complex, argomenti -map/-c:a)
+    """
+    if audio_source == 'none':
+        return [], ['-an']
+
+    has_bg = _has_audio(bg_input[1])
+    has_fg = _has_audio(fg_input[1])
+    bg, fg = bg_input[0], fg_input[0]
+
+    if audio_source in ('both', 'timed', 'synced') and not (has_bg and has_fg):
+        audio_source = 'background' if has_bg else 'foreground'
+
+    aac = ['-c:a', 'aac', '-b:a', '128k', '-shortest']
+    if audio_source == 'background':
+        if not has_bg:
+            return [], ['-an']
+        return [], ['-map', f'{bg}:a:0'] + (['-c:a', 'copy', '-shortest'] if fast_mode else aac)
+    if audio_source == 'foreground':
+        if not has_fg:
+            return [], ['-an']
+        return [], ['-map', f'{fg}:a:0'] + aac
+    if audio_source == 'both':
+        return [f"[{bg}:a][{fg}:a]amix=inputs=2[a]"], ['-map', '[a]'] + aac
+
+    # timed / synced: audio foreground ritardato all'inizio della call to action
+    delay_ms = int(start_time * 1000)
+    bg_volume, fg_volume = (1.0, 1.2) if audio_source == 'timed' else (0.8, 1.0)
+    return [
+        f"[{bg}:a]volume={bg_volume}[bg]",
+        f"[{fg}:a]adelay={delay_ms}|{delay_ms},volume={fg_volume}[fg_a]",
+        "[bg][fg_a]amix=inputs=2:duration=longest:dropout_transition=2[a]",
+    ], ['-map', '[a]'] + aac
+
+
+def _video_encoder_args(caps, gpu_accel, fast_mode):
+    """Encoder H.264: NVENC con gpu_accel se il binario lo supporta, altrimenti libx264"""
+    if gpu_accel and 'h264_nvenc' in caps:
+        return ['-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr', '-cq', '19', '-pix_fmt', 'yuv420p']
+    return ['-c:v', 'libx264', '-preset', 'veryfast' if fast_mode else 'medium', '-crf', '20', '-pix_fmt', 'yuv420p']
+
+
+class FFmpegPipeWriter:
+    """
+    Writer con l'interfaccia di cv2.VideoWriter (isOpened/write/release) che invia
+    i frame BGR grezzi allo stdin di ffmpeg.
+
+    Encode H.264 (NVENC se disponibile) e mix audio avvengono nello stesso
+    processo: niente file temporaneo mp4v né secondo passaggio per l'audio.
+    """
+
+    def __init__(self, output_video, size, fps, foreground_video, background_video,
+                 audio_source, start_time, fast_mode, gpu_accel):
+        self.output_video = output_video
+        width, height = size
+
+        # Input: 0 = frame grezzi da stdin, 1 = background, 2 = foreground (solo audio)
+        audio_filters, audio_args = _audio_mix(
+            audio_source, (1, background_video), (2, foreground_video), start_time, fast_mode
+        )
+        cmd = [
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+        ]
+        if audio_args != ['-an']:
+            cmd += ['-i', background_video, '-i', foreground_video]
+        if audio_filters:
+            cmd += ['-filter_complex', ';'.join(audio_filters)]
+        cmd += ['-map', '0:v:0'] + audio_args
+        cmd += _video_encoder_args(_ffmpeg_capabilities(), gpu_accel, fast_mode)
+        cmd.append(output_video)
+
+        self.has_audio = audio_args != ['-an']
+        self._closed = False
+        # stderr su file: una pipe non letta potrebbe riempirsi e bloccare ffmpeg
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def isOpened(self):
+        return self.process.poll() is None
+
+    def write(self, frame):
+        if self._closed:
+            return
+        try:
+            self.process.stdin.write(frame.data if frame.flags.c_contiguous else frame.tobytes())
+        except BrokenPipeError:
+            # Con -shortest ffmpeg chiude da solo quando finisce l'audio: i frame
+            # successivi vengono scartati (come il taglio del vecchio remux)
+            if self.process.wait() != 0:
+                raise RuntimeError(f"ffmpeg terminato: {self.error()}")
+            self._closed = True
+
+    def error(self):
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors='replace').strip()[-500:]
+
+    def release(self):
+        """Chiude lo stdin e attende ffmpeg. Returns: False se ffmpeg è fallito"""
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        ok = self.process.wait() == 0
+        if not ok:
+            print(f"❌ Errore ffmpeg: {self.error()}")
+        self._stderr.close()
+        return ok
+
+
+def _open_writer(output_video, size, fps, foreground_video, background_video,
+                 audio_source, start_time, fast_mode, gpu_accel):
+    """
+    Writer di output: pipe ffmpeg (video + audio in un passaggio) se ffmpeg è
+    installato, altrimenti cv2.VideoWriter senza audio.
+    """
+    if _ffmpeg_capabilities() is not None:
+        print("🚀 Encode e audio in un solo processo ffmpeg (pipe rawvideo)")
+        return FFmpegPipeWriter(output_video, size, fps, foreground_video, background_video,
+                                audio_source, start_time, fast_mode, gpu_accel)
+
+    # Configura writer con codec ottimizzato
+    if gpu_accel:
+        fourcc = cv2.VideoWriter_fourcc(*'H264')
+        print("🚀 Usando codec hardware H264")
+    elif fast_mode:
+        fourcc = cv2.VideoWriter_fourcc(*'XVID')
+        print("🚀 Usando codec veloce XVID")
+    else:
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(output_video, fourcc, fps, size)
+
+
+def _composite_ffmpeg(foreground_video, background_video, output_video,
+                      start_time, duration, bg_duration, bg_size, fg_size,
+                      lower_green, upper_green, audio_source, position, opacity,
+                      fast_mode, gpu_accel, logo_path, logo_img, logo_position, progress_callback):
+    """
+    Chromakey, compositing, logo e audio in una sola invocazione ffmpeg.
+
+    Con gpu_accel e ffmpeg compilato con NVENC/CUDA: decode CUDA, chromakey_cuda,
+    scale_cuda e overlay_cuda (frame sempre in memoria GPU) + encode h264_nvenc.
+    Altrimenti filtri CPU (chromakey, scale, overlay) e libx264 (o NVENC se c'è).
+    Nessun frame passa da Python e nessun file temporaneo.
+
+    Returns:
+        bool | None: True/False esito, None se ffmpeg non è utilizzabile
+                     (il chiamante usa il percorso OpenCV)
+    """
+    caps = _ffmpeg_capabilities()
+    if caps is None:
+        print("⚠️ ffmpeg non trovato: uso il percorso OpenCV")
+        return None
+
+    bg_width, bg_height = bg_size
+    fg_width, fg_height = fg_size
+    x = max(0, min(position[0], bg_width - fg_width))
+    y = max(0, min(position[1], bg_height - fg_height))
+    end_time = start_time + duration
+    color, similarity, blend = _hsv_range_to_chromakey(lower_green, upper_green)
+
+    nvenc = gpu_accel and 'h264_nvenc' in caps
+    cuda_graph = (
+        nvenc
+        and {'scale_cuda', 'overlay_cuda', 'chromakey_cuda'} <= caps
+        and logo_img is None
+        and opacity >= 1.0
+    )
+
+    cmd = ['ffmpeg', '-y', '-v', 'error', '-nostats', '-progress', 'pipe:1']
+    hwaccel = ['-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda'] if cuda_graph else []
+    cmd += hwaccel + ['-i', background_video] + hwaccel + ['-i', foreground_video]
+
+    # Il foreground parte a start_time e dura `duration` (come i frame pre-processati)
+    fg_chain = f"[1:v]trim=duration={duration},setpts=PTS-STARTPTS+{start_time}/TB"
+    if cuda_graph:
+        print("🚀 Filtergraph ffmpeg CUDA + NVENC")
+        filters = [
+            f"{fg_chain},scale_cuda=w={fg_width}:h={fg_height},"
+            f"chromakey_cuda={color}:{similarity}:{blend}[fg]",
+            f"[0:v][fg]overlay_cuda=x={x}:y={y}:eof_action=pass[v]",
+        ]
+    else:
+        print(f"🚀 Filtergraph ffmpeg{' + NVENC' if nvenc else ''}")
+        fg_filters = f"{fg_chain},scale={fg_width}:{fg_height},chromakey={color}:{similarity}:{blend}"
+        if opacity < 1.0:
+            fg_filters += f",colorchannelmixer=aa={opacity}"
+        filters = [
+            f"{fg_filters}[fg]",
+            f"[0:v][fg]overlay=x={x}:y={y}:enable='between(t,{start_time},{end_time})'[v]",
+        ]
+
+        if logo_img is not None and logo_position is not None:
+            # Logo scalato come in _load_logo, 3 pixel dai bordi
+            logo_h, logo_w = logo_img.shape[:2]
+            logo_x = max(3, min(logo_position[0], bg_width - logo_w - 3))
+            logo_y = max(3, min(logo_position[1], bg_height - logo_h - 3))
+            cmd += ['-i', logo_path]
+            filters[-1] = filters[-1].replace('[v]', '[base]')
+            filters += [
+                f"[2:v]scale={logo_w}:{logo_h},format=rgba[logo]",
+                f"[base][logo]overlay=x={logo_x}:y={logo_y}[v]",
+            ]
+
+    # Audio: stesse sorgenti/volumi della pipe ffmpeg del percorso OpenCV
+    audio_filters, audio_args = _audio_mix(
+        audio_source, (0, background_video), (1, foreground_video), start_time, fast_mode
+    )
+    filters += audio_filters
+
+    cmd += ['-filter_complex', ';'.join(filters), '-map', '[v]'] + audio_args
+    cmd += _video_encoder_args(caps, gpu_accel, fast_mode)
+    cmd.append(output_video)
 
-        out = cv2.VideoWriter(output_video, fourcc, bg_fps, (bg_width, bg_height))
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 
-        if not out.isOpened():
-            print("❌ Errore: impossibile creare il video writer")
+    # -progress pipe:1: righe key=value, out_time_us = posizione corrente in output
+    for line in process.stdout:
+        if not line.startswith('out_time_us=') or not progress_callback:
+            continue
+        try:
+            seconds = int(line.split('=', 1)[1]) / 1_000_000
+        except ValueError:
+            continue
+        progress = min(seconds / bg_duration, 1.0) * 100 if bg_duration else 0
+        if progress_callback(30 + int(progress * 0.65)) is False:
+            print("🛑 Processing interrupted by callback")
+            process.kill()
+            process.wait()
+            if os.path.exists(output_video):
+                os.remove(output_video)
             return False
 
-        print("🎬 Avvio elaborazione video...")
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        print(f"❌ Errore ffmpeg filtergraph: {stderr.strip()[-500:]}")
+        print("🔄 Ripiego sul percorso OpenCV")
+        return None
+
+    if audio_args != ['-an']:
+        print(f"✅ Video con audio ({audio_source}) salvato in: {output_video}")
+    else:
+        print(f"✅ Video (senza audio) salvato in: {output_video}")
+    if progress_callback:
+        progress_callback(100)
+    return True
+
+
+def _resize_interpolation(src_size, dst_size):
+    """INTER_AREA in riduzione (niente aliasing sul soggetto), INTER_LINEAR in ingrandimento"""
+    if dst_size[0] <= src_size[0] and dst_size[1] <= src_size[1]:
+        return cv2.INTER_AREA
+    return cv2.INTER_LINEAR
+
+
+def _box_blur_size(blur_kernel):
+    """
+    Lato dei 3 box filter in cascata con la stessa varianza della gaussiana
+    di cv2.GaussianBlur(ksize=blur_kernel, sigma=0): 3 * (w^2 - 1) / 12 = sigma^2
+    """
+    sigma = 0.3 * ((blur_kernel - 1) * 0.5 - 1) + 0.8
+    size = int(round(np.sqrt(4 * sigma * sigma + 1)))
+    return size if size % 2 else size + 1
+
+
+def _put_frame(frames, item, stop):
+    """put() su coda limitata che si arrende se la pipeline viene fermata"""
+    while not stop.is_set():
+        try:
+            frames.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _read_frames(cap, frames, limit, stop):
+    """Thread reader: decodifica fino a `limit` frame in batch di PIPELINE_BATCH nella coda, poi None"""
+    count = 0
+    batch = []
+    while count < limit and not stop.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        batch.append(frame)
+        count += 1
+        if len(batch) == PIPELINE_BATCH:
+            if not _put_frame(frames, batch, stop):
+                return
+            batch = []
+    if batch and not _put_frame(frames, batch, stop):
+        return
+    _put_frame(frames, None, stop)
+
 
-        # Processa video frame by frame
+def _iter_frames(frames):
+    """Frame uno alla volta dai batch della coda, fino a None"""
+    while True:
+        batch = frames.get()
+        if batch is None:
+            return
+        yield from batch
+
+
+def _write_frames(out, frames, errors):
+    """Thread writer: codifica i batch di frame della coda fino a None"""
+    while True:
+        batch = frames.get()
+        if batch is None:
+            return
+        if errors:
+            continue  # Svuota la coda senza scrivere: il chiamante vedrà l'errore
+        try:
+            for frame in batch:
+                out.write(frame)
+        except Exception as e:
+            errors.append(e)
+
+
+def _blend_u8(fg, roi, alpha, planes=None):
+    """
+    Alpha blend uint8 in fixed point: roi = (fg * a + roi * (255 - a)) / 255, in place.
+
+    Stesso risultato del blend float64 (a meno di ±1 di arrotondamento): con Numba
+    blend per piani B/G/R separati (split, un kernel per piano, merge nella ROI),
+    altrimenti cv2.blendLinear (SIMD OpenCV) che scrive direttamente nella ROI,
+    con i pesi float32 a un canale invece del mask BGR float64.
+
+    Args:
+        fg: Sorgente BGR uint8, o tupla di piani (B, G, R) già separati
+        roi: Destinazione BGR uint8 (vista sul frame, modificata in place)
+        alpha: Alpha uint8 1 canale
+        planes: Buffer preallocati per i piani della ROI (riallocati da cv2 se la
+                dimensione non coincide)
+    """
+    if NUMBA_AVAILABLE:
+        fg_planes = cv2.split(fg) if isinstance(fg, np.ndarray) else fg
+        roi_planes = cv2.split(roi, planes) if planes is not None else cv2.split(roi)
+        for fg_plane, roi_plane in zip(fg_planes, roi_planes):
+            _blend_plane_numba(fg_plane, roi_plane, alpha)
+        cv2.merge(roi_planes, dst=roi)
+        return
+
+    weights = alpha.astype(np.float32)
+    weights *= 1.0 / 255.0
+    cv2.blendLinear(fg, roi, weights, 1.0 - weights, dst=roi)
+
+
+def _overlay_image(result, fg_subject, mask_inv, x, y, planes=None):
+    """
+    Alpha blend del soggetto su `result` in posizione (x, y), limitato ai bordi
+
+    Args:
+        result: Frame di destinazione BGR (modificato in place)
+        fg_subject: Soggetto BGR, o tupla di piani (B, G, R)
+        mask_inv: Alpha uint8 del soggetto (255 = soggetto pieno)
+        x, y: Posizione richiesta
+        planes: Buffer preallocati per i piani della ROI (vedi _blend_u8)
+    """
+    bg_height, bg_width = result.shape[:2]
+    subject_h, subject_w = mask_inv.shape
+
+    # Verifica bounds
+    x_safe = max(0, min(x, bg_width - subject_w))
+    y_safe = max(0, min(y, bg_height - subject_h))
+
+    y_end = min(y_safe + subject_h, bg_height)
+    x_end = min(x_safe + subject_w, bg_width)
+    fg_h = y_end - y_safe
+    fg_w = x_end - x_safe
+
+    if fg_h > 0 and fg_w > 0:
+        if isinstance(fg_subject, tuple):
+            fg_crop = tuple(plane[:fg_h, :fg_w] for plane in fg_subject)
+        else:
+            fg_crop = fg_subject[:fg_h, :fg_w]
+        mask_crop = mask_inv[:fg_h, :fg_w]
+
+        _blend_u8(fg_crop, result[y_safe:y_end, x_safe:x_end], mask_crop, planes)
+
+
+def _opacity_lut(opacity):
+    """
+    Tabella uint8 a 256 valori: lut[a] = int(a * opacity).
+
+    Con cv2.LUT l'opacità si applica alla maschera in place e in aritmetica
+    intera, con lo stesso troncamento di (mask * opacity).astype(np.uint8)
+    ma senza l'array float64 temporaneo per frame.
+    """
+    return (np.arange(256) * opacity).astype(np.uint8)
+
+
+def _premultiply_logo(logo_img):
+    """
+    Logo BGRA -> (BGR premoltiplicato per alpha, 255 - alpha su 3 canali), una volta per video
+
+    Con il colore già pesato il blend per frame è roi * (255 - a) / 255 + premoltiplicato:
+    una moltiplicazione e una somma invece di due moltiplicazioni e una somma.
+    """
+    alpha = cv2.merge([logo_img[:, :, 3]] * 3)
+    premultiplied = cv2.multiply(logo_img[:, :, :3], alpha, scale=1.0 / 255.0)
+    return premultiplied, cv2.bitwise_not(alpha)
+
+
+def _overlay_logo(result, logo, logo_position):
+    """
+    Alpha blend del logo su `result` (3 pixel più vicino agli angoli)
+
+    Args:
+        result: Frame di destinazione BGR (modificato in place)
+        logo: Coppia da _premultiply_logo
+        logo_position: Posizione richiesta (x, y)
+    """
+    premultiplied, inv_alpha = logo
+    bg_height, bg_width = result.shape[:2]
+    logo_x, logo_y = logo_position
+    logo_h, logo_w = premultiplied.shape[:2]
+
+    # Controlla bounds del logo (spostato 3 pixel più vicino agli angoli)
+    logo_x_safe = max(3, min(logo_x, bg_width - logo_w - 3))
+    logo_y_safe = max(3, min(logo_y, bg_height - logo_h - 3))
+    logo_x_end = logo_x_safe + logo_w
+    logo_y_end = logo_y_safe + logo_h
+
+    roi = result[logo_y_safe:logo_y_end, logo_x_safe:logo_x_end]
+    cv2.multiply(roi, inv_alpha, dst=roi, scale=1.0 / 255.0)
+    cv2.add(roi, premultiplied, dst=roi)
+
+
+def _composite_cpu(fg_cap, bg_cap, out, output_video,
+                   bg_fps, bg_width, bg_height, bg_frames, fg_fps,
+                   start_frame, end_frame, total_needed_frames, fg_size,
+                   lower_green, upper_green, blur_kernel, position, opacity,
+                   fast_mode, fused_kernel, opencl, mask_interp, green_approx,
+                   logo_img, logo_position, progress_callback):
+    """
+    Chromakey + compositing su CPU in pipeline a tre stadi.
+
+    Con `opencl` (GPU non CUDA: AMD, Intel integrate) il chroma key del frame
+    foreground gira sulle stesse chiamate cv2 ma su cv2.UMat (T-API OpenCL);
+    blend e encode restano sulla CPU.
+
+    Reader (un thread per video) -> calcolo (thread chiamante) -> writer (thread
+    che scrive su `out`, vedi _open_writer),
+    collegati da code limitate a PREFETCH_FRAMES: in memoria restano al massimo
+    pochi frame invece dell'intero foreground pre-processato. Ogni frame
+    foreground viene elaborato solo quando il compositing lo richiede.
+
+    Returns:
+        bool: True se il video è stato scritto su `out`
+    """
+    new_fg_width, new_fg_height = fg_size
+    fg_source_size = (int(fg_cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(fg_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    scaled = (new_fg_width, new_fg_height) != fg_source_size
+    frame_interp = _resize_interpolation(fg_source_size, fg_size)
+    mask_upsample = MASK_INTERPOLATIONS.get(mask_interp, cv2.INTER_LINEAR)
+
+    # Modalità veloce con Numba (opt-in fused_kernel): un solo passaggio per frame
+    # (vedi fuse_chromakey), buffer di lavoro allocati una volta per video.
+    # Conviene su CPU multi-core: su un solo core le chiamate SIMD di OpenCV restano più veloci
+    # Senza fast_mode (morfologia tra inRange e blur) si fonde solo HSV + inRange (green_mask)
+    # Logo premoltiplicato una volta per video (vedi _overlay_logo)
+    logo = _premultiply_logo(logo_img) if logo_img is not None and logo_position is not None else None
+
+    opacity_lut = _opacity_lut(opacity)
+
+    use_fused = fast_mode and fused_kernel and NUMBA_AVAILABLE
+    use_green_mask = not fast_mode and fused_kernel and NUMBA_AVAILABLE
+    # Maschera algebrica (opt-in green_approx): sostituisce cvtColor + inRange
+    # (o green_mask) quando il range è un cuneo verde
+    use_green_approx = green_approx and NUMBA_AVAILABLE and not use_fused
+    if use_green_approx and not _is_green_wedge(lower_green, upper_green):
+        print("⚠️ Range HSV fuori dal cuneo verde: maschera HSV standard")
+        use_green_approx = False
+    if use_fused or use_green_mask or use_green_approx:
+        print(f"🚀 Kernel chromakey {'algebrico' if use_green_approx else 'fuso'} (Numba)")
+        lo = np.asarray(lower_green, dtype=np.int32)
+        hi = np.asarray(upper_green, dtype=np.int32)
+    if use_fused:
+        blur_weights = cv2.getGaussianKernel(blur_kernel, 0).ravel().astype(np.float32)
+        blur_tmp_a = np.empty((new_fg_height, new_fg_width), np.float32)
+        blur_tmp_b = np.empty((new_fg_height, new_fg_width), np.float32)
+
+    # Pool di buffer per video, riusati a ogni frame foreground (dst=): soggetto
+    # scalato e, con Numba, piani B/G/R di soggetto e ROI per il blend per piani.
+    # Un buffer resta valido fino alla chiamata successiva di key_frame, quando
+    # anche fg_current viene sostituito
+    fg_scaled = np.empty((new_fg_height, new_fg_width, 3), np.uint8) if scaled else None
+    subject_planes = roi_planes = None
+    if NUMBA_AVAILABLE:
+        subject_planes = [np.empty((new_fg_height, new_fg_width), np.uint8) for _ in range(3)]
+        roi_planes = [np.empty((new_fg_height, new_fg_width), np.uint8) for _ in range(3)]
+
+    # Costanti per video: range HSV uint8, kernel gaussiano separabile e kernel
+    # morfologico calcolati una volta; buffer HSV/maschera riusati a ogni frame (dst=)
+    lower = np.asarray(lower_green, dtype=np.uint8)
+    upper = np.asarray(upper_green, dtype=np.uint8)
+    morph_kernel = np.ones((3, 3), np.uint8)
+    mask = np.empty((new_fg_height, new_fg_width), np.uint8)
+
+    # fast_mode: maschera calcolata a metà risoluzione (pyrDown) e riportata a
+    # piena con resize (mask_interp), 1/4 dei pixel in HSV/inRange/blur. Il blur a metà
+    # risoluzione usa un kernel dimezzato (stessa sfumatura in pixel di output)
+    half_res = fast_mode and not use_fused
+    if half_res:
+        mask_size = ((new_fg_width + 1) // 2, (new_fg_height + 1) // 2)
+        mask_blur = max(3, (blur_kernel // 2) | 1)
+        small_frame = np.empty((mask_size[1], mask_size[0], 3), np.uint8)
+        small_mask = np.empty((mask_size[1], mask_size[0]), np.uint8)
+    else:
+        mask_size = (new_fg_width, new_fg_height)
+        mask_blur = blur_kernel
+    gauss_kernel = cv2.getGaussianKernel(mask_blur, 0)
+    box_size = _box_blur_size(mask_blur) if mask_blur >= BOX_BLUR_MIN_KERNEL else None
+    hsv = None if use_green_mask or use_green_approx else np.empty((mask_size[1], mask_size[0], 3), np.uint8)
+
+    def key_frame(fg_frame):
+        """
+        Chroma key di un frame foreground -> (soggetto, maschera soggetto)
+
+        Il risultato resta valido fino alla chiamata successiva (buffer riusati).
+        """
+        if use_fused:
+            # Senza scala il kernel legge il frame decodificato senza copiarlo
+            fg_subject = fg_scaled if scaled else fg_frame
+            fuse_chromakey(fg_frame, lo, hi, blur_weights, opacity_lut,
+                           fg_subject, mask, blur_tmp_a, blur_tmp_b)
+            return fg_subject, mask
+
+        # Scala se necessario
+        if scaled:
+            fg_frame = cv2.resize(fg_frame, (new_fg_width, new_fg_height), dst=fg_scaled,
+                                  interpolation=frame_interp)
+
+        # Chroma key ottimizzato (a metà risoluzione in fast_mode)
+        if half_res:
+            cv2.pyrDown(fg_frame, dst=small_frame)
+            key_src, key_mask = small_frame, small_mask
+        else:
+            key_src, key_mask = fg_frame, mask
+
+        if use_green_approx:
+            fast_green_mask(key_src, lo, hi, key_mask)
+        elif use_green_mask:
+            green_mask(key_src, lo, hi, key_mask)
+        else:
+            cv2.cvtColor(key_src, cv2.COLOR_BGR2HSV, dst=hsv)
+            cv2.inRange(hsv, lower, upper, dst=key_mask)
+
+        # Pulizia maschera (ridotta se fast_mode)
+        if not fast_mode:
+            cv2.morphologyEx(key_mask, cv2.MORPH_OPEN, morph_kernel, dst=key_mask)
+            cv2.morphologyEx(key_mask, cv2.MORPH_CLOSE, morph_kernel, dst=key_mask)
+        if box_size:
+            # Kernel grandi: 3 box filter (somme scorrevoli SIMD) ≈ gaussiana, in place
+            for _ in range(3):
+                cv2.boxFilter(key_mask, -1, (box_size, box_size), dst=key_mask)
+        else:
+            # Gaussiana separabile con kernel precalcolato (= GaussianBlur), in place
+            cv2.sepFilter2D(key_mask, -1, gauss_kernel, gauss_kernel, dst=key_mask)
+
+        if half_res:
+            cv2.resize(small_mask, (new_fg_width, new_fg_height), dst=mask, interpolation=mask_upsample)
+
+        # Inverti maschera (in place: il buffer mask diventa la maschera soggetto)
+        mask_inv = cv2.bitwise_not(mask, dst=mask)
+
+        # Applica opacità
+        if opacity < 1.0:
+            cv2.LUT(mask_inv, opacity_lut, dst=mask_inv)
+
+        # Il soggetto non serve mascherato (niente bitwise_and): fuori dal
+        # soggetto mask_inv vale 0 e il blend lascia il background invariato
+        return fg_frame, mask_inv
+
+    # I kernel Numba lavorano su array CPU: con quelli attivi niente OpenCL
+    use_opencl = opencl and not (use_fused or use_green_mask or use_green_approx)
+    if use_opencl:
+        print("🚀 Chroma key OpenCL (cv2.UMat)")
+
+    def key_frame_opencl(fg_frame):
+        """key_frame su cv2.UMat: un upload e due download (soggetto, maschera) per frame"""
+        frame_u = cv2.UMat(fg_frame)
+        if scaled:
+            frame_u = cv2.resize(frame_u, (new_fg_width, new_fg_height), interpolation=frame_interp)
+
+        key_u = cv2.pyrDown(frame_u) if half_res else frame_u
+        mask_u = cv2.inRange(cv2.cvtColor(key_u, cv2.COLOR_BGR2HSV), lower, upper)
+        if not fast_mode:
+            mask_u = cv2.morphologyEx(mask_u, cv2.MORPH_OPEN, morph_kernel)
+            mask_u = cv2.morphologyEx(mask_u, cv2.MORPH_CLOSE, morph_kernel)
+        if box_size:
+            for _ in range(3):
+                mask_u = cv2.boxFilter(mask_u, -1, (box_size, box_size))
+        else:
+            mask_u = cv2.sepFilter2D(mask_u, -1, gauss_kernel, gauss_kernel)
+        if half_res:
+            mask_u = cv2.resize(mask_u, (new_fg_width, new_fg_height), interpolation=mask_upsample)
+        mask_u = cv2.bitwise_not(mask_u)
+
+        # Soggetto non mascherato come in key_frame: senza scala nessun download
+        fg_subject = frame_u.get() if scaled else fg_frame
+        mask_inv = mask_u.get()
+        if opacity < 1.0:
+            cv2.LUT(mask_inv, opacity_lut, dst=mask_inv)
+        return fg_subject, mask_inv
+
+    if use_opencl:
+        key_frame = key_frame_opencl
+
+    print("🎬 Avvio elaborazione video (pipeline reader -> chromakey -> writer)...")
+
+    stop = threading.Event()
+    queue_size = max(1, PREFETCH_FRAMES // PIPELINE_BATCH)
+    fg_queue = queue.Queue(maxsize=queue_size)
+    bg_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    write_errors = []
+
+    readers = [
+        threading.Thread(target=_read_frames, args=(fg_cap, fg_queue, total_needed_frames, stop), daemon=True),
+        threading.Thread(target=_read_frames, args=(bg_cap, bg_queue, bg_frames, stop), daemon=True),
+    ]
+    writer = threading.Thread(target=_write_frames, args=(out, write_queue, write_errors), daemon=True)
+    for thread in readers + [writer]:
+        thread.start()
+
+    def abort(message):
+        print(message)
+        stop.set()
+        write_queue.put(None)
+        writer.join()
+        out.release()
+        # Pulisci file output incompleto
+        if os.path.exists(output_video):
+            os.remove(output_video)
+        return False
+
+    try:
         x, y = position
+        fg_loaded = -1       # indice dell'ultimo frame foreground letto dalla coda
+        fg_current = None    # (soggetto, maschera) del frame foreground corrente
+        fg_keyed = 0
+        fg_done = False
         frame_count = 0
+        bg_iter = _iter_frames(bg_queue)
+        fg_iter = _iter_frames(fg_queue)
+        write_batch = []
 
         while frame_count < bg_frames:
             # Check for cancellation more frequently (every 10 frames)
             if frame_count % 10 == 0 and progress_callback:
-                should_continue = progress_callback(None)  # Just check, don't update progress
-                if should_continue is False:
-                    print("🛑 Processing interrupted - early exit")
-                    bg_cap.release()
-                    fg_cap.release()
-                    out.release()
-                    if os.path.exists(output_video):
-                        os.remove(output_video)
-                    return False
-            
-            bg_ret, bg_frame = bg_cap.read()
-            if not bg_ret:
+                if progress_callback(None) is False:  # Just check, don't update progress
+                    return abort("🛑 Processing interrupted - early exit")
+
+            bg_frame = next(bg_iter, None)
+            if bg_frame is None:
                 break
 
-            result = bg_frame.copy()
+            # Il frame decodificato è già una copia privata: si compone in place
+            result = bg_frame
 
             # Controlla se siamo nel range della call to action
             if start_frame <= frame_count < end_frame:
                 fg_frame_idx = int((frame_count - start_frame) * fg_fps / bg_fps)
 
-                if fg_frame_idx >= len(fg_processed_frames):
-                    fg_frame_idx = len(fg_processed_frames) - 1
-
-                if fg_frame_idx >= 0 and fg_frame_idx < len(fg_processed_frames):
-                    fg_subject = fg_processed_frames[fg_frame_idx]
-                    mask_inv = fg_masks[fg_frame_idx]
-
-                    # Verifica bounds
-                    x_safe = max(0, min(x, bg_width - fg_subject.shape[1]))
-                    y_safe = max(0, min(y, bg_height - fg_subject.shape[0]))
-
-                    y_end = min(y_safe + fg_subject.shape[0], bg_height)
-                    x_end = min(x_safe + fg_subject.shape[1], bg_width)
-                    fg_h = y_end - y_safe
-                    fg_w = x_end - x_safe
-
-                    if fg_h > 0 and fg_w > 0:
-                        fg_crop = fg_subject[:fg_h, :fg_w]
-                        mask_crop = mask_inv[:fg_h, :fg_w]
-
-                        bg_area = result[y_safe:y_end, x_safe:x_end]
-                        mask_norm = mask_crop.astype(float) / 255.0
-                        mask_norm = np.stack([mask_norm, mask_norm, mask_norm], axis=2)
-
-                        result[y_safe:y_end, x_safe:x_end] = \
-                            (fg_crop * mask_norm + bg_area * (1 - mask_norm)).astype(np.uint8)
+                # Avanza fino al frame richiesto; a fine foreground resta l'ultimo
+                pending = None
+                while fg_loaded < fg_frame_idx and not fg_done:
+                    fg_frame = next(fg_iter, None)
+                    if fg_frame is None:
+                        fg_done = True
+                        break
+                    fg_loaded += 1
+                    pending = fg_frame
+
+                if pending is not None:
+                    fg_current = key_frame(pending)
+                    if NUMBA_AVAILABLE:
+                        # Piani B/G/R del soggetto separati una volta per frame foreground
+                        # (riusati dal blend per piani a ogni frame di background)
+                        fg_current = (cv2.split(fg_current[0], subject_planes), fg_current[1])
+                    fg_keyed += 1
+
+                if fg_current is not None:
+                    _overlay_image(result, fg_current[0], fg_current[1], x, y, roi_planes)
 
             # Aggiungi logo se presente
-            if logo_img is not None and logo_position is not None:
-                logo_x, logo_y = logo_position
-                logo_h, logo_w = logo_img.shape[:2]
-                
-                # Controlla bounds del logo (spostato 3 pixel più vicino agli angoli)
-                logo_x_safe = max(3, min(logo_x, bg_width - logo_w - 3))
-                logo_y_safe = max(3, min(logo_y, bg_height - logo_h - 3))
-                logo_x_end = logo_x_safe + logo_w
-                logo_y_end = logo_y_safe + logo_h
-                
-                # Overlay del logo con alpha blending
-                if logo_img.shape[2] == 4:  # RGBA
-                    logo_bgr = logo_img[:, :, :3]
-                    logo_alpha = logo_img[:, :, 3] / 255.0
-                    
-                    bg_area_logo = result[logo_y_safe:logo_y_end, logo_x_safe:logo_x_end]
-                    logo_alpha_3ch = np.stack([logo_alpha, logo_alpha, logo_alpha], axis=2)
-                    
-                    result[logo_y_safe:logo_y_end, logo_x_safe:logo_x_end] = \
-                        (logo_bgr * logo_alpha_3ch + bg_area_logo * (1 - logo_alpha_3ch)).astype(np.uint8)
-
-            out.write(result)
+            if logo is not None:
+                _overlay_logo(result, logo, logo_position)
+
+            write_batch.append(result)
+            if len(write_batch) == PIPELINE_BATCH:
+                write_queue.put(write_batch)
+                write_batch = []
             frame_count += 1
 
             progress_interval = 60 if fast_mode else 30  # More frequent updates
@@ -252,179 +1348,180 @@ def remove_background_and_overlay_timed(foreground_video, background_video, outp
                 print(f"🔄 Progresso: {progress:.1f}% ({frame_count}/{bg_frames})")
                 # Update progress via callback if provided
                 if progress_callback:
-                    # Use full 0-100% range for more accurate progress
                     mapped_progress = 30 + int(progress * 0.65)  # Map 0-100% to 30-95% range
-                    should_continue = progress_callback(mapped_progress)
-                    # If callback returns False, stop processing
-                    if should_continue is False:
-                        print("🛑 Processing interrupted by callback")
-                        bg_cap.release()
-                        fg_cap.release()
-                        out.release()
-                        # Clean up incomplete output file
-                        if os.path.exists(output_video):
-                            os.remove(output_video)
-                        return False
+                    if progress_callback(mapped_progress) is False:
+                        return abort("🛑 Processing interrupted by callback")
+
+        stop.set()
+        if write_batch:
+            write_queue.put(write_batch)
+        write_queue.put(None)
+        writer.join()
+        released = out.release()
+
+        if write_errors:
+            print(f"❌ Errore durante scrittura video: {write_errors[0]}")
+            return False
+        if released is False:
+            return False
 
-        bg_cap.release()
-        out.release()
-        print("✅ Video processato con successo!")
+        print(f"✅ Video processato con successo! ({fg_keyed} frame della call to action)")
+        return True
 
     except Exception as e:
-        print(f"❌ Errore durante elaborazione video: {e}")
-        return False
+        return abort(f"❌ Errore durante elaborazione video: {e}")
 
-    # Gestione audio
-    if audio_source == 'none':
-        print(f"✅ Video (senza audio) salvato in: {output_video}")
-        if progress_callback:
-            progress_callback(100)
-        return True
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join()
+        fg_cap.release()
+        bg_cap.release()
 
-    print("🎵 Gestione audio...")
-    if progress_callback:
-        progress_callback(90)
-    temp_video = output_video.replace('.mp4', '_temp.mp4')
+
+def remove_background_and_overlay_timed(foreground_video, background_video, output_video,
+                                        start_time=0, duration=None,
+                                        lower_green=None, upper_green=None, blur_kernel=5,
+                                        audio_source='background', position=(0, 0), scale=1.0, opacity=1.0,
+                                        fast_mode=False, gpu_accel=False, fused_kernel=False, ffmpeg_filtergraph=False,
+                                        mask_interp='linear', green_approx=False, logo_path=None, logo_position=None, logo_scale=0.1, progress_callback=None):
+    """
+    Rimuove lo sfondo verde e sovrappone la call to action in un momento specifico
+    """
+    print(f"🎬 Avvio elaborazione...")
+    print(f"   Foreground: {foreground_video}")
+    print(f"   Background: {background_video}")
+    print(f"   Output: {output_video}")
+    print(f"   Modalità veloce: {fast_mode}")
+    print(f"   GPU: {gpu_accel}")
+
+    if lower_green is None:
+        lower_green = np.array([40, 40, 40])
+    if upper_green is None:
+        upper_green = np.array([80, 255, 255])
 
     try:
-        os.rename(output_video, temp_video)
+        # Apri i video
+        fg_cap = _open_capture(foreground_video, hwaccel=gpu_accel)
+        bg_cap = _open_capture(background_video, hwaccel=gpu_accel)
+
+        if not fg_cap.isOpened():
+            print(f"❌ Errore: impossibile aprire il video foreground {foreground_video}")
+            return False
+
+        if not bg_cap.isOpened():
+            print(f"❌ Errore: impossibile aprire il video background {background_video}")
+            return False
+
+        # Proprietà video (ffprobe: nb_frames esatto dal container)
+        bg_info = _video_info(background_video, bg_cap)
+        bg_fps = int(bg_info['fps'])
+        bg_width, bg_height = bg_info['width'], bg_info['height']
+        bg_frames = bg_info['frames']
+        bg_duration = bg_frames / bg_fps
+
+        fg_info = _video_info(foreground_video, fg_cap)
+        fg_fps = int(fg_info['fps'])
+        fg_width, fg_height = fg_info['width'], fg_info['height']
+        fg_frames = fg_info['frames']
+        fg_duration = fg_frames / fg_fps
+
+        print(f"✅ Background: {bg_width}x{bg_height}, {bg_duration:.1f}s, FPS: {bg_fps}")
+        print(f"✅ Foreground: {fg_width}x{fg_height}, {fg_duration:.1f}s, FPS: {fg_fps}")
+
+        # Calcola timing
+        start_frame = int(start_time * bg_fps)
+        if duration is None:
+            duration = fg_duration
+        end_frame = int((start_time + duration) * bg_fps)
+
+        print(f"📅 Call to action: dal secondo {start_time} per {duration:.1f}s (frame {start_frame}-{end_frame})")
+        print(f"🎵 Audio mode: {audio_source}")
+
+        # Calcola dimensioni scalate
+        new_fg_width = int(fg_width * scale)
+        new_fg_height = int(fg_height * scale)
+
     except Exception as e:
-        print(f"❌ Errore rinominando file temporaneo: {e}")
+        print(f"❌ Errore durante l'apertura dei video: {e}")
         return False
 
+    # Carica il logo se fornito (usato sia dal percorso CPU che CUDA)
     try:
-        if audio_source == 'background':
-            codec = 'copy' if fast_mode else 'aac'
-            cmd = [
-                'ffmpeg', '-y', '-v', 'error',
-                '-i', temp_video,
-                '-i', background_video,
-                '-c:v', 'copy',
-                '-c:a', codec,
-            ]
-            if codec == 'aac':
-                cmd.extend(['-b:a', '128k'])
-            cmd.extend([
-                '-map', '0:v:0',
-                '-map', '1:a:0',
-                '-shortest',
-                output_video
-            ])
-        elif audio_source == 'foreground':
-            cmd = [
-                'ffmpeg', '-y', '-v', 'error',
-                '-i', temp_video,
-                '-i', foreground_video,
-                '-c:v', 'copy',
-                '-c:a', 'aac', '-b:a', '128k',
-                '-map', '0:v:0',
-                '-map', '1:a:0',
-                '-shortest',
-                output_video
-            ]
-        elif audio_source == 'both':
-            cmd = [
-                'ffmpeg', '-y', '-v', 'error',
-                '-i', temp_video,
-                '-i', background_video,
-                '-i', foreground_video,
-                '-filter_complex', '[1:a][2:a]amix=inputs=2[a]',
-                '-c:v', 'copy',
-                '-c:a', 'aac', '-b:a', '128k',
-                '-map', '0:v:0',
-                '-map', '[a]',
-                '-shortest',
-                output_video
-            ]
-        elif audio_source == 'timed':
-            end_time = start_time + (duration if duration else fg_duration)
-            delay_ms = int(start_time * 1000)
-
-            filter_complex = f"""
-            [1:a]volume=1.0[bg];
-            [2:a]adelay={delay_ms}|{delay_ms},volume=1.2[fg_delayed];
-            [bg][fg_delayed]amix=inputs=2:duration=longest:dropout_transition=2[final]
-            """
-
-            cmd = [
-                'ffmpeg', '-y', '-v', 'error',
-                '-i', temp_video,
-                '-i', background_video,
-                '-i', foreground_video,
-                '-filter_complex', filter_complex,
-                '-c:v', 'copy',
-                '-c:a', 'aac', '-b:a', '128k',
-                '-map', '0:v:0',
-                '-map', '[final]',
-                '-shortest',
-                output_video
-            ]
-        elif audio_source == 'synced':
-            end_time = start_time + (duration if duration else fg_duration)
-            delay_ms = int(start_time * 1000)
-
-            filter_complex = f"""
-            [1:a]volume=0.8[bg];
-            [2:a]adelay={delay_ms}|{delay_ms},volume=1.0[fg_synced];
-            [bg][fg_synced]amix=inputs=2:duration=longest:dropout_transition=2[final]
-            """
-
-            cmd = [
-                'ffmpeg', '-y', '-v', 'error',
-                '-i', temp_video,
-                '-i', background_video,
-                '-i', foreground_video,
-                '-filter_complex', filter_complex,
-                '-c:v', 'copy',
-                '-c:a', 'aac', '-b:a', '128k',
-                '-map', '0:v:0',
-                '-map', '[final]',
-                '-shortest',
-                output_video
-            ]
+        logo_img = _load_logo(logo_path, logo_scale) if logo_path else None
+    except Exception as e:
+        print(f"❌ Errore caricamento logo: {e}")
+        return False
 
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        os.remove(temp_video)
-        print(f"✅ Video con audio ({audio_source}) salvato in: {output_video}")
-        if progress_callback:
-            progress_callback(100)
-        return True
+    # Filtergraph ffmpeg (opt-in): tutto il lavoro in un solo processo ffmpeg,
+    # percorso OpenCV come ripiego se ffmpeg manca o fallisce
+    if ffmpeg_filtergraph:
+        result = _composite_ffmpeg(
+            foreground_video, background_video, output_video,
+            start_time, duration, bg_duration, (bg_width, bg_height), (new_fg_width, new_fg_height),
+            lower_green, upper_green, audio_source, position, opacity,
+            fast_mode, gpu_accel, logo_path, logo_img, logo_position, progress_callback
+        )
+        if result is not None:
+            fg_cap.release()
+            bg_cap.release()
+            return result
+
+    # Ottimizzazione: se fast_mode, processa solo i frame necessari
+    if fast_mode:
+        total_needed_frames = min(len(range(int(duration * fg_fps))) if duration else fg_frames, fg_frames)
+    else:
+        total_needed_frames = fg_frames
+
+    # Writer condiviso da percorso CUDA e CPU: pipe ffmpeg che codifica e
+    # aggiunge l'audio nello stesso processo (cv2.VideoWriter se ffmpeg manca)
+    out = _open_writer(
+        output_video, (bg_width, bg_height), bg_fps, foreground_video, background_video,
+        audio_source, start_time, fast_mode, gpu_accel
+    )
+    if not out.isOpened():
+        print("❌ Errore: impossibile creare il video writer")
+        fg_cap.release()
+        bg_cap.release()
+        return False
 
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Errore ffmpeg: {e.stderr}")
-        print("🔄 Ripristino video senza audio...")
-        try:
-            os.rename(temp_video, output_video)
-            print(f"✅ Video (senza audio) salvato in: {output_video}")
-            if progress_callback:
-                progress_callback(100)
-            return True
-        except:
-            print(f"❌ Errore nel ripristino file")
+    # Percorso CUDA: frame residenti su GPU dal decode al download per l'encoder
+    if gpu_accel and cuda_available():
+        fg_cap.release()
+        bg_cap.release()
+        if not _composite_cuda(
+            foreground_video, background_video, out, output_video,
+            bg_fps, bg_width, bg_height, bg_frames, fg_fps,
+            start_frame, end_frame, total_needed_frames, (new_fg_width, new_fg_height),
+            lower_green, upper_green, blur_kernel, position, opacity, fast_mode,
+            logo_img, logo_position, progress_callback
+        ):
+            return False
+    else:
+        if not _composite_cpu(
+            fg_cap, bg_cap, out, output_video,
+            bg_fps, bg_width, bg_height, bg_frames, fg_fps,
+            start_frame, end_frame, total_needed_frames, (new_fg_width, new_fg_height),
+            lower_green, upper_green, blur_kernel, position, opacity,
+            fast_mode, fused_kernel, gpu_accel and opencl_available(), mask_interp, green_approx,
+            logo_img, logo_position, progress_callback
+        ):
             return False
 
-    except FileNotFoundError:
-        print("❌ ffmpeg non trovato!")
-        try:
-            os.rename(temp_video, output_video)
-            print(f"✅ Video (senza audio) salvato in: {output_video}")
+    # Audio già mixato dalla pipe ffmpeg: nessun file temporaneo né secondo encode
+    if getattr(out, 'has_audio', False):
+        print(f"✅ Video con audio ({audio_source}) salvato in: {output_video}")
+    else:
+        print(f"✅ Video (senza audio) salvato in: {output_video}")
+        if audio_source != 'none' and not isinstance(out, FFmpegPipeWriter):
+            print("❌ ffmpeg non trovato!")
             print("💡 Installa ffmpeg per l'audio:")
             print("  macOS: brew install ffmpeg")
             print("  Ubuntu: sudo apt install ffmpeg")
-            if progress_callback:
-                progress_callback(100)
-            return True
-        except:
-            print(f"❌ Errore nel ripristino file")
-            return False
 
-    except Exception as e:
-        print(f"❌ Errore generico audio: {e}")
-        try:
-            os.rename(temp_video, output_video)
-            return True
-        except:
-            return False
+    if progress_callback:
+        progress_callback(100)
+    return True
 
 
 def preview_timed_overlay(foreground_video, background_video, start_time=0, duration=None,
@@ -444,9 +1541,10 @@ def preview_timed_overlay(foreground_video, background_video, start_time=0, dura
         print("Errore nell'apertura dei video")
         return
 
-    bg_fps = int(bg_cap.get(cv2.CAP_PROP_FPS))
-    bg_frames = int(bg_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fg_frames = int(fg_cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    bg_info = _video_info(background_video, bg_cap)
+    bg_fps = int(bg_info['fps'])
+    bg_frames = bg_info['frames']
+    fg_frames = _video_info(foreground_video, fg_cap)['frames']
 
     start_frame = int(start_time * bg_fps)
     if duration:
@@ -554,6 +1652,9 @@ def main():
         # Parametri velocità
         parser.add_argument('--fast', action='store_true', help='Modalità veloce')
         parser.add_argument('--gpu', action='store_true', help='Accelerazione GPU')
+        parser.add_argument('--fused', action='store_true', help='Kernel chromakey fusi Numba')
+        parser.add_argument('--ffmpeg', action='store_true', help='Compositing in un solo filtergraph ffmpeg')
+        parser.add_argument('--green-approx', action='store_true', help='Maschera verde algebrica senza HSV (Numba)')
 
         # Parametri chroma key
         parser.add_argument('--h-min', type=int, default=40)
@@ -592,7 +1693,8 @@ def main():
                 args.foreground, args.background, output,
                 args.start, args.duration, lower_green, upper_green, args.blur,
                 args.audio, (args.x, args.y), args.scale, args.opacity,
-                args.fast, args.gpu
+                args.fast, args.gpu, args.fused, args.ffmpeg,
+                green_approx=args.green_approx
             )
 
             if success:
@@ -18,7 +18,7 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
 from sqlalchemy.orm import Session
@@ -33,13 +33,20 @@ from app.core.limiter import limiter
 from app.models.user import User
 
 # Setup logging
+_log_handlers = [
+    logging.FileHandler(settings.log_file),
+    logging.StreamHandler()
+]
+if settings.log_json:
+    # Record strutturati (campi extra inclusi) serializzati con orjson
+    from app.core.json_logging import JsonFormatter
+    for _handler in _log_handlers:
+        _handler.setFormatter(JsonFormatter())
+
 logging.basicConfig(
     level=logging.INFO if settings.environment != "production" else logging.WARNING,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(settings.log_file),
-        logging.StreamHandler()
-    ]
+    handlers=_log_handlers
 )
 
 logger = logging.getLogger(__name__)
@@ -92,6 +99,10 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ Errore avvio scheduler: {e}")
 
+    # Avvia write buffer (last_used_at, usage log in batch)
+    from app.core.write_buffer import start_write_buffer
+    start_write_buffer()
+
     logger.info("✅ Startup completato\n")
 
     yield
@@ -99,6 +110,21 @@ async def lifespan(app: FastAPI):
     # ========== SHUTDOWN ==========
     logger.info("\n💤 Shutdown applicazione...")
 
+    # Scrivi scritture DB bufferizzate residue
+    try:
+        from app.core.write_buffer import stop_write_buffer
+        await stop_write_buffer()
+    except Exception as e:
+        logger.warning(f"⚠️  Errore flush write buffer: {e}")
+
+    # Scrivi usage log in coda
+    try:
+        import asyncio
+        from app.core.usage_tracker import shutdown_usage_tracker
+        await asyncio.to_thread(shutdown_usage_tracker)
+    except Exception as e:
+        logger.warning(f"⚠️  Errore flush usage log: {e}")
+
     # Ferma scheduler
     try:
         from app.services.scheduler_service import scheduler_service
@@ -107,6 +133,13 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️  Errore shutdown scheduler: {e}")
 
+    # Chiudi pool database async
+    try:
+        from app.core.database import dispose_async_engine
+        await dispose_async_engine()
+    except Exception as e:
+        logger.warning(f"⚠️  Errore chiusura pool database async: {e}")
+
     logger.info("✅ Shutdown completato")
 
 
@@ -116,6 +149,7 @@ app = FastAPI(
     description="Professional Video Editing Suite con architettura modulare",
     version=settings.app_version,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # Serializzazione JSON in C (orjson)
     docs_url="/docs" if settings.debug else None,  # Swagger UI
     redoc_url="/redoc" if settings.debug else None,  # ReDoc
 )
@@ -179,10 +213,18 @@ app.add_middleware(CSRFProtectionMiddleware, secret_key=settings.secret_key)
 logger.info("✅ CSRF protection abilitato")
 
 # Rate Limiting (eseguito per primo)
-app.add_middleware(
-    RateLimitMiddleware,
-    enabled=settings.rate_limit_enabled
-)
+# Backend Redis: limite condiviso tra worker/istanze (fallback in-memory se non raggiungibile)
+if settings.rate_limit_backend == "redis":
+    from app.core.rate_limit_redis import RedisRateLimitMiddleware
+    app.add_middleware(
+        RedisRateLimitMiddleware,
+        enabled=settings.rate_limit_enabled
+    )
+else:
+    app.add_middleware(
+        RateLimitMiddleware,
+        enabled=settings.rate_limit_enabled
+    )
 
 # CORS - Configurazione sicura e restrittiva
 app.add_middleware(
@@ -336,7 +378,7 @@ app.include_router(screen_record.router, prefix=f"{settings.api_prefix}/screen-r
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "Internal server error",
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Database Migration - Ottimizzazioni schema (indici, tipi colonna)
+=================================================================
+Allinea un database PostgreSQL esistente ai modelli aggiornati.
+`Base.metadata.create_all` crea solo tabelle mancanti: indici e tipi
+di tabelle già esistenti vanno migrati qui.
+
+Tutti gli statement sono idempotenti (IF EXISTS / IF NOT EXISTS):
+lo script può essere rieseguito senza effetti collaterali.
+
+Usage:
+    python migrate_db_performance.py
+"""
+
+from app.core.database import engine
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _enum_to_varchar_statements():
+    """Statement conversione colonne enum: CHECK generati dagli enum Python correnti"""
+    from app.models.job import JobType, JobStatus
+    from app.models.pipeline import PipelineStatus
+    from app.models.scheduled_job import ScheduledJobStatus
+
+    # (tabella, colonna, enum, lunghezza VARCHAR)
+    columns = [
+        ("jobs", "job_type", JobType, 32),
+        ("jobs", "status", JobStatus, 16),
+        ("pipelines", "status", PipelineStatus, 16),
+        ("scheduled_jobs", "status", ScheduledJobStatus, 16),
+    ]
+
+    # Gli indici parziali filtrano su status: ricreati dopo con i nuovi valori
+    statements = [
+        "DROP INDEX IF EXISTS ix_jobs_active",
+        "DROP INDEX IF EXISTS ix_sched_due",
+    ]
+
+    for table, column, enum_class, length in columns:
+        type_name = enum_class.__name__.lower()
+        constraint = f"ck_{type_name}"
+        values = ", ".join(f"'{member.value}'" for member in enum_class)
+        statements += [
+            # SQLEnum nativo salvava il nome (PENDING): lower() → valore (pending).
+            # Rieseguibile: su colonne già varchar il cast è un'identità
+            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE VARCHAR({length}) USING lower({column}::text)",
+            f"DROP TYPE IF EXISTS {type_name}",
+            f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}",
+            f"ALTER TABLE {table} ADD CONSTRAINT {constraint} CHECK ({column} IN ({values}))",
+        ]
+
+    statements += [
+        "CREATE INDEX ix_jobs_active ON jobs (created_at) WHERE status IN ('pending', 'processing')",
+        "CREATE INDEX ix_sched_due ON scheduled_jobs (scheduled_time) WHERE status = 'scheduled'",
+    ]
+    return statements
+
+
+def _files_to_msgpack(conn):
+    """
+    Converte le colonne mappe file da JSONB a BYTEA MessagePack (app.core.types.Msgpack).
+
+    La conversione non è esprimibile in SQL: i valori vengono riletti e
+    riscritti da Python. Colonne già BYTEA vengono saltate (rieseguibile).
+    """
+    import msgspec
+
+    # (tabella, colonna, primary key)
+    columns = [
+        ("job_payloads", "input_files", "job_id"),
+        ("job_payloads", "output_files", "job_id"),
+        ("pipelines", "input_files", "id"),
+        ("pipelines", "output_files", "id"),
+    ]
+
+    for table, column, pk in columns:
+        data_type = conn.execute(
+            text(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = :table AND column_name = :column"
+            ),
+            {"table": table, "column": column},
+        ).scalar()
+        if data_type is None or data_type == "bytea":
+            continue
+
+        tmp = f"{column}__msgpack"
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {tmp} BYTEA"))
+
+        rows = conn.execute(text(f"SELECT {pk}, {column} FROM {table} WHERE {column} IS NOT NULL")).all()
+        if rows:
+            conn.execute(
+                text(f"UPDATE {table} SET {tmp} = :value WHERE {pk} = :pk"),
+                [{"pk": row[0], "value": msgspec.msgpack.encode(row[1])} for row in rows],
+            )
+
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+        conn.execute(text(f"ALTER TABLE {table} RENAME COLUMN {tmp} TO {column}"))
+
+
+# (descrizione, [statement SQL o funzione(conn)]) - eseguiti in ordine
+MIGRATIONS = [
+    (
+        "Indici composti (colonna, timestamp DESC) su admin_audit_logs e usage_logs",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_admin_audit_admin_time ON admin_audit_logs (admin_user_id, timestamp DESC)",
+            "CREATE INDEX IF NOT EXISTS ix_admin_audit_action_time ON admin_audit_logs (action, timestamp DESC)",
+            "CREATE INDEX IF NOT EXISTS ix_admin_audit_target ON admin_audit_logs (target_type, target_id, timestamp DESC)",
+            "DROP INDEX IF EXISTS ix_admin_audit_logs_admin_user_id",
+            "DROP INDEX IF EXISTS ix_admin_audit_logs_action",
+            "DROP INDEX IF EXISTS ix_admin_audit_logs_target_type",
+            "CREATE INDEX IF NOT EXISTS ix_usage_log_user_time ON usage_logs (user_id, timestamp DESC)",
+            "CREATE INDEX IF NOT EXISTS ix_usage_log_action_time ON usage_logs (action_type, timestamp DESC)",
+            "DROP INDEX IF EXISTS ix_usage_logs_user_id",
+            "DROP INDEX IF EXISTS ix_usage_logs_action_type",
+        ],
+    ),
+    (
+        "Hash SHA256 come BYTEA (32 byte) invece di hex String(64)",
+        [
+            """
+            DO $$ BEGIN
+                IF (SELECT data_type FROM information_schema.columns
+                    WHERE table_name = 'refresh_tokens' AND column_name = 'token_hash') <> 'bytea' THEN
+                    ALTER TABLE refresh_tokens ALTER COLUMN token_hash TYPE bytea USING decode(token_hash, 'hex');
+                END IF;
+                IF (SELECT data_type FROM information_schema.columns
+                    WHERE table_name = 'file_metadata' AND column_name = 'file_hash') <> 'bytea' THEN
+                    ALTER TABLE file_metadata ALTER COLUMN file_hash TYPE bytea USING decode(file_hash, 'hex');
+                END IF;
+            END $$
+            """,
+            # ALTER COLUMN TYPE ricostruisce già gli indici (ora ~2x entry per pagina)
+        ],
+    ),
+    (
+        "Colonne JSON → JSONB + indici GIN per filtri di contenimento",
+        [
+            # Rieseguibile: su colonne già jsonb il cast è un'identità
+            "ALTER TABLE admin_audit_logs ALTER COLUMN details TYPE jsonb USING details::jsonb",
+            # Colonne payload di jobs: assenti se già spostate in job_payloads (più sotto)
+            """
+            DO $$ BEGIN
+                IF EXISTS (SELECT 1 FROM information_schema.columns
+                           WHERE table_name = 'jobs' AND column_name = 'parameters') THEN
+                    ALTER TABLE jobs ALTER COLUMN parameters TYPE jsonb USING parameters::jsonb;
+                    ALTER TABLE jobs ALTER COLUMN input_files TYPE jsonb USING input_files::jsonb;
+                    ALTER TABLE jobs ALTER COLUMN output_files TYPE jsonb USING output_files::jsonb;
+                    ALTER TABLE jobs ALTER COLUMN result TYPE jsonb USING result::jsonb;
+                    CREATE INDEX IF NOT EXISTS ix_job_params_gin ON jobs USING gin (parameters);
+                END IF;
+            END $$
+            """,
+            "ALTER TABLE pipelines ALTER COLUMN steps TYPE jsonb USING steps::jsonb",
+            # Mappe file: già jsonb, o bytea dopo _files_to_msgpack (ultimo gruppo),
+            # su cui il cast a jsonb fallirebbe
+            """
+            DO $$ BEGIN
+                IF (SELECT data_type FROM information_schema.columns
+                    WHERE table_name = 'pipelines' AND column_name = 'input_files') NOT IN ('jsonb', 'bytea') THEN
+                    ALTER TABLE pipelines ALTER COLUMN input_files TYPE jsonb USING input_files::jsonb;
+                END IF;
+                IF (SELECT data_type FROM information_schema.columns
+                    WHERE table_name = 'pipelines' AND column_name = 'output_files') NOT IN ('jsonb', 'bytea') THEN
+                    ALTER TABLE pipelines ALTER COLUMN output_files TYPE jsonb USING output_files::jsonb;
+                END IF;
+            END $$
+            """,
+            "ALTER TABLE pipelines ALTER COLUMN result TYPE jsonb USING result::jsonb",
+            "ALTER TABLE scheduled_jobs ALTER COLUMN parameters TYPE jsonb USING parameters::jsonb",
+            "ALTER TABLE usage_logs ALTER COLUMN action_details TYPE jsonb USING action_details::jsonb",
+            "CREATE INDEX IF NOT EXISTS ix_usage_log_details_gin ON usage_logs USING gin (action_details)",
+            "CREATE INDEX IF NOT EXISTS ix_admin_audit_details_gin ON admin_audit_logs USING gin (details)",
+        ],
+    ),
+    (
+        "Rimozione indici duplicati sulle primary key (la PK ha già il suo indice univoco)",
+        [
+            "DROP INDEX IF EXISTS ix_admin_audit_logs_id",
+            "DROP INDEX IF EXISTS ix_api_keys_id",
+            "DROP INDEX IF EXISTS ix_file_metadata_id",
+            "DROP INDEX IF EXISTS ix_jobs_id",
+            "DROP INDEX IF EXISTS ix_pipelines_id",
+            "DROP INDEX IF EXISTS ix_scheduled_jobs_id",
+            "DROP INDEX IF EXISTS ix_usage_logs_id",
+            "DROP INDEX IF EXISTS ix_users_id",
+            "DROP INDEX IF EXISTS ix_user_settings_id",
+        ],
+    ),
+    (
+        "Campi pipeline denormalizzati su jobs + indice (user_id, created_at DESC)",
+        [
+            "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS pipeline_name VARCHAR",
+            "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS pipeline_step_number INTEGER",
+            # Backfill job esistenti (step number non ricostruibile: resta NULL)
+            """
+            UPDATE jobs SET pipeline_name = pipelines.name
+            FROM pipelines
+            WHERE jobs.pipeline_id = pipelines.id AND jobs.pipeline_name IS NULL
+            """,
+            "CREATE INDEX IF NOT EXISTS ix_job_user_created ON jobs (user_id, created_at DESC)",
+        ],
+    ),
+    (
+        "Indici parziali sulle code di lavoro aperte (jobs attivi, scheduled_jobs da avviare)",
+        [
+            # Enum nativo: valori = nomi membri (PENDING); riscritti in minuscolo più sotto
+            "CREATE INDEX IF NOT EXISTS ix_jobs_active ON jobs (created_at) WHERE status IN ('PENDING', 'PROCESSING')",
+            "CREATE INDEX IF NOT EXISTS ix_sched_due ON scheduled_jobs (scheduled_time) WHERE status = 'SCHEDULED'",
+            "DROP INDEX IF EXISTS ix_jobs_status",
+            "DROP INDEX IF EXISTS ix_scheduled_jobs_status",
+        ],
+    ),
+    (
+        "Default timestamp lato server (UTC) al posto di datetime.utcnow lato Python",
+        [
+            # I modelli non inviano più created_at/updated_at/timestamp nelle INSERT:
+            # senza default lato DB le tabelle esistenti violerebbero NOT NULL
+            "ALTER TABLE admin_audit_logs ALTER COLUMN timestamp SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE api_keys ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE file_metadata ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE file_metadata ALTER COLUMN accessed_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE jobs ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE jobs ALTER COLUMN updated_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE pipelines ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE pipelines ALTER COLUMN updated_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE refresh_tokens ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE refresh_tokens ALTER COLUMN last_used_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE scheduled_jobs ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE usage_logs ALTER COLUMN timestamp SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE users ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE users ALTER COLUMN updated_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE user_settings ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+            "ALTER TABLE user_settings ALTER COLUMN updated_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)",
+        ],
+    ),
+    (
+        "Enum PostgreSQL (CREATE TYPE) → VARCHAR + CHECK constraint, valori = .value dell'enum",
+        _enum_to_varchar_statements(),
+    ),
+    (
+        "Colonne numeriche: SMALLINT per contatori piccoli, BIGINT per dimensioni file",
+        [
+            "ALTER TABLE jobs ALTER COLUMN progress TYPE smallint",
+            "ALTER TABLE jobs ALTER COLUMN pipeline_step_number TYPE smallint",
+            "ALTER TABLE pipelines ALTER COLUMN progress TYPE smallint",
+            "ALTER TABLE pipelines ALTER COLUMN current_step TYPE smallint",
+            "ALTER TABLE pipelines ALTER COLUMN total_steps TYPE smallint",
+            "ALTER TABLE scheduled_jobs ALTER COLUMN duration_seconds TYPE smallint",
+            # INTEGER va in overflow sopra ~2.1 GB
+            "ALTER TABLE file_metadata ALTER COLUMN file_size TYPE bigint",
+        ],
+    ),
+    (
+        "Indice (pipeline_id, created_at) per Pipeline.jobs ordinato",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_jobs_pipeline_created ON jobs (pipeline_id, created_at)",
+        ],
+    ),
+    (
+        "Foreign key con ON DELETE CASCADE / SET NULL (eliminazione figli lato DB)",
+        [
+            # Nome constraint = default PostgreSQL <tabella>_<colonna>_fkey
+            "ALTER TABLE api_keys DROP CONSTRAINT IF EXISTS api_keys_user_id_fkey, "
+            "ADD CONSTRAINT api_keys_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+            "ALTER TABLE file_metadata DROP CONSTRAINT IF EXISTS file_metadata_user_id_fkey, "
+            "ADD CONSTRAINT file_metadata_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+            "ALTER TABLE jobs DROP CONSTRAINT IF EXISTS jobs_user_id_fkey, "
+            "ADD CONSTRAINT jobs_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+            "ALTER TABLE jobs DROP CONSTRAINT IF EXISTS jobs_pipeline_id_fkey, "
+            "ADD CONSTRAINT jobs_pipeline_id_fkey FOREIGN KEY (pipeline_id) REFERENCES pipelines (id) ON DELETE CASCADE",
+            "ALTER TABLE pipelines DROP CONSTRAINT IF EXISTS pipelines_user_id_fkey, "
+            "ADD CONSTRAINT pipelines_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+            "ALTER TABLE scheduled_jobs DROP CONSTRAINT IF EXISTS scheduled_jobs_user_id_fkey, "
+            "ADD CONSTRAINT scheduled_jobs_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+            "ALTER TABLE scheduled_jobs DROP CONSTRAINT IF EXISTS scheduled_jobs_job_id_fkey, "
+            "ADD CONSTRAINT scheduled_jobs_job_id_fkey FOREIGN KEY (job_id) REFERENCES jobs (id) ON DELETE SET NULL",
+            "ALTER TABLE user_settings DROP CONSTRAINT IF EXISTS user_settings_user_id_fkey, "
+            "ADD CONSTRAINT user_settings_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE",
+        ],
+    ),
+    (
+        "Email/username CITEXT (lookup case-insensitive su indice unique) + VARCHAR limitati",
+        [
+            # Fallisce se esistono già email/username che differiscono solo per maiuscole:
+            # vanno risolti a mano prima della migration
+            "CREATE EXTENSION IF NOT EXISTS citext",
+            "ALTER TABLE users ALTER COLUMN email TYPE citext",
+            "ALTER TABLE users ALTER COLUMN username TYPE citext",
+            "ALTER TABLE admin_audit_logs ALTER COLUMN admin_username TYPE VARCHAR(255)",
+            "ALTER TABLE admin_audit_logs ALTER COLUMN admin_email TYPE VARCHAR(255)",
+            "ALTER TABLE admin_audit_logs ALTER COLUMN action TYPE VARCHAR(64)",
+            "ALTER TABLE admin_audit_logs ALTER COLUMN target_type TYPE VARCHAR(32)",
+            "ALTER TABLE admin_audit_logs ALTER COLUMN target_identifier TYPE VARCHAR(255)",
+            "ALTER TABLE admin_audit_logs ALTER COLUMN ip_address TYPE VARCHAR(45)",
+            "ALTER TABLE usage_logs ALTER COLUMN action_type TYPE VARCHAR(64)",
+            "ALTER TABLE usage_logs ALTER COLUMN ip_address TYPE VARCHAR(45)",
+            "ALTER TABLE file_metadata ALTER COLUMN mime_type TYPE VARCHAR(127)",
+            "ALTER TABLE file_metadata ALTER COLUMN file_type TYPE VARCHAR(32)",
+            "ALTER TABLE api_keys ALTER COLUMN name TYPE VARCHAR(255)",
+        ],
+    ),
+    (
+        "Partizionamento verticale: payload JSON di jobs in job_payloads",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS job_payloads (
+                job_id UUID PRIMARY KEY REFERENCES jobs (id) ON DELETE CASCADE,
+                input_files JSONB,
+                output_files JSONB,
+                parameters JSONB NOT NULL,
+                result JSONB,
+                error TEXT
+            )
+            """,
+            # Copia e rimozione colonne solo se jobs ha ancora il vecchio layout (rieseguibile)
+            """
+            DO $$ BEGIN
+                IF EXISTS (SELECT 1 FROM information_schema.columns
+                           WHERE table_name = 'jobs' AND column_name = 'parameters') THEN
+                    INSERT INTO job_payloads (job_id, input_files, output_files, parameters, result, error)
+                    SELECT id, input_files, output_files, COALESCE(parameters, '{}'::jsonb), result, error
+                    FROM jobs
+                    ON CONFLICT (job_id) DO NOTHING;
+
+                    ALTER TABLE jobs
+                        DROP COLUMN input_files,
+                        DROP COLUMN output_files,
+                        DROP COLUMN parameters,
+                        DROP COLUMN result,
+                        DROP COLUMN error;
+                END IF;
+            END $$
+            """,
+            # ix_job_params_gin sparisce con la colonna
+            "CREATE INDEX IF NOT EXISTS ix_job_payload_params_gin ON job_payloads USING gin (parameters)",
+        ],
+    ),
+    (
+        "scheduler_job_id univoco solo tra scheduled_jobs aperti (indice unique parziale)",
+        [
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_sched_active_apsid ON scheduled_jobs (scheduler_job_id) "
+            "WHERE status IN ('scheduled', 'running')",
+            "ALTER TABLE scheduled_jobs DROP CONSTRAINT IF EXISTS scheduled_jobs_scheduler_job_id_key",
+        ],
+    ),
+    (
+        "Opzione pipeline: esecuzione parallela step indipendenti",
+        [
+            "ALTER TABLE pipelines ADD COLUMN IF NOT EXISTS parallel_groups BOOLEAN DEFAULT FALSE",
+        ],
+    ),
+    (
+        "Checkpoint pipeline per resume senza rieseguire step completati",
+        [
+            "ALTER TABLE pipelines ADD COLUMN IF NOT EXISTS checkpoint JSONB",
+        ],
+    ),
+    (
+        "Mappe file (input_files/output_files) da JSONB a BYTEA MessagePack",
+        [
+            _files_to_msgpack,
+        ],
+    ),
+]
+
+
+def migrate():
+    """Applica migration ottimizzazioni schema"""
+    if engine.dialect.name != "postgresql":
+        logger.warning("⚠️  Migration pensata per PostgreSQL: nessuna modifica applicata.")
+        return
+
+    logger.info("=" * 60)
+    logger.info("🔄 Avvio migration ottimizzazioni database...")
+    logger.info("=" * 60)
+
+    try:
+        for description, statements in MIGRATIONS:
+            logger.info(f"🔧 {description}")
+            # Una transazione per gruppo: o tutto o niente
+            with engine.begin() as conn:
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(text(statement))
+
+        logger.info("✅ Migration completata!")
+
+    except Exception as e:
+        logger.error(f"❌ Errore durante migration: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,44 @@
+"""
+Configurazione comune dei test
+==============================
+app.core.config valida le impostazioni all'import: valori minimi di test
+per le variabili obbligatorie, prima che qualunque modulo app.* venga importato.
+Il database di test è un file SQLite temporaneo (tabelle ricreate per ogni test).
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TEST_DB = Path(tempfile.gettempdir()) / f"aivideomaker_test_{os.getpid()}.db"
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-not-for-production-0123456789")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TEST_DB}")
+
+
+@pytest.fixture
+def db_session():
+    """Session su database SQLite con tutte le tabelle, svuotato a fine test"""
+    from app.core.database import Base, SessionLocal, engine
+    import app.models  # noqa: F401  registra tutti i modelli in Base.metadata
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def user(db_session):
+    """Utente attivo di test"""
+    from app.models import User
+
+    user = User(email="mario@example.com", username="mario", hashed_password="x")
+    db_session.add(user)
+    db_session.commit()
+    return user
@@ -0,0 +1,66 @@
+"""
+Test chromakey.py: pulizia del writer quando il compositing CUDA fallisce
+"""
+
+import shutil
+
+import numpy as np
+import pytest
+
+import chromakey
+
+
+class FakeWriter:
+    def __init__(self):
+        self.released = 0
+
+    def write(self, frame):
+        pass
+
+    def release(self):
+        self.released += 1
+        return True
+
+
+def composite_cuda(out, output_video):
+    """_composite_cuda con filtri CUDA che falliscono subito"""
+    return chromakey._composite_cuda(
+        "fg.mp4", "bg.mp4", out, str(output_video),
+        25.0, 64, 48, 10, 25.0,
+        0, 10, 10, (32, 24),
+        np.array([40, 40, 40]), np.array([80, 255, 255]), 5, (0, 0), 1.0, True,
+        None, None, None
+    )
+
+
+@pytest.fixture
+def failing_cuda(monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("CUDA non disponibile")
+
+    monkeypatch.setattr(chromakey.cv2.cuda, "createGaussianFilter", fail, raising=False)
+
+
+def test_cuda_error_releases_writer_and_removes_output(failing_cuda, tmp_path):
+    output_video = tmp_path / "out.mp4"
+    output_video.write_bytes(b"parziale")
+    out = FakeWriter()
+
+    assert composite_cuda(out, output_video) is False
+    assert out.released == 1
+    assert not output_video.exists()
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg non installato")
+def test_cuda_error_stops_ffmpeg_pipe_writer(failing_cuda, tmp_path):
+    output_video = tmp_path / "out.mp4"
+    out = chromakey.FFmpegPipeWriter(
+        str(output_video), (64, 48), 25.0, "fg.mp4", "bg.mp4",
+        "none", 0, True, False
+    )
+    out.write(np.zeros((48, 64, 3), np.uint8))
+
+    assert composite_cuda(out, output_video) is False
+    assert out.process.poll() is not None
+    assert out._stderr.closed
+    assert not output_video.exists()
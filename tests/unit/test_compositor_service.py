@@ -0,0 +1,99 @@
+"""
+Test CompositorService: filtergraph FFmpeg generato (nessun processo lanciato)
+"""
+
+import asyncio
+
+import pytest
+
+from app.services import compositor_service as compositor_module
+from app.services.compositor_service import CompositorService
+
+MAIN_INFO = {'width': 640, 'height': 480, 'fps': 25.0, 'duration': 3.0, 'has_audio': True}
+
+LAYER_INFOS = {
+    'main.mp4': MAIN_INFO,
+    'a.mp4': {'width': 320, 'height': 240, 'fps': 25.0, 'duration': 2.0, 'has_audio': True},
+    'b.mp4': {'width': 320, 'height': 240, 'fps': 25.0, 'duration': 2.0, 'has_audio': True},
+}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = CompositorService()
+    service.get_video_info = lambda path: LAYER_INFOS[path]
+    return service
+
+
+def video_layer(path, **overrides):
+    layer = {'type': 'video', 'path': path, 'scale': 30, 'posX': 0, 'posY': 0}
+    layer.update(overrides)
+    return layer
+
+
+def test_overlapping_layers_use_overlay_chain(service):
+    """Layer sovrapposti (e al base a tutto frame): catena overlay, mai xstack"""
+    layers = [video_layer('a.mp4'), video_layer('b.mp4', posX=40, posY=30)]
+
+    filter_complex = service.build_filter_complex(MAIN_INFO, layers)
+
+    assert 'xstack' not in filter_complex
+    assert filter_complex.split(';') == [
+        '[1:v]setpts=PTS-STARTPTS,scale=192:144:force_original_aspect_ratio=decrease[layer0]',
+        '[0:v][layer0]overlay=224:168[out0]',
+        '[2:v]setpts=PTS-STARTPTS,scale=192:144:force_original_aspect_ratio=decrease[layer1]',
+        '[out0][layer1]overlay=264:198[out1]',
+    ]
+
+
+class _FFmpegLaunched(Exception):
+    """Interrompe process_composition al lancio di FFmpeg"""
+
+
+def composition_command(service, monkeypatch, layers):
+    """Comando FFmpeg che process_composition lancerebbe per questi layer"""
+    launched = []
+
+    def fake_popen(cmd, **kwargs):
+        launched.append(cmd)
+        raise _FFmpegLaunched()
+
+    monkeypatch.setattr(service, 'check_ffmpeg', lambda: True)
+    monkeypatch.setattr(compositor_module.subprocess, 'Popen', fake_popen)
+    with pytest.raises(_FFmpegLaunched):
+        asyncio.run(service.process_composition('main.mp4', layers, 'out.mp4'))
+    return launched[0]
+
+
+def test_covered_video_keeps_audio_and_following_audio_index(service, monkeypatch):
+    """Video coperto: niente filtri video, ma il suo audio (e quello dopo) ha l'indice giusto"""
+    covered = video_layer('a.mp4', scale=20, startTime=0.5)
+    cover = video_layer('b.mp4', scale=50)
+    audio = {'type': 'audio', 'path': 'music.mp3', 'startTime': 1}
+
+    cmd = composition_command(service, monkeypatch, [covered, cover, audio])
+
+    inputs = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-i']
+    assert inputs == ['main.mp4', 'b.mp4', 'a.mp4', 'music.mp3']
+
+    filter_complex = cmd[cmd.index('-filter_complex') + 1]
+    assert filter_complex.split(';') == [
+        '[1:v]setpts=PTS-STARTPTS,scale=320:240:force_original_aspect_ratio=decrease[layer0]',
+        '[0:v][layer0]overlay=160:120[out0]',
+        '[2:a]adelay=500|500[a2d]',
+        '[3:a]adelay=1000|1000[a3d]',
+        '[0:a][a2d][1:a][a3d]amix=inputs=4:duration=longest:normalize=0[aout]',
+    ]
+    assert cmd[cmd.index('-map') + 1] == '[out0]'
+
+
+def test_build_filter_complex_reads_input_index(service):
+    """build_filter_complex usa gli indici di _build_inputs, non la posizione nella lista"""
+    layers = [video_layer('a.mp4'), video_layer('b.mp4', posX=40)]
+    input_index = {id(layers[0]): 2, id(layers[1]): 1}
+
+    filter_complex = service.build_filter_complex(MAIN_INFO, layers, input_index=input_index)
+
+    assert filter_complex.startswith('[2:v]')
+    assert '[1:v]setpts' in filter_complex
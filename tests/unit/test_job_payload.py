@@ -0,0 +1,80 @@
+"""
+Test Job / JobPayload: campi payload in tabella separata dietro association proxy
+"""
+
+from app.models import Job, JobPayload, JobType
+
+
+def test_job_payload_round_trip(db_session, user):
+    """I campi passati al costruttore finiscono nella riga job_payloads e si rileggono"""
+    job = Job(
+        user_id=user.id,
+        job_type=JobType.CHROMAKEY,
+        input_files={"fg": "uploads/fg.mp4", "bg": "uploads/bg.mp4"},
+        parameters={"scale": 0.5, "fast_mode": True},
+        result={"frames": 120},
+    )
+    db_session.add(job)
+    db_session.commit()
+    job_id = job.id
+    db_session.expunge_all()
+
+    payload = db_session.get(JobPayload, job_id)
+    assert payload is not None
+    assert payload.input_files == {"fg": "uploads/fg.mp4", "bg": "uploads/bg.mp4"}
+    assert payload.parameters == {"scale": 0.5, "fast_mode": True}
+    assert payload.result == {"frames": 120}
+
+    job = db_session.get(Job, job_id)
+    assert job.input_files == {"fg": "uploads/fg.mp4", "bg": "uploads/bg.mp4"}
+    assert job.parameters == {"scale": 0.5, "fast_mode": True}
+    assert job.result == {"frames": 120}
+    assert job.output_files is None
+
+
+def test_job_payload_proxy_writes_persist(db_session, user):
+    """Scritture tramite proxy su un job caricato vengono salvate nel payload"""
+    job = Job(user_id=user.id, job_type=JobType.THUMBNAIL)
+    db_session.add(job)
+    db_session.commit()
+    job_id = job.id
+    db_session.expunge_all()
+
+    job = db_session.get(Job, job_id)
+    job.output_files = {"thumb": "outputs/thumb.jpg"}
+    job.result = {"width": 1280}
+    job.error = None
+    db_session.commit()
+    db_session.expunge_all()
+
+    payload = db_session.get(JobPayload, job_id)
+    assert payload.output_files == {"thumb": "outputs/thumb.jpg"}
+    assert payload.result == {"width": 1280}
+    assert db_session.get(Job, job_id).output_files == {"thumb": "outputs/thumb.jpg"}
+
+
+def test_job_without_payload_fields_gets_default_payload(db_session, user):
+    """Ogni job ha il suo payload: parameters non nullo anche se non passato"""
+    job = Job(user_id=user.id, job_type=JobType.TRANSLATION)
+    db_session.add(job)
+    db_session.commit()
+    job_id = job.id
+    db_session.expunge_all()
+
+    payload = db_session.get(JobPayload, job_id)
+    assert payload is not None
+    assert payload.parameters == {}
+
+
+def test_job_delete_removes_payload(db_session, user):
+    """Il payload segue il job (cascade)"""
+    job = Job(user_id=user.id, job_type=JobType.CHROMAKEY, parameters={"a": 1})
+    db_session.add(job)
+    db_session.commit()
+    job_id = job.id
+
+    db_session.delete(job)
+    db_session.commit()
+    db_session.expunge_all()
+
+    assert db_session.get(JobPayload, job_id) is None
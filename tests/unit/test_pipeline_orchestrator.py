@@ -0,0 +1,296 @@
+"""
+Test PipelineOrchestrator: resume da checkpoint, raggruppamento step (DAG) e step paralleli
+"""
+
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from app.models import Pipeline
+from app.models.pipeline import PipelineStatus
+from app.pipelines.orchestrator import MAX_PARALLEL_STEPS, PipelineOrchestrator
+from app.services.transcription_service import TranscriptionParams
+from app.services.translation_service import TranslationService
+
+
+def make_pipeline(db_session, user, steps, input_files=None, **kwargs):
+    pipeline = Pipeline(
+        user_id=user.id,
+        name="auto",
+        steps=steps,
+        total_steps=len(steps),
+        input_files=input_files or {"video": "uploads/video.mp4"},
+        **kwargs
+    )
+    db_session.add(pipeline)
+    db_session.commit()
+    return pipeline
+
+
+class FakeStep:
+    """Handler step finto: scrive i suoi file output e registra gli input ricevuti"""
+
+    def __init__(self, outputs=None, fail_times=0):
+        self.outputs = outputs or {}
+        self.fail_times = fail_times
+        self.calls = []
+
+    def __call__(self, params, input_files, progress_callback):
+        self.calls.append(dict(input_files))
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("errore simulato")
+        for path in self.outputs.values():
+            with open(path, "w") as f:
+                f.write("x")
+        return {"success": True, "output_files": dict(self.outputs)}
+
+
+@pytest.fixture
+def steps_pipeline(db_session, user):
+    return make_pipeline(db_session, user, [
+        {"step_number": 1, "job_type": "metadata_extraction", "enabled": True, "parameters": {}},
+        {"step_number": 2, "job_type": "thumbnail", "enabled": True, "parameters": {}},
+        {"step_number": 3, "job_type": "translation", "enabled": True, "parameters": {}},
+    ])
+
+
+def install_handlers(orchestrator, tmp_path, fail_translation=0):
+    handlers = {
+        "metadata_extraction": FakeStep({"metadata": str(tmp_path / "meta.json")}),
+        "thumbnail": FakeStep({"thumbnail": str(tmp_path / "thumb.jpg")}),
+        "translation": FakeStep({"translated_video": str(tmp_path / "it.mp4")}, fail_translation),
+    }
+    for job_type, handler in list(orchestrator._dispatch.items()):
+        if job_type.value in handlers:
+            orchestrator._dispatch[job_type] = handlers[job_type.value]
+    return handlers
+
+
+def test_resume_skips_completed_steps_and_restores_outputs(db_session, steps_pipeline, tmp_path):
+    """Pipeline fallita allo step 3: il resume salta 1-2 e riparte con i loro output"""
+    orchestrator = PipelineOrchestrator(db_session)
+    first = install_handlers(orchestrator, tmp_path, fail_translation=1)
+
+    with pytest.raises(RuntimeError, match="step 3"):
+        orchestrator.execute_pipeline(steps_pipeline)
+
+    db_session.expire_all()
+    assert steps_pipeline.status == PipelineStatus.FAILED
+    assert set(steps_pipeline.checkpoint) == {"1", "2"}
+
+    orchestrator = PipelineOrchestrator(db_session)
+    second = install_handlers(orchestrator, tmp_path)
+    outcome = orchestrator.execute_pipeline(steps_pipeline, resume=True)
+
+    assert len(first["metadata_extraction"].calls) == 1
+    assert len(first["thumbnail"].calls) == 1
+    assert second["metadata_extraction"].calls == []
+    assert second["thumbnail"].calls == []
+    # Lo step rieseguito riceve gli output degli step ripresi dal checkpoint
+    assert second["translation"].calls == [{
+        "video": "uploads/video.mp4",
+        "metadata": str(tmp_path / "meta.json"),
+        "thumbnail": str(tmp_path / "thumb.jpg"),
+    }]
+
+    assert outcome["success"] is True
+    assert outcome["output_files"]["translated_video"] == str(tmp_path / "it.mp4")
+    assert set(outcome["results"]) == {"metadata_extraction", "thumbnail", "translation"}
+
+    db_session.expire_all()
+    assert steps_pipeline.status == PipelineStatus.COMPLETED
+    assert set(steps_pipeline.checkpoint) == {"1", "2", "3"}
+
+
+def test_resume_reruns_from_step_with_missing_output(db_session, steps_pipeline, tmp_path):
+    """Output di uno step completato non più su disco: si riesegue da quello step"""
+    orchestrator = PipelineOrchestrator(db_session)
+    install_handlers(orchestrator, tmp_path, fail_translation=1)
+    with pytest.raises(RuntimeError):
+        orchestrator.execute_pipeline(steps_pipeline)
+
+    (tmp_path / "thumb.jpg").unlink()
+    db_session.expire_all()
+
+    orchestrator = PipelineOrchestrator(db_session)
+    second = install_handlers(orchestrator, tmp_path)
+    orchestrator.execute_pipeline(steps_pipeline, resume=True)
+
+    assert second["metadata_extraction"].calls == []
+    assert len(second["thumbnail"].calls) == 1
+    assert len(second["translation"].calls) == 1
+
+
+def test_without_resume_all_steps_rerun(db_session, steps_pipeline, tmp_path):
+    """Senza resume il checkpoint precedente viene ignorato"""
+    orchestrator = PipelineOrchestrator(db_session)
+    install_handlers(orchestrator, tmp_path, fail_translation=1)
+    with pytest.raises(RuntimeError):
+        orchestrator.execute_pipeline(steps_pipeline)
+    db_session.expire_all()
+
+    orchestrator = PipelineOrchestrator(db_session)
+    second = install_handlers(orchestrator, tmp_path)
+    orchestrator.execute_pipeline(steps_pipeline)
+
+    assert all(len(handler.calls) == 1 for handler in second.values())
+
+
+def step(number, job_type="translation", **params):
+    return {"step_number": number, "job_type": job_type, "enabled": True, "parameters": params}
+
+
+def step_numbers(groups):
+    return [[s["step_number"] for s in group] for group in groups]
+
+
+@pytest.mark.parametrize("steps, expected", [
+    # Catena lineare: senza depends_on ogni step dipende dal precedente
+    (
+        [step(1, "chromakey", depends_on=[]), step(2, "thumbnail"), step(3, "youtube_upload")],
+        [[1], [2], [3]],
+    ),
+    # Diamante: 2 e 3 dipendono da 1, 4 da entrambi
+    (
+        [
+            step(1, "chromakey"),
+            step(2, "thumbnail", depends_on=[1]),
+            step(3, "translation", depends_on=[1], target_language="en"),
+            step(4, "youtube_upload", depends_on=[2, 3]),
+        ],
+        [[1], [2, 3], [4]],
+    ),
+    # Ondata più larga di MAX_PARALLEL_STEPS: spezzata in gruppi consecutivi
+    (
+        [step(1, "chromakey")] + [
+            step(n, depends_on=[1], target_language=f"l{n}") for n in range(2, MAX_PARALLEL_STEPS + 3)
+        ],
+        [[1], list(range(2, MAX_PARALLEL_STEPS + 2)), [MAX_PARALLEL_STEPS + 2]],
+    ),
+    # Nessun depends_on: raggruppamento di _plan_step_groups (traduzioni consecutive)
+    (
+        [step(1, "chromakey"), step(2, target_language="en"), step(3, target_language="de")],
+        [[1], [2, 3]],
+    ),
+])
+def test_build_dag_groups(steps, expected):
+    assert step_numbers(PipelineOrchestrator._build_dag(steps)) == expected
+
+
+@pytest.mark.parametrize("steps, message", [
+    # depends_on verso uno step successivo (o se stesso)
+    ([step(1, depends_on=[2]), step(2)], "solo step precedenti"),
+    ([step(1, depends_on=[1])], "solo step precedenti"),
+    # depends_on verso uno step disabilitato (assente dagli step abilitati)
+    ([step(1, "chromakey"), step(3, "thumbnail", depends_on=[2])], "non abilitato"),
+])
+def test_build_dag_invalid_depends_on(steps, message):
+    with pytest.raises(ValueError, match=message):
+        PipelineOrchestrator._build_dag(steps)
+
+
+def test_invalid_depends_on_fails_pipeline(db_session, user):
+    """depends_on verso step disabilitato: pipeline FAILED senza eseguire step"""
+    disabled = {**step(2, "thumbnail"), "enabled": False}
+    pipeline = make_pipeline(
+        db_session, user,
+        [step(1, "chromakey"), disabled, step(3, "youtube_upload", depends_on=[2])],
+        parallel_groups=True,
+    )
+
+    with pytest.raises(ValueError, match="non abilitato"):
+        PipelineOrchestrator(db_session).execute_pipeline(pipeline)
+
+    db_session.expire_all()
+    assert pipeline.status == PipelineStatus.FAILED
+    assert "non abilitato" in pipeline.error
+    assert pipeline.jobs == []
+
+
+class FakeWhisperModel:
+    """Modello Whisper finto: registra quanti transcribe girano insieme"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def transcribe(self, audio_path, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return {"text": "ciao a tutti"}
+
+
+@pytest.fixture
+def translation_service(monkeypatch, tmp_path):
+    """TranslationService reale con modello Whisper finto e I/O esterno sostituito"""
+    monkeypatch.setitem(sys.modules, "whisper", types.ModuleType("whisper"))
+    monkeypatch.setattr(TranslationService, "_verify_dependencies", lambda self: None)
+
+    service = TranslationService()
+    service._whisper_model = FakeWhisperModel()
+    # Traduzione fuori dal lock del modello: i due step devono trovarsi qui insieme
+    both_translating = threading.Barrier(2, timeout=5)
+
+    def translate_text(text, target_language):
+        both_translating.wait()
+        return f"{text} ({target_language})"
+
+    service._extract_audio = lambda video_path: str(tmp_path / "missing.wav")
+    service._translate_text = translate_text
+    service._generate_tts = lambda text, language: str(tmp_path / f"tts_{language}.mp3")
+    service._combine_video_audio = lambda video, audio, output: None
+    return service
+
+
+def test_parallel_translations_serialize_whisper(db_session, user, tmp_path, translation_service):
+    """Due traduzioni nello stesso gruppo: transcribe uno alla volta, il resto in parallelo"""
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"")
+    pipeline = make_pipeline(
+        db_session, user,
+        [step(1, target_language="en"), step(2, target_language="de")],
+        input_files={"video": str(video)},
+        parallel_groups=True,
+    )
+    orchestrator = PipelineOrchestrator(db_session)
+    orchestrator.translation_service = translation_service
+
+    outcome = orchestrator.execute_pipeline(pipeline)
+
+    assert translation_service._whisper_model.max_active == 1
+    assert outcome["results"]["translation"]["translation"] in {"ciao a tutti (en)", "ciao a tutti (de)"}
+    assert {"video_en", "video_de"} <= set(outcome["output_files"])
+
+
+def test_concurrent_pipelines_share_transcription_model_serially(db_session, monkeypatch, tmp_path):
+    """Orchestratori di pipeline concorrenti: stesso TranscriptionService, un transcribe alla volta"""
+    monkeypatch.setattr(PipelineOrchestrator, "_services_cache", {})
+    services = [PipelineOrchestrator(db_session).transcription_service for _ in range(2)]
+    assert services[0] is services[1]
+
+    service = services[0]
+    model = FakeWhisperModel()
+    service.model_cache["base"] = model
+    audio = tmp_path / "audio.wav"
+    audio.write_bytes(b"")
+
+    def run(index):
+        service.transcribe(TranscriptionParams(media_path=audio, output_path=tmp_path / f"out{index}.json"))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.max_active == 1
+    assert all((tmp_path / f"out{i}.json").exists() for i in range(3))
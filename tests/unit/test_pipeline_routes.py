@@ -0,0 +1,41 @@
+"""
+Test route pipeline: task background di esecuzione
+"""
+
+from app.api.routes import pipeline as pipeline_routes
+from app.models import Job, Pipeline
+from app.models.pipeline import PipelineStatus
+from app.pipelines.orchestrator import PipelineOrchestrator
+
+
+def test_execute_pipeline_task_does_not_commit_every_tick(db_session, user, monkeypatch):
+    """100 tick di progresso: i commit restano quelli limitati dell'orchestratore"""
+    def metadata_step(self, params, input_files, progress_callback):
+        for progress in range(100):
+            progress_callback(progress, f"{progress}%")
+        return {"success": True}
+
+    monkeypatch.setattr(PipelineOrchestrator, "_execute_metadata", metadata_step)
+
+    pipeline = Pipeline(
+        user_id=user.id,
+        name="auto",
+        steps=[{"step_number": 1, "job_type": "metadata_extraction", "enabled": True, "parameters": {}}],
+        total_steps=1,
+        input_files={},
+    )
+    db_session.add(pipeline)
+    db_session.commit()
+
+    commits = []
+    commit = db_session.commit
+    monkeypatch.setattr(db_session, "commit", lambda: (commits.append(1), commit())[1])
+
+    pipeline_routes.execute_pipeline_task(str(pipeline.id), db_session)
+
+    db_session.expire_all()
+    assert pipeline.status == PipelineStatus.COMPLETED
+    assert pipeline.current_step == 1
+    assert db_session.query(Job).one().progress == 100
+    # Uno ogni PROGRESS_COMMIT_MIN_DELTA punti più inizio/fine step e pipeline
+    assert len(commits) <= 30
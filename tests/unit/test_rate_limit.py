@@ -0,0 +1,186 @@
+"""
+Test RateLimitMiddleware: sliding window counter shardato per IP
+"""
+
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.rate_limit import RateLimitMiddleware, _NUM_SHARDS
+
+WINDOW = 60
+MAX_REQUESTS = 10
+# Inizio di una finestra (multiplo di WINDOW)
+T0 = WINDOW * 1000
+
+
+class FakeClock:
+    def __init__(self, now=T0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "time", clock)
+    return clock
+
+
+def make_limiter(app=None, max_requests=MAX_REQUESTS):
+    limiter = RateLimitMiddleware(app or FastAPI())
+    limiter.max_requests = max_requests
+    limiter.window_seconds = WINDOW
+    return limiter
+
+
+def drain(limiter, ip, attempts):
+    """Richieste consentite su `attempts` tentativi"""
+    return sum(limiter._check_rate_limit(ip)[0] for _ in range(attempts))
+
+
+def test_limit_within_window(clock):
+    limiter = make_limiter()
+
+    results = [limiter._check_rate_limit("1.1.1.1") for _ in range(MAX_REQUESTS + 1)]
+
+    assert [allowed for allowed, _, _ in results] == [True] * MAX_REQUESTS + [False]
+    assert [remaining for _, remaining, _ in results[:3]] == [9, 8, 7]
+    assert results[-1] == (False, 0, T0 + WINDOW)
+    # Altri IP hanno il proprio contatore
+    assert limiter._check_rate_limit("2.2.2.2")[0]
+
+
+@pytest.mark.parametrize("elapsed, allowed", [
+    # Appena dopo il confine: la finestra precedente pesa quasi per intero
+    (0, 0),
+    # A metà finestra: prev * 0.5 = 5 richieste stimate
+    (WINDOW / 2, 5),
+    # A 3/4 di finestra: prev * 0.25 = 2.5 stimate
+    (WINDOW * 3 / 4, 8),
+])
+def test_window_boundary_weights_previous_window(clock, elapsed, allowed):
+    limiter = make_limiter()
+    clock.now = T0 + WINDOW - 1
+    assert drain(limiter, "1.1.1.1", MAX_REQUESTS) == MAX_REQUESTS
+
+    clock.now = T0 + WINDOW + elapsed
+    assert drain(limiter, "1.1.1.1", MAX_REQUESTS + 1) == allowed
+
+
+def test_previous_window_forgotten_after_two_windows(clock):
+    limiter = make_limiter()
+    drain(limiter, "1.1.1.1", MAX_REQUESTS)
+
+    clock.now = T0 + 2 * WINDOW
+    assert drain(limiter, "1.1.1.1", MAX_REQUESTS + 1) == MAX_REQUESTS
+
+
+def test_shard_lock_only_blocks_same_shard(clock):
+    """Un lock per shard: uno shard occupato non ferma gli IP degli altri shard"""
+    limiter = make_limiter()
+    ips = [f"10.0.0.{i}" for i in range(256)]
+    ip = ips[0]
+    shard = limiter._shard_index(ip)
+    same = next(o for o in ips[1:] if limiter._shard_index(o) == shard)
+    other = next(o for o in ips[1:] if limiter._shard_index(o) != shard)
+
+    def check_in_thread(target_ip):
+        done = threading.Event()
+        thread = threading.Thread(
+            target=lambda: (limiter._check_rate_limit(target_ip), done.set()), daemon=True
+        )
+        thread.start()
+        return done, thread
+
+    with limiter._locks[shard]:
+        other_done, _ = check_in_thread(other)
+        assert other_done.wait(timeout=5)
+
+        same_done, same_thread = check_in_thread(same)
+        assert not same_done.wait(timeout=0.2)
+
+    same_thread.join(timeout=5)
+    assert same_done.is_set()
+    assert len(limiter._locks) == _NUM_SHARDS
+    assert same in limiter._shards[shard] and other not in limiter._shards[shard]
+
+
+def test_concurrent_requests_counted_exactly(clock):
+    """Thread concorrenti sullo stesso IP: nessuna richiesta persa né oltre il limite"""
+    limiter = make_limiter(max_requests=500)
+    allowed = []
+
+    def worker():
+        allowed.append(drain(limiter, "1.1.1.1", 100))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(allowed) == 500
+    assert limiter._shards[limiter._shard_index("1.1.1.1")]["1.1.1.1"][1] == 500
+
+
+@pytest.fixture
+def client(clock):
+    app = FastAPI()
+
+    @app.get("/api/v1/ping")
+    def ping():
+        return {"ok": True}
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    @app.get("/static/app.js")
+    def static_file():
+        return {"file": "app.js"}
+
+    limiter = make_limiter(app, max_requests=2)
+    with TestClient(limiter) as client:
+        yield client
+
+
+@pytest.mark.parametrize("path", ["/health", "/static/app.js"])
+def test_excluded_paths_not_limited(client, path):
+    for _ in range(5):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert "X-RateLimit-Limit" not in response.headers
+
+
+def test_rate_limit_headers_and_429(client, clock):
+    clock.now = T0 + 15
+    headers = {"X-Forwarded-For": "3.3.3.3"}
+
+    first = client.get("/api/v1/ping", headers=headers)
+    assert first.status_code == 200
+    assert first.headers["X-RateLimit-Limit"] == "2"
+    assert first.headers["X-RateLimit-Remaining"] == "1"
+    assert first.headers["X-RateLimit-Reset"] == str(T0 + WINDOW)
+
+    assert client.get("/api/v1/ping", headers=headers).status_code == 200
+
+    blocked = client.get("/api/v1/ping", headers=headers)
+    assert blocked.status_code == 429
+    assert blocked.json() == {
+        "error": "Rate limit exceeded",
+        "message": f"Troppo richieste. Max 2 richieste per {WINDOW} secondi.",
+        "retry_after": WINDOW - 15,
+    }
+    assert blocked.headers["X-RateLimit-Limit"] == "2"
+    assert blocked.headers["X-RateLimit-Remaining"] == "0"
+    assert blocked.headers["X-RateLimit-Reset"] == str(T0 + WINDOW)
+    assert blocked.headers["Retry-After"] == str(WINDOW - 15)
+
+    # Altro client (X-Forwarded-For diverso) non è limitato
+    assert client.get("/api/v1/ping", headers={"X-Forwarded-For": "4.4.4.4"}).status_code == 200
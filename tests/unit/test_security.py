@@ -0,0 +1,107 @@
+"""
+Test security: cache utenti di get_current_user invalidata dalle modifiche ORM
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.core import security
+from app.core.database import SessionLocal
+from app.core.security import create_access_token, get_current_user, require_admin
+from app.models import User
+
+
+@pytest.fixture(autouse=True)
+def empty_user_cache():
+    security._user_cache.clear()
+    yield
+    security._user_cache.clear()
+
+
+def authenticate(user_id, admin=False):
+    """Risolve get_current_user (e require_admin) come una request: session nuova ogni volta"""
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_access_token({"sub": user_id})
+    )
+    db = SessionLocal()
+    try:
+        user = asyncio.run(get_current_user(credentials, db))
+        if admin:
+            require_admin(user)
+        return user.id
+    finally:
+        db.close()
+
+
+def update_user(user_id, **values):
+    """Modifica utente via ORM in un'altra session (come la route admin)"""
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        for key, value in values.items():
+            setattr(user, key, value)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_user_cached_after_first_request(user):
+    assert authenticate(user.id) == user.id
+    assert security._user_cache[user.id].username == "mario"
+
+
+def test_deactivated_user_not_served_from_cache(user):
+    authenticate(user.id)
+    assert user.id in security._user_cache
+
+    update_user(user.id, is_active=False)
+
+    with pytest.raises(HTTPException) as exc:
+        authenticate(user.id)
+    assert exc.value.status_code == 403
+    assert exc.value.detail == "Inactive user"
+
+
+def test_role_change_not_served_from_cache(user):
+    update_user(user.id, is_admin=True)
+    authenticate(user.id, admin=True)
+    assert user.id in security._user_cache
+
+    update_user(user.id, is_admin=False)
+
+    with pytest.raises(HTTPException) as exc:
+        authenticate(user.id, admin=True)
+    assert exc.value.status_code == 403
+    assert exc.value.detail == "Admin privileges required"
+
+
+def test_deleted_user_not_served_from_cache(user):
+    authenticate(user.id)
+
+    db = SessionLocal()
+    try:
+        db.delete(db.get(User, user.id))
+        db.commit()
+    finally:
+        db.close()
+
+    with pytest.raises(HTTPException) as exc:
+        authenticate(user.id)
+    assert exc.value.status_code == 401
+
+
+def test_invalidation_registered_at_import(user):
+    """Listener registrati con il modello: attivi anche prima di qualunque get_current_user"""
+    from sqlalchemy import event
+    from app.models import user as user_module
+
+    assert event.contains(User, "after_update", user_module._invalidate_cached_user)
+    assert event.contains(User, "after_delete", user_module._invalidate_cached_user)
+
+    security._user_cache[user.id] = object()
+    update_user(user.id, full_name="Mario Rossi")
+
+    assert user.id not in security._user_cache
@@ -0,0 +1,27 @@
+"""
+Test User: eliminazione con figli delegata al DB (ondelete="CASCADE")
+"""
+
+from app.models import APIKey, Job, JobPayload, JobType, User
+
+
+def test_delete_user_with_loaded_children(db_session, user):
+    """Figli già caricati in sessione: il DELETE utente non prova a mettere user_id a NULL"""
+    db_session.add_all([
+        APIKey(user_id=user.id, key="k" * 64, name="cli"),
+        Job(user_id=user.id, job_type=JobType.CHROMAKEY, parameters={"a": 1}),
+    ])
+    db_session.commit()
+
+    assert len(user.api_keys) == 1
+    assert len(user.jobs) == 1
+    user_id = user.id
+
+    db_session.delete(user)
+    db_session.commit()
+    db_session.expunge_all()
+
+    assert db_session.get(User, user_id) is None
+    assert db_session.query(APIKey).count() == 0
+    assert db_session.query(Job).count() == 0
+    assert db_session.query(JobPayload).count() == 0